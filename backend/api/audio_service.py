@@ -6,18 +6,47 @@ import uuid
 import time
 import logging
 import json
+import wave
+import queue
+from collections import deque
 from pathlib import Path
+from api.tts_cache import TTSCache
+from api.piper_pool import PiperPool, RenderPriority
+from api.tts_segmenter import split_segments
+from api.mixer import MixerEngine, BufferSource, StreamSource, DecoderSource, WavFileSource, SequenceSource, PlaylistSource, MIXER_RATE, decode_file
+from api.sound_bank import SoundBank
+from api.seek_index import SeekIndex
+from api.media_library import MediaLibrary
+from api.media_store import MediaStore
+from api.loudness import LoudnessAnalyzer
+from api.transcoder import Transcoder
+from api.blob_store import BlobStore
+from api.prerender import Prerenderer
+from api.siren import SirenSource
+from api.device_registry import DeviceRegistry
+from api.proc_utils import popen_group, terminate_groups
+from api.zone_routing import ZoneRouter
+from api.jitter_buffer import JitterBufferSource
+from api.voice_codec import make_decoder
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+PLAYBACK_GAIN = 0.9            # Same headroom the old `play -v 0.9` calls used
+STREAM_DECODE_MIN_BYTES = 2 * 1024 * 1024  # Larger files are decoded progressively instead of into RAM
+SIREN_PATTERN = 'sweep'         # Default siren: 'sweep' (600-1200 Hz rising, 1 s), 'wail', 'yelp' or 'hilo'
+SIREN_SET_RAMP_SECONDS = 0.01  # Direct volume changes are smoothed over 10 ms (no zipper noise)
+DUCK_ENABLED = True            # Announcements duck background music instead of stopping it
+DUCK_DEPTH_DB = -15.0          # Background level under an announcement, relative to normal
+DUCK_ATTACK_SECONDS = 0.3      # Ramp down when the announcement starts
+DUCK_RELEASE_SECONDS = 1.5     # Ramp back up after it ends
+
 class AudioService:
     def __init__(self):
         self.current_process = None
-        self.stream_process = None # Legacy (Keep to prevent AttributeErrors if referenced elsewhere briefly)
-        self.stream_processes = [] # NEW: List of open pipes for Multizone
-        self._lock = threading.Lock()
+        self.stream_source = None # Live voice source in the mixer (jitter buffered)
+        self.stream_history = deque(maxlen=20) # Jitter/loss stats of recent live broadcasts
         self._lock = threading.Lock()
         self.stream_lock = threading.Lock()
         self.proc_lock = threading.Lock()
@@ -26,21 +55,90 @@ class AudioService:
         # SIREN STATE
         self._siren_active = False
         self._siren_volume = 0.3
-        self._siren_thread = None
-        self._siren_stop_event = threading.Event()
+        self._siren_source = None
+        
+        # BACKGROUND PLAYLIST (position survives stop() so a suspend can save it)
+        self._background_source = None
+        
+        # DUCKING (background keeps decoding at reduced gain under announcements; stop() spares it)
+        self.ducking = {'enabled': DUCK_ENABLED, 'depth_db': DUCK_DEPTH_DB,
+                        'attack': DUCK_ATTACK_SECONDS, 'release': DUCK_RELEASE_SECONDS}
+        self._ducked_source = None
+        
+        # In-process Mixer (one decode per source, one stereo stream per card)
+        self.mixer = MixerEngine()
         
         # Paths
         self.root_dir = Path(__file__).resolve().parent.parent
         self.base_dir = self.root_dir / "piper_tts"
         self.system_sounds_dir = self.root_dir / "system_sounds"
+        self.media_dir = self.root_dir / "media"
+        
+        # Seek Index: per-track frame tables so seek/resume starts decoding at the offset
+        self.seek_index = SeekIndex(self.media_dir / ".index")
+        # Media Library: SQLite index of media/, rescanned incrementally (also builds seek tables)
+        self.media_library = MediaLibrary(self.media_dir, seek_index=self.seek_index)
+        # Media Store: content-addressed blobs + resumable uploads (names in media/ are hard links)
+        self.media_store = MediaStore(self.media_dir)
+        # Loudness: EBU R128 measured once per track in worker processes, applied as a gain at playback
+        self.loudness = LoudnessAnalyzer(self.media_library)
+        self.media_library.analyzer = self.loudness
+        # Transcoder: every track gets a 48 kHz stereo WAV playback copy; background music waits for it
+        self.transcoder = Transcoder(self.media_library, self.media_dir / ".playback")
+        self.media_library.transcoder = self.transcoder
+        self.media_library.start_watching()
+        # Schedule Audio: recorded announcements by content hash (Firestore/tasks only carry the hash)
+        self.schedule_audio = BlobStore(self.root_dir / "schedule_audio")
+        for leftover in self.system_sounds_dir.glob("temp_broadcast_*"):
+            leftover.unlink(missing_ok=True)  # Decoded copies the old base64 playback path never deleted
         
         # Piper Setup
         self.os_type = platform.system()
         self.piper_exe = self._find_piper_executable()
         self.voices = self._scan_voices()
         
-        # ZONE CONFIGURATION
-        self.zones_config = self._load_zones_config()
+        # TTS Render Cache (piper_tts/cache)
+        self.tts_cache = TTSCache(self.base_dir / "cache")
+        
+        # Lookahead: schedules due soon are rendered + joined with the intro ahead of time (piper_tts/prepared)
+        self.prerender = Prerenderer(self, self.base_dir / "prepared")
+        self._first_sample_waiters = []  # One-shot fn(audible_at) for the next source that starts
+        self._first_sample_lock = threading.Lock()
+        self.mixer.on_start = self._on_source_start
+        
+        # Warm Piper Workers (voice models stay loaded between utterances)
+        self.piper_pool = None
+        if self.piper_exe and self.voices:
+            try:
+                self.piper_pool = PiperPool(self.piper_exe, self.voices, self.base_dir)
+            except Exception as e:
+                print(f"[AudioService] Piper pool unavailable, using one-shot Piper: {e}")
+        
+        # TTS Streaming (Piper raw PCM -> zone pipes, no intermediate WAV)
+        # Set False to always render the whole WAV first (file path).
+        self.tts_streaming = True
+        self._tts_latency_lock = threading.Lock()
+        self.tts_latency = {}  # path -> {'count', 'last', 'avg', 'min', 'max'} (seconds)
+        self.stop_latency = {'count': 0, 'last': None, 'avg': None, 'max': None}  # stop() wall time (seconds)
+        
+        # ZONE CONFIGURATION (compiled routing table, rebuilt when zones_config.json changes)
+        self.zone_router = ZoneRouter(self.root_dir / "zones_config.json")
+        
+        # Persistent Card Sinks: opened once, idle on silence, fed on demand
+        # Sound Bank: system_sounds/ decoded once into RAM, reloaded when files change
+        self.sound_bank = None
+        # Device Registry: ALSA controls discovered once, re-applied only on drift/hotplug
+        self.device_registry = None
+        if self.os_type != "Windows":
+            self.device_registry = DeviceRegistry()
+            self.device_registry.refresh()
+            self.device_registry.start_watching()
+            self.mixer.open_sinks(self._config_cards())
+            self.zone_router.on_change(self._on_zones_changed)
+            self.device_registry.on_change(self._on_cards_changed)
+            self.zone_router.start_watching()
+            self.sound_bank = SoundBank(self.system_sounds_dir)
+            self.sound_bank.start_watching()
         
         if not self.piper_exe:
             print("[AudioService] Warning: Piper TTS not found. Using System Fallback.")
@@ -54,17 +152,26 @@ class AudioService:
             if proc in self.active_processes:
                 self.active_processes.remove(proc)
 
-    def _load_zones_config(self):
-        """Loads zone mapping from zones_config.json"""
-        try:
-            config_path = Path(__file__).resolve().parent.parent / "zones_config.json"
-            if config_path.exists():
-                with open(config_path, 'r') as f:
-                    print(f"[AudioService] Loaded zones from {config_path}")
-                    return json.load(f)
-        except Exception as e:
-            print(f"[AudioService] Failed to load zones: {e}")
-        return {}
+    @property
+    def zones_config(self):
+        """Raw zones_config.json of the current routing table"""
+        return self.zone_router.table.config
+
+    def _config_cards(self):
+        """All card ids referenced by zones_config.json (default Card 2 if empty)."""
+        return self.zone_router.table.cards
+
+    def _on_zones_changed(self, table):
+        """Zones rebuilt: open sinks for new cards, close the ones no zone uses anymore."""
+        self.mixer.close_sinks(self.mixer.persistent - set(table.cards))
+        self.mixer.open_sinks(table.cards)
+
+    def _on_cards_changed(self, added, removed):
+        """Hotplug: drop sinks of unplugged cards, reopen configured ones that came back."""
+        self.mixer.close_sinks(removed)
+        returned = [c for c in added if c in self._config_cards()]
+        if returned:
+            self.mixer.open_sinks(returned)
 
     def _find_piper_executable(self):
         """Finds the piper executable."""
@@ -111,15 +218,38 @@ class AudioService:
             
         return voices
 
-    def _generate_piper_audio(self, text, voice_key="female"):
-        """Generates WAV file using Piper. Returns path to WAV or None."""
+    def _generate_piper_audio(self, text, voice_key="female", priority=RenderPriority.SCHEDULE, split=True):
+        """Generates WAV file using Piper (or reuses a cached render). Returns path to WAV or None."""
         if not self.piper_exe or voice_key not in self.voices:
             return None
             
         model_path = self.voices[voice_key]
-        output_file = self.base_dir / f"tts_{uuid.uuid4().hex}.wav"
+        
+        # 1. Cache Lookup (Repeated schedules / scripts play instantly)
+        cache_key = self.tts_cache.make_key(text, model_path)
+        cached = self.tts_cache.lookup(cache_key)
+        if cached:
+            print(f"[AudioService] TTS Cache Hit ({cache_key[:12]})")
+            return cached
+        
+        output_file = self.tts_cache.staging_path(cache_key)
         
         try:
+            # 2. Long Text: render sentences on several workers at once, then join in order
+            segments = split_segments(text) if split else [text]
+            if len(segments) > 1 and self.piper_pool and self.piper_pool.available(model_path):
+                parts = [wait() for wait in self._submit_segments(segments, voice_key, priority)]
+                if all(parts) and self._concat_wavs(parts, output_file):
+                    return self.tts_cache.store(cache_key, output_file, text=text, voice=voice_key)
+                print("[AudioService] Segmented render failed, rendering as one utterance")
+            
+            # 3. Warm Worker Pool (Preferred)
+            if self.piper_pool and self.piper_pool.available(model_path):
+                if self.piper_pool.render(text, model_path, output_file, priority=priority):
+                    return self.tts_cache.store(cache_key, output_file, text=text, voice=voice_key)
+                print("[AudioService] Piper pool render failed, falling back to one-shot Piper")
+            
+            # 4. One-shot Process (Fallback)
             cmd = [self.piper_exe, "--model", model_path, "--output_file", str(output_file)]
             
             process = subprocess.Popen(
@@ -132,33 +262,244 @@ class AudioService:
             stdout, stderr = process.communicate(input=text)
             
             if process.returncode == 0 and output_file.exists():
-                return str(output_file)
+                # Commit render to cache
+                return self.tts_cache.store(cache_key, output_file, text=text, voice=voice_key)
             else:
                 print(f"[AudioService] Piper Error: {stderr}")
                 return None
         except Exception as e:
             print(f"[AudioService] Piper Exception: {e}")
             return None
+        finally:
+            # Remove partial render on failure
+            if output_file.exists():
+                try: output_file.unlink()
+                except OSError: pass
 
-    def play_announcement(self, intro_path, text, voice="female", zones=[], skip_stop=False):
+    def _submit_segments(self, segments, voice_key, priority):
+        """
+        Queues every uncached segment on the Piper pool at once (parallel render).
+        Returns one callable per segment, in order, that blocks and returns its WAV path (or None).
+        """
+        model_path = self.voices[voice_key]
+        waiters = []
+        for segment in segments:
+            key = self.tts_cache.make_key(segment, model_path)
+            cached = self.tts_cache.lookup(key)
+            if cached:
+                waiters.append(lambda path=cached: path)
+                continue
+
+            staging = self.tts_cache.staging_path(key)
+            job = self.piper_pool.submit(segment, model_path, staging, priority=priority)
+
+            def wait(job=job, key=key, staging=staging, segment=segment):
+                if job and self.piper_pool.wait(job, model_path) and staging.exists():
+                    return self.tts_cache.store(key, staging, text=segment, voice=voice_key)
+                # Pool failed for this piece: render it on its own
+                return self._generate_piper_audio(segment, voice_key, priority=priority, split=False)
+            waiters.append(wait)
+        return waiters
+
+    @staticmethod
+    def _concat_wavs(paths, output_file):
+        """Joins WAV segments back-to-back (gapless, same format) into output_file."""
+        try:
+            with wave.open(str(output_file), 'wb') as out:
+                for i, path in enumerate(paths):
+                    with wave.open(str(path), 'rb') as part:
+                        if i == 0:
+                            out.setparams(part.getparams())
+                        out.writeframes(part.readframes(part.getnframes()))
+            return True
+        except Exception as e:
+            print(f"[AudioService] Failed to join TTS segments: {e}")
+            return False
+
+    def play_announcement(self, intro_path, text, voice="female", zones=[], skip_stop=False, priority=RenderPriority.SCHEDULE):
         """Plays Intro + TTS on specific zones"""
         if not skip_stop:
             self.stop()
         print(f"[AudioService] Announcement: '{text}' -> Zones: {zones}")
+        request_time = time.time()
+        
+        # 1. Determine Output Devices
+        target_cards = self._get_target_cards(zones)
         
-        # 1. Generate TTS
-        wav_path = self._generate_piper_audio(text, voice)
+        # 2. Streaming Path (Uncached text: first words play while the rest is synthesized)
+        if self._can_stream_tts(voice) and not self.tts_cache.contains(self.tts_cache.make_key(text, self.voices[voice])):
+            if self._stream_announcement(intro_path, text, voice, target_cards, request_time, priority=priority):
+                return
+            print("[AudioService] TTS streaming failed, falling back to file render")
+        
+        # 3. File Path: Generate TTS (or reuse cached render)
+        wav_path = self._generate_piper_audio(text, voice, priority=priority)
         if not wav_path:
             # System Fallback (Windows only usually)
             self.play_text(text, voice) 
             return
-
-        # 2. Determine Output Devices
-        target_cards = self._get_target_cards(zones)
+        self._record_ttfs('file', time.time() - request_time)
         
-        # 3. Play on Targets
+        # 4. Play on Targets
         self._play_multizone(intro_path, wav_path, target_cards)
 
+    def _can_stream_tts(self, voice_key):
+        return (self.tts_streaming and self.os_type != "Windows"
+                and bool(self.piper_exe) and voice_key in self.voices)
+
+    def _voice_sample_rate(self, model_path):
+        """Reads the sample rate from the voice's .onnx.json (Piper medium voices are 22050 Hz)."""
+        try:
+            with open(f"{model_path}.json", 'r') as f:
+                return int(json.load(f)['audio']['sample_rate'])
+        except Exception:
+            return 22050
+
+    def _stream_announcement(self, intro, text, voice_key, targets, request_time, priority=RenderPriority.SCHEDULE):
+        """
+        Pipes TTS PCM straight into the zone pipes as it is produced.
+        - Warm Piper pool: sentences render in parallel (a single sentence on one warm
+          worker, no model load) and play in order.
+        - No pool for this voice: a raw-output Piper process streams sentence by sentence.
+        The audio is also captured into the TTS cache so the next play is a file hit.
+        Returns False if nothing could be streamed (caller falls back to file path).
+        """
+        model_path = self.voices[voice_key]
+        rate = self._voice_sample_rate(model_path)
+        cache_key = self.tts_cache.make_key(text, model_path)
+        staging = self.tts_cache.staging_path(cache_key)
+        self.tts_cache.record_miss()
+
+        # Producer -> pump: PCM chunks in play order, None marks the end
+        chunks = queue.Queue()
+        state = {'first_at': None, 'complete': False}
+
+        def put(data):
+            if data and state['first_at'] is None:
+                state['first_at'] = time.time()
+            chunks.put(data)
+
+        segments = split_segments(text) or [text]
+        capture = True
+        if self.piper_pool and self.piper_pool.available(model_path):
+            path_name = 'stream_parallel' if len(segments) > 1 else 'stream_pool'
+            waiters = self._submit_segments(segments, voice_key, priority)
+            # A lone segment is cached under this same key by its own render (and shares the staging file)
+            capture = self.tts_cache.make_key(segments[0], model_path) != cache_key or len(segments) > 1
+
+            def producer():
+                try:
+                    for wait in waiters:
+                        part = wait()
+                        if not part:
+                            return
+                        with wave.open(part, 'rb') as wf:
+                            put(wf.readframes(wf.getnframes()))
+                    state['complete'] = True
+                except Exception as e:
+                    print(f"[AudioService] Segment Stream Exception: {e}")
+                finally:
+                    put(None)
+        else:
+            # Last resort (no warm worker for this voice): one-shot process, model loaded cold
+            path_name = 'stream'
+            try:
+                piper = popen_group(
+                    [self.piper_exe, "--model", model_path, "--output-raw"],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL
+                )
+                self._track_process(piper)
+                piper.stdin.write(text.encode('utf-8'))
+                piper.stdin.close()
+            except Exception as e:
+                print(f"[AudioService] Piper Stream Exception: {e}")
+                return False
+
+            def producer():
+                fd = piper.stdout.fileno()
+                try:
+                    while True:
+                        try: data = os.read(fd, 4096)
+                        except OSError: data = b''
+                        if not data:
+                            break
+                        put(data)
+                    piper.wait()
+                    state['complete'] = piper.returncode == 0
+                finally:
+                    self._untrack_process(piper)
+                    put(None)
+
+        threading.Thread(target=producer, daemon=True).start()
+
+        # 1. Intro + streamed body as one gapless source (synthesis runs while the intro plays)
+        routes = self._group_targets(targets)
+        for card_id in routes:
+            self._ensure_device_active(card_id)
+        body = StreamSource(rate, channels=1, name="tts")
+        parts = [body]
+        if intro:
+            try: parts.insert(0, self._load_source(intro))
+            except Exception as e: print(f"[AudioService] Intro Decode Error: {e}")
+        source = self.mixer.play(SequenceSource(parts, gain=PLAYBACK_GAIN, name="announcement"), routes)
+
+        # 2. Body: feed PCM to the mixer as it arrives
+        written = 0
+        writer = wave.open(str(staging), 'wb') if capture else None
+        try:
+            if writer:
+                writer.setnchannels(1)
+                writer.setsampwidth(2)
+                writer.setframerate(rate)
+            while not source.stopped:
+                try: data = chunks.get(timeout=0.5)
+                except queue.Empty: continue
+                if data is None:
+                    break
+                if writer:
+                    writer.writeframes(data)
+                written += len(data)
+                body.push_pcm(data)
+        finally:
+            if writer:
+                writer.close()
+        body.close()
+        source.done.wait()
+
+        if state['first_at'] is None:
+            if capture:
+                try: staging.unlink()
+                except OSError: pass
+            return False
+
+        self._record_ttfs(path_name, state['first_at'] - request_time)
+        if not capture:
+            return True  # The pool render already went into the cache
+        if state['complete'] and not source.stopped and written:
+            self.tts_cache.store(cache_key, staging, text=text, voice=voice_key)
+        else:
+            try: staging.unlink()
+            except OSError: pass
+        return True
+
+    def _record_ttfs(self, path, seconds):
+        """Tracks time from announcement request to the first TTS sample being ready."""
+        with self._tts_latency_lock:
+            m = self.tts_latency.setdefault(path, {'count': 0, 'last': None, 'avg': None, 'min': None, 'max': None})
+            m['count'] += 1
+            m['last'] = round(seconds, 3)
+            m['avg'] = round(seconds if m['avg'] is None else m['avg'] + (seconds - m['avg']) / m['count'], 3)
+            m['min'] = m['last'] if m['min'] is None else min(m['min'], m['last'])
+            m['max'] = m['last'] if m['max'] is None else max(m['max'], m['last'])
+        print(f"[AudioService] TTS time-to-first-sample ({path}): {seconds:.3f}s")
+
+    def get_tts_latency(self):
+        with self._tts_latency_lock:
+            return {'streaming_enabled': self.tts_streaming,
+                    'paths': {k: dict(v) for k, v in self.tts_latency.items()}}
+
     def play_wav(self, intro_path, wav_path, zones=[], skip_stop=False):
         """Plays an existing WAV/MP3 file on specific zones"""
         if not skip_stop:
@@ -168,184 +509,123 @@ class AudioService:
         target_cards = self._get_target_cards(zones)
         self._play_multizone(intro_path, wav_path, target_cards)
 
+    def play_prepared(self, wav_path, zones=[]):
+        """Plays a prepared (intro + body, 48 kHz stereo) WAV straight from disk. Blocks until finished."""
+        if self.os_type == "Windows":
+            self.play_file(wav_path)
+            return
+        self.stop()
+        print(f"[AudioService] Playing Prepared: '{os.path.basename(str(wav_path))}' -> Zones: {zones}")
+        targets = self._get_target_cards(zones)
+        routes = self._group_targets(targets)
+        for card_id in routes:
+            self._ensure_device_active(card_id)
+        source = self.mixer.play(WavFileSource(wav_path, gain=PLAYBACK_GAIN, name="prepared"), routes)
+        source.done.wait()
+
+    def expect_first_sample(self, callback):
+        """
+        callback(audible_at) fires once, when the next source (not background music) reaches the sinks.
+        Returns the callback as a handle for cancel_first_sample().
+        """
+        with self._first_sample_lock:
+            self._first_sample_waiters.append(callback)
+        return callback
+
+    def cancel_first_sample(self, callback=None):
+        """Drops one pending first-sample callback (or all) - the audio it waited for never started."""
+        with self._first_sample_lock:
+            if callback is None:
+                self._first_sample_waiters.clear()
+            elif callback in self._first_sample_waiters:
+                self._first_sample_waiters.remove(callback)
+
+    def _on_source_start(self, source, audible_at):
+        if source is self._background_source or not self._first_sample_waiters:
+            return
+        with self._first_sample_lock:
+            waiters, self._first_sample_waiters = self._first_sample_waiters, []
+        for callback in waiters:
+            try: callback(audible_at)
+            except Exception as e: print(f"[AudioService] First-sample callback failed: {e}")
+
     def _get_target_cards(self, zones):
-        """Maps logical zones (names) to targets [{'card': int, 'channel': str/None}]"""
-        targets = []
-        seen = set()
-
-        print(f"[AudioService] Mapping Zones: {zones}")
-        
-        # Helper to add unique targets
-        def add_target(val):
-            card = val
-            channel = None
-            if isinstance(val, dict):
-                card = val.get('card', 2)
-                channel = val.get('channel')
-            
-            key = (card, channel)
-            if key not in seen:
-                seen.add(key)
-                targets.append({'card': card, 'channel': channel})
-
-        # Logic
-        if not zones or "All Zones" in zones:
-            for v in self.zones_config.values():
-                if isinstance(v, list):
-                    for item in v: add_target(item)
-                else: 
-                    add_target(v)
-        else:
-            for z in zones:
-                found = False
-                for config_name, val in self.zones_config.items():
-                    if z.lower() in config_name.lower():
-                        if isinstance(val, list):
-                            for item in val: add_target(item)
-                        else:
-                            add_target(val)
-                        found = True
-                if not found:
-                     print(f"[AudioService] Warning: Zone '{z}' not found")
-
-        if not targets:
-            print("[AudioService] Defaulting to Card 2 (Stereo)")
-            add_target(2)
-            
-        print(f"[AudioService] Final Targets: {targets}")
-        return targets
+        """Maps logical zones (names) to targets [{'card': int, 'channel': str/None}] via the routing table"""
+        return self.zone_router.resolve(zones)
 
     def _ensure_device_active(self, card_id):
-        """Forces the card to be unmuted and at 100% volume."""
+        """Makes sure the card is unmuted and at 100% volume (cached; amixer only runs on drift)."""
+        if not self.device_registry: return
         try:
-            # Common control names
-            controls = ["Speaker", "PCM", "Master", "Headphone", "Playback"]
-            for c in controls:
-                subprocess.run(['amixer', '-c', str(card_id), 'set', c, '100%', 'unmute'], 
-                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        except: pass
+            self.device_registry.ensure_active(card_id)
+        except Exception as e:
+            print(f"[AudioService] Device check failed for card {card_id}: {e}")
 
     def _play_multizone(self, intro, body, targets, start_time=0):
-        """Plays audio sequence on list of targets (Linux) or default (Windows)"""
+        """Plays audio sequence on list of targets (Linux) or default (Windows). Blocks until finished."""
         
         if self.os_type == "Windows":
             print("[AudioService] Windows Mode: Playing on Default Device")
-            self._play_sequence_windows(intro, body)
+            self._play_sequence_windows(self._clip_path(intro), body)
             return
 
-        # Linux / Raspberry Pi
-        
-        # 1. Cleaning Targets
-        clean_targets = []
-        for t in targets:
-            if isinstance(t, int): clean_targets.append({'card': t, 'channel': None})
-            else: clean_targets.append(t)
-
-        # 2. Group by Card ID (Optimization for Single-Card Sync)
-        # We merge 'left' and 'right' requests for the same card into a single 'stereo' request
-        grouped_targets = {}
-        for t in clean_targets:
-            card = t['card']
-            channel = t.get('channel')
-            
-            if card not in grouped_targets:
-                grouped_targets[card] = set()
-            
-            if channel: 
-                grouped_targets[card].add(channel)
-            else:
-                grouped_targets[card].add('stereo') # Explicit stereo/both
-
-        threads = []
-        
-        for card_id, channels in grouped_targets.items():
-            # Determine effective channel mode for this card process
-            # If 'stereo' is present, or BOTH 'left' and 'right' are present -> Play Stereo (No Remix or Standard Remix)
-            # If only 'left' -> Remix Left
-            # If only 'right' -> Remix Right
-            
-            mode = None
-            if 'stereo' in channels or ('left' in channels and 'right' in channels):
-                mode = None # Standard Stereo (or 'remix 1 2' implicit)
-            elif 'left' in channels:
-                mode = 'left'
-            elif 'right' in channels:
-                mode = 'right'
-            
-            # AUTO-FIX
+        # Linux / Raspberry Pi: decode once, mix to every card/channel in-process
+        routes = self._group_targets(targets)
+        for card_id in routes:
             self._ensure_device_active(card_id)
-            
-            print(f"[AudioService] Launching Process for Card {card_id} Mode: {mode or 'Stereo (Merged)'}")
-            
-            t = threading.Thread(target=self._play_sequence_linux, args=(intro, body, card_id, mode, start_time))
-            threads.append(t)
-            t.start()
-            # Slight stagger only between DIFFERENT CARDS to prevent power spike
-            if len(grouped_targets) > 1:
-                time.sleep(0.05) 
-        
-        for t in threads:
-            t.join()
 
-    def _play_sequence_linux(self, intro, body, card_id, channel=None, start_time=0):
-        """Plays Intro (Optional) -> Body on specific ALSA card + Channel remix"""
-        
-        # Check for SoX
-        has_sox = False
         try:
-            subprocess.run(['which', 'play'], stdout=subprocess.DEVNULL, check=True)
-            has_sox = True
-        except: pass
+            parts = []
+            if intro: parts.append(self._load_source(intro))
+            if body: parts.append(self._load_source(body, start_time=start_time))
+        except Exception as e:
+            print(f"[AudioService] Decode Error: {e}")
+            return
 
-        device = f"plughw:{card_id},0"
-        
-        try:
-            if has_sox:
-                env = os.environ.copy()
-                env["AUDIODEV"] = device
-                
-                # Channel REMIX logic
-                # remix 1 0 = Left Only (Channel 1)
-                # remix 0 1 = Right Only (Channel 2)
-                # remix 1 1 = Mono to Both
-                # Default (No flag) = Stereo
-                remix_flags = []
-                if channel == "left": remix_flags = ['remix', '1', '0']
-                elif channel == "right": remix_flags = ['remix', '0', '1']
-
-                print(f"[AudioService] SoX Play {device} (Ch: {channel or 'Stereo'})")
-                
-                # Force 2 Channels Output so 'remix' 1 0 / 0 1 works reliably
-                # NOTE: Only use -c 2 if putting it AFTER input, but play syntax is tricky.
-                # Safer to let SoX handle input format and just use remix.
-                base_args = ['-v', '0.9']
-
-                # 1. Intro
-                if intro:
-                    cmd = ['play'] + base_args + [intro] + remix_flags
-                    p = subprocess.Popen(cmd, env=env)
-                    self._track_process(p)
-                    p.wait()
-                    self._untrack_process(p)
-                
-                # 2. Body
-                if body:
-                    cmd = ['play'] + base_args + [body]
-                    if start_time > 0: cmd.extend(['trim', str(start_time)])
-                    cmd = cmd + remix_flags
-                    
-                    p = subprocess.Popen(cmd, env=env)
-                    self._track_process(p)
-                    p.wait()
-                    self._untrack_process(p)
+        print(f"[AudioService] Mixing to Cards: {routes}")
+        source = self.mixer.play(SequenceSource(parts, gain=PLAYBACK_GAIN, name=os.path.basename(str(body or intro))), routes)
+        source.done.wait()
+
+    def _load_source(self, path, start_time=0):
+        """
+        System sounds come from the in-memory bank. Other small files are decoded
+        fully into memory; long tracks stream through a background decoder.
+        Media tracks play from their transcoded copy (streamed, no decoding) and
+        carry their stored loudness correction as the source gain.
+        """
+        clip = self.sound_bank.get(path) if self.sound_bank and not start_time else None
+        if clip is not None:
+            return BufferSource(clip, name=self.sound_bank.resolve(path))
+        path = self._clip_path(path)
+        gain = self.media_library.gain(path)
+        playback = self.media_library.playback_path(path)
+        if playback:
+            return WavFileSource(playback, start_time=start_time, gain=gain, name=os.path.basename(str(path)))
+        seek = self.seek_index.locate(path, start_time) if start_time > 0 else None
+        if seek or os.path.getsize(path) >= STREAM_DECODE_MIN_BYTES:
+            return DecoderSource(path, start_time=start_time, seek=seek, gain=gain)
+        return BufferSource(decode_file(path, start_time=start_time), gain=gain, name=os.path.basename(str(path)))
+
+    @staticmethod
+    def _group_targets(targets):
+        """
+        Merges 'left' and 'right' requests for the same card into a single stereo request.
+        Returns {card_id: mode} where mode is 'left', 'right' or None (stereo).
+        """
+        grouped = {}
+        for t in targets:
+            if isinstance(t, int): t = {'card': t, 'channel': None}
+            grouped.setdefault(t['card'], set()).add(t.get('channel') or 'stereo')
+
+        modes = {}
+        for card_id, channels in grouped.items():
+            if 'stereo' in channels or ('left' in channels and 'right' in channels):
+                modes[card_id] = None # Standard Stereo
+            elif 'left' in channels:
+                modes[card_id] = 'left'
             else:
-                # Fallback Aplay (No Remix support)
-                print(f"[AudioService] Aplay Fallback (No Channel Split) on {device}")
-                if intro: subprocess.run(['aplay', '-D', device, intro], check=True)
-                if body: subprocess.run(['aplay', '-D', device, body], check=True)
-            
-        except Exception as e:
-            print(f"[AudioService] Playback Error {card_id}: {e}")
+                modes[card_id] = 'right'
+        return modes
 
     def _play_sequence_windows(self, intro, body):
         """Windows Powershell sequence"""
@@ -371,7 +651,7 @@ class AudioService:
     def play_text(self, text: str, voice: str = "female"):
         """Simple text playback (Testing/Emergency)"""
         self.stop()
-        wav = self._generate_piper_audio(text, voice)
+        wav = self._generate_piper_audio(text, voice, priority=RenderPriority.REALTIME)
         if wav:
             # Default to Card 0 for simple tests
             if self.os_type == "Windows":
@@ -385,230 +665,240 @@ class AudioService:
         # This is now legacy/unused for raw streaming but kept for safety
         pass
 
-    def start_streaming(self, zones):
-        """Initializes persistent play pipes for low-latency streaming on ALL target zones"""
+    def start_streaming(self, zones, codec='pcm16'):
+        """Opens a live voice source in the mixer for low-latency streaming on ALL target zones"""
         self.stop_streaming() # Stop existing
         targets = self._get_target_cards(zones)
         if not targets: return
         
-        print(f"[AudioService] Starting Stream Pipes on: {targets}")
+        routes = self._group_targets(targets)
+        print(f"[AudioService] Starting Live Stream on: {routes}")
+        for card_id in routes:
+            self._ensure_device_active(card_id)
+        
+        try:
+            decoder = make_decoder(codec)
+        except ValueError as e:
+            print(f"[AudioService] {e}, expecting raw PCM")
+            decoder = make_decoder('pcm16')
         
         with self.stream_lock:
-            self.stream_processes = []
-            
-            clean_targets = []
-            for t in targets:
-                if isinstance(t, int): clean_targets.append({'card': t, 'channel': None})
-                else: clean_targets.append(t)
-
-            for target in clean_targets:
-                 card_id = target['card']
-                 channel = target.get('channel')
-
-                 self._ensure_device_active(card_id) 
-                 time.sleep(0.05) 
-                 device = f"plughw:{card_id},0"
-                 
-                 # Remix Logic for Stream
-                 remix_flags = []
-                 if channel == "left": remix_flags = ['remix', '1', '0']
-                 elif channel == "right": remix_flags = ['remix', '0', '1']
-
-                 try:
-                    print(f"  -> Opening Pipe for {device} (Ch: {channel})")
-                    env = os.environ.copy()
-                    env["AUDIODEV"] = device
-                    
-                    # -c 1 (Input is mono 16k)
-                    cmd = ['play', '-q', '-v', '0.9', '-t', 'raw', '-r', '16000', '-e', 'signed-integer', '-b', '16', '-c', '1', '-']
-                    cmd = cmd + remix_flags
-                    
-                    proc = subprocess.Popen(
-                        cmd,
-                        stdin=subprocess.PIPE,
-                        stderr=subprocess.DEVNULL,
-                        env=env
-                    )
-                    self.stream_processes.append(proc)
-                 except Exception as e:
-                    print(f"  -> Failed to open pipe for {device}: {e}")
-
-    def feed_stream(self, pcm_data):
-        """Feeds raw PCM bytes into ALL open audio pipes"""
-        with self.stream_lock:
-             if self.stream_processes:
-                 dead_procs = []
-                 for i, proc in enumerate(self.stream_processes):
-                     try:
-                         if proc.stdin:
-                             proc.stdin.write(pcm_data)
-                             proc.stdin.flush()
-                     except Exception as e:
-                         # Broken pipe?
-                         dead_procs.append(proc)
-                 
-                 # Cleanup dead pipes silently
-                 for p in dead_procs:
-                     if p in self.stream_processes:
-                         self.stream_processes.remove(p)
+            # Input is mono 16k from the browser (raw PCM or Opus, decoded here)
+            source = JitterBufferSource(16000, channels=1, gain=PLAYBACK_GAIN, name="live", decoder=decoder)
+            source.zones = list(zones or [])
+            self.stream_source = self.mixer.play(source, routes)
+
+    def feed_stream(self, frame, seq=None, timestamp=None):
+        """
+        Feeds one client frame (raw PCM or the negotiated codec) into the live voice source.
+        seq/timestamp (capture time, ms) let the jitter buffer reorder and conceal gaps.
+        """
+        source = self.stream_source
+        if source and not source.stopped:
+            source.push(frame, seq=seq, timestamp=timestamp)  # Decoded in playout order by the jitter buffer
+
+    def stream_codec(self):
+        source = self.stream_source
+        return source.decoder.codec if source else None
 
     def stop_streaming(self):
-        """Closes all streaming pipes"""
+        """Closes the live voice source"""
         with self.stream_lock:
-            # Close Multi-proc list
-            if self.stream_processes:
-                 print(f"[AudioService] Closing {len(self.stream_processes)} Stream Pipes")
-                 for proc in self.stream_processes:
-                     try:
-                         proc.stdin.close()
-                         proc.terminate()
-                     except: pass
-                 self.stream_processes = []
-            
-            # Legacy cleanup
-            if self.stream_process:
-                try: 
-                    self.stream_process.stdin.close()
-                    self.stream_process.terminate()
-                except: pass
-                self.stream_process = None
-
+            if self.stream_source:
+                print("[AudioService] Closing Live Stream")
+                self.stream_history.appendleft(self._stream_stats(self.stream_source))
+                self.mixer.remove(self.stream_source)
+                self.stream_source = None
+
+    def _stream_stats(self, source):
+        return {'zones': source.zones, 'started': source.started_at, **source.stats(),
+                'decode': source.decoder.stats()}
+
+    def get_stream_stats(self):
+        """Jitter buffer stats for the live broadcast (if any) and recent ones"""
+        source = self.stream_source
+        return {
+            'current': self._stream_stats(source) if source else None,
+            'recent': list(self.stream_history)
+        }
+
+    def _clip_path(self, clip):
+        """Resolves a clip name ('intro') to its file in system_sounds/. Paths pass through."""
+        if not clip or os.path.sep in str(clip) or Path(str(clip)).suffix:
+            return clip
+        if self.sound_bank and self.sound_bank.path(clip):
+            return self.sound_bank.path(clip)
+        matches = sorted(self.system_sounds_dir.glob(f"{clip}.*"))
+        return str(matches[0]) if matches else clip
+
+    def play_clip(self, name, zones, wait=True):
+        """Plays a system sound by name (e.g. 'intro') from the in-memory bank."""
+        targets = self._get_target_cards(zones)
+        if self.os_type == "Windows":
+            path = self._clip_path(name)
+            if os.path.exists(str(path)): self.play_file(path)
+            return None
 
+        pcm = self.sound_bank.get(name) if self.sound_bank else None
+        if pcm is None:
+            print(f"[AudioService] Unknown clip: {name}")
+            return None
+        for card_id in self._group_targets(targets):
+            self._ensure_device_active(card_id)
+        source = self.mixer.play(BufferSource(pcm, gain=PLAYBACK_GAIN, name=name), self._group_targets(targets))
+        if wait:
+            source.done.wait()
+        return source
 
     def play_chime_sync(self, zones):
         """Plays the intro chime on specified zones. Blocks until finished."""
-        targets = self._get_target_cards(zones)
-        intro_path = self.system_sounds_dir / "intro.mp3"
-        
-        if not intro_path.exists(): return
-
-        threads = []
-        for t_obj in targets:
-            card_id = t_obj['card'] if isinstance(t_obj, dict) else t_obj
-            channel = t_obj.get('channel') if isinstance(t_obj, dict) else None
+        self.play_clip("intro", zones)
 
-            def play_on_card(cid, ch):
-                device = f"plughw:{cid},0"
-                try:
-                    env = os.environ.copy()
-                    env["AUDIODEV"] = device
-                    
-                    remix_flags = []
-                    if ch == "left": remix_flags = ['remix', '1', '0']
-                    elif ch == "right": remix_flags = ['remix', '0', '1']
-
-                    cmd = ['play', '-q', '-v', '0.9', str(intro_path)] + remix_flags
-                    subprocess.run(cmd, env=env, stderr=subprocess.DEVNULL)
-                except:
-                    pass
-
-            t = threading.Thread(target=play_on_card, args=(card_id, channel))
-            threads.append(t)
-            t.start()
-
-        for t in threads:
-            t.join()
-
-    def play_siren(self, zones=None, volume=0.01):
+    def play_siren(self, zones=None, volume=0.01, pattern=None):
         """Plays a synthetic emergency siren on specified zones (Pi Speakers)"""
         with self._lock:
             if self._siren_active:
                 return # Already playing
+            try:
+                siren = SirenSource(pattern or SIREN_PATTERN, gain=volume)
+            except ValueError as e:
+                print(f"[AudioService] {e}, using {SIREN_PATTERN}")
+                siren = SirenSource(SIREN_PATTERN, gain=volume)
             self._siren_active = True
-            self._siren_stop_event.clear()
             self._siren_volume = volume
         
         targets = self._get_target_cards(zones)
-        print(f"[AudioService] Starting Emergency Siren on: {targets}")
-        
-        def run_siren():
-            while not self._siren_stop_event.is_set():
-                threads = []
-                for t_obj in targets:
-                    card_id = t_obj['card'] if isinstance(t_obj, dict) else t_obj
-                    channel = t_obj.get('channel') if isinstance(t_obj, dict) else None
-
-                    def play_on_card(cid, ch):
-                        device = f"plughw:{cid},0"
-                        env = os.environ.copy()
-                        env["AUDIODEV"] = device
-                        try:
-                            remix_flags = []
-                            if ch == "left": remix_flags = ['remix', '1', '0']
-                            elif ch == "right": remix_flags = ['remix', '0', '1']
-
-                            vol = self._siren_volume
-                            cmd = ['play', '-q', '-v', str(vol), '-n', 'synth', '1', 'sine', '600:1200'] + remix_flags
-                            
-                            p = subprocess.Popen(cmd, env=env, stderr=subprocess.DEVNULL)
-                            self._track_process(p)
-                            p.wait()
-                            self._untrack_process(p)
-                        except: pass
-
-                    t = threading.Thread(target=play_on_card, args=(card_id, channel))
-                    threads.append(t)
-                    t.start()
-                
-                for t in threads:
-                    t.join()
-            
-            print("[AudioService] Siren thread exiting.")
+        print(f"[AudioService] Starting Emergency Siren ({siren.pattern}) on: {targets}")
+        
+        # Synthesized continuously in the mixer (no respawn gaps)
+        self._siren_source = self.mixer.play(siren, self._group_targets(targets))
 
-        self._siren_thread = threading.Thread(target=run_siren, daemon=True)
-        self._siren_thread.start()
+    def set_siren_pattern(self, pattern: str):
+        """Switches the running siren to another pattern without a gap"""
+        with self._lock:
+            if self._siren_source:
+                self._siren_source.set_pattern(pattern)
 
     def set_siren_volume(self, volume: float):
         """Directly sets the siren volume (0.0 to 1.0)"""
         with self._lock:
             self._siren_volume = max(0.0, min(1.0, volume))
+            if self._siren_source:
+                self._siren_source.set_gain(self._siren_volume, SIREN_SET_RAMP_SECONDS)
             print(f"[AudioService] Siren volume set to: {self._siren_volume}")
 
     def ramp_siren_volume(self, target: float, duration: float = 5.0):
-        """Smoothly ramps siren volume to target over duration seconds"""
-        def ramp():
-            start_vol = self._siren_volume
-            steps = 20
-            interval = duration / steps
-            for i in range(1, steps + 1):
-                if self._siren_stop_event.is_set():
-                    break
-                new_vol = start_vol + (target - start_vol) * (i / steps)
-                self.set_siren_volume(new_vol)
-                time.sleep(interval)
-        
-        threading.Thread(target=ramp, daemon=True).start()
+        """Smoothly ramps siren volume to target over duration seconds (per-sample, in the mixer)"""
+        with self._lock:
+            self._siren_volume = max(0.0, min(1.0, target))
+            if self._siren_source:
+                self._siren_source.set_gain(self._siren_volume, duration)
 
     def play_background_music(self, file_path: str, zones: list = None, start_time=0):
-        """Plays background music asynchronously on selected zones"""
+        """
+        Plays background music asynchronously on selected zones.
+        Returns False (and plays nothing) while the track's playback copy isn't ready.
+        """
+        return self.play_background_playlist([file_path], zones=zones, start_time=start_time)
+
+    def play_background_playlist(self, file_paths: list, zones: list = None, start_index=0, start_time=0,
+                                 repeat='off', on_advance=None, on_finish=None):
+        """
+        Plays tracks back-to-back (gapless, next track prefetched) on selected zones.
+        Tracks whose playback copy isn't ready are skipped; returns False if none is playable.
+        on_advance(index) fires at each track change, on_finish() when the playlist runs out.
+        """
+        paths = list(file_paths)
+        playable = [self._is_playable(p) for p in paths]
+        if not any(playable):
+            print(f"[AudioService] Nothing playable yet (still being transcoded): {[os.path.basename(str(p)) for p in paths]}")
+            return False
+        self.stop_background()
         self.stop()
         targets = self._get_target_cards(zones)
-        
-        # Run in a separate thread to avoid blocking the Controller
-        def daemon_play():
-            self._play_multizone(None, file_path, targets, start_time=start_time)
-            
-        t = threading.Thread(target=daemon_play, daemon=True)
-        t.start()
 
-    def _play_single_file_linux(self, file_path, card_id):
-        """Plays a single file on a specific card"""
-        device = f"plughw:{card_id},0"
-        try:
-             # Try SoX first for volume/mixing
-             env = os.environ.copy()
-             env["AUDIODEV"] = device
-             p = subprocess.Popen(['play', '-v', '0.9', file_path], env=env, stderr=subprocess.DEVNULL)
-             self._track_process(p)
-             p.wait()
-             self._untrack_process(p)
-        except:
-             # Fallback to aplay
-             try:
-                subprocess.run(['aplay', '-D', device, file_path], check=True, stderr=subprocess.DEVNULL)
-             except Exception as e:
-                print(f"[AudioService] Playback failed on card {card_id}: {e}")
+        if self.os_type == "Windows":
+            path = paths[start_index] if playable[start_index] else paths[playable.index(True)]
+            threading.Thread(target=self._play_multizone, args=(None, path, targets, start_time), daemon=True).start()
+            return True
 
+        def load(index, offset):
+            if not playable[index]:
+                print(f"[AudioService] Skipping {os.path.basename(str(paths[index]))} (not ready)")
+                return None
+            try:
+                return self._load_source(paths[index], start_time=offset)
+            except Exception as e:
+                print(f"[AudioService] Decode Error ({os.path.basename(str(paths[index]))}): {e}")
+                return None
+
+        # Run in a separate thread to avoid blocking the Controller
+        def daemon_play():
+            routes = self._group_targets(targets)
+            for card_id in routes:
+                self._ensure_device_active(card_id)
+            source = PlaylistSource(load, len(paths), start_index=start_index, start_time=start_time, repeat=repeat,
+                                    gain=PLAYBACK_GAIN, name="background", on_advance=on_advance)
+            self._background_source = source
+            if source.finished:
+                return
+            if source.index != start_index and on_advance:
+                on_advance(source.index)
+            print(f"[AudioService] Mixing Playlist ({len(paths)} track(s), repeat={repeat}) to Cards: {routes}")
+            self.mixer.play(source, routes).done.wait()
+            if source.finished and on_finish:
+                on_finish()
+
+        self._background_source = None
+        threading.Thread(target=daemon_play, daemon=True).start()
+        return True
+
+    def background_position(self):
+        """(playlist index, seconds into the track) of the current/last background playlist, or None."""
+        source = self._background_source
+        return source.position() if source else None
+
+    def set_ducking(self, enabled=None, depth_db=None, attack=None, release=None):
+        """Updates the ducking settings (None keeps a value). Returns the new settings."""
+        for key, value in (('enabled', enabled), ('depth_db', depth_db), ('attack', attack), ('release', release)):
+            if value is not None:
+                self.ducking[key] = bool(value) if key == 'enabled' else float(value)
+        return dict(self.ducking)
+
+    def duck_background(self):
+        """
+        Lowers the playing background music for an announcement. It keeps decoding
+        (no restart, no seek) and stop() leaves it alone until unduck/stop_background.
+        Returns False if ducking is off or nothing is playing.
+        """
+        source = self._background_source
+        if not self.ducking['enabled'] or not source or source.stopped or source.finished \
+                or source not in self.mixer.active_sources():
+            return False
+        self._ducked_source = source
+        source.set_gain(PLAYBACK_GAIN * 10 ** (self.ducking['depth_db'] / 20), self.ducking['attack'])
+        print(f"[AudioService] Ducking background music ({self.ducking['depth_db']} dB)")
+        return True
+
+    def unduck_background(self):
+        """Ramps ducked background music back up. Returns False if it ended meanwhile."""
+        source, self._ducked_source = self._ducked_source, None
+        if not source or source.stopped or source.finished:
+            return False
+        source.set_gain(PLAYBACK_GAIN, self.ducking['release'])
+        print("[AudioService] Restoring background music")
+        return True
+
+    def stop_background(self):
+        """Drops ducked background music (emergency, or a new track replacing it)."""
+        source, self._ducked_source = self._ducked_source, None
+        if source:
+            self.mixer.remove(source)
+
+    def _is_playable(self, path):
+        """Media tracks are playable once transcoded; other files always."""
+        name = os.path.basename(str(path))
+        return not self.media_library.get(name) or self.media_library.playback_path(path) is not None
 
     def play_intro_async(self, file_path: str):
          """Plays intro asynchronously (Windows only visual supported, Linux fire-and-forget)"""
@@ -637,34 +927,46 @@ class AudioService:
             subprocess.run(['aplay', '-D', 'plughw:0,0', file_path])
 
     def stop(self):
+        """
+        Silences everything (except ducked background music). Bounded: nothing here waits on a process.
+        Mixer sources are dropped in place (sinks stay open); external processes
+        get SIGTERM per process group and are escalated/reaped in the background.
+        """
+        started = time.perf_counter()
         with self._lock:
+            procs = []
             if self.current_process:
-                try: self.current_process.terminate()
-                except: pass
+                procs.append(self.current_process)
                 self.current_process = None
             
-            # Stop Siren
-            self._siren_stop_event.set()
+            # Stop Siren: short fade instead of a hard cut (it ends itself within a block)
+            siren = self._siren_source
             self._siren_active = False
+            self._siren_source = None
+            if siren:
+                siren.release()
+            
+            # 1. Mixer Fast Path: drop every source (but ducked music / the fading siren), flush queued audio (sinks stay open)
+            ducked = self._ducked_source
+            self.mixer.stop_all(flush=True, keep=[s for s in (ducked, siren) if s])
             
-            # 1. Direct Process Termination
+            # 2. Process Groups (Piper streams, Windows players): signal all at once, reap off-thread
             with self.proc_lock:
-                for proc in self.active_processes:
-                    try:
-                        print(f"[AudioService] Terminating process {proc.pid}")
-                        proc.terminate()
-                        # Wait briefly for termination
-                        try: proc.wait(timeout=0.2)
-                        except: proc.kill()
-                    except: pass
+                procs.extend(self.active_processes)
                 self.active_processes.clear()
-
-            # 2. Linux Fallback: killall aplay? A bit aggressive but effective for "Stop" button.
-            if self.os_type != "Windows":
-                os.system("killall -q aplay")
-                os.system("killall -q play")
+            if procs:
+                count = terminate_groups(procs)
+                if count: print(f"[AudioService] Terminating {count} process group(s)")
             
             self.stop_streaming()
+        self._record_stop(time.perf_counter() - started)
+
+    def _record_stop(self, seconds):
+        m = self.stop_latency
+        m['count'] += 1
+        m['last'] = round(seconds, 5)
+        m['avg'] = round(seconds if m['avg'] is None else m['avg'] + (seconds - m['avg']) / m['count'], 5)
+        m['max'] = m['last'] if m['max'] is None else max(m['max'], m['last'])
 
     def _run_command(self, command):
         """Threaded command runner for Windows"""
@@ -672,7 +974,7 @@ class AudioService:
             proc = None
             with self._lock:
                 try:
-                    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+                    proc = popen_group(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
                     self.current_process = proc
                 except: return
             if proc:
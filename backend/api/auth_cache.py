@@ -0,0 +1,221 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from firebase_admin import auth
+from api.firebaseConfig import db
+
+# --- Cache Policy ---
+TOKEN_CACHE_MAX_TTL = 300.0      # Seconds a verified token is trusted without re-verifying (never past its exp)
+TOKEN_CACHE_MAX_ENTRIES = 1000
+TOKEN_CLOCK_SKEW = 60            # Same skew verify_token always allowed
+ROLE_CACHE_TTL = 60.0            # Safety net if the users listener is down or lagging
+ROLE_LISTENER_RETRY = 60.0       # Seconds between attempts to (re)start a failed users listener
+
+
+class _Latency:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = None
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total / self.count * 1000, 3) if self.count else None,
+            'max_ms': round(self.max * 1000, 3),
+            'last_ms': round(self.last * 1000, 3) if self.last is not None else None
+        }
+
+
+class TokenCache:
+    """
+    Verified Firebase ID tokens keyed by SHA-256 of the token (raw tokens are never stored).
+    An entry lives until min(token exp, verified + TOKEN_CACHE_MAX_TTL), so a revoked or
+    disabled account is honoured within that TTL, or at once via invalidate_uid().
+    """
+    def __init__(self, max_ttl=TOKEN_CACHE_MAX_TTL, max_entries=TOKEN_CACHE_MAX_ENTRIES):
+        self.max_ttl = max_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (decoded, expires_at)
+        self._by_uid = {}              # uid -> set(keys)
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.invalidations = 0
+        self.verify_latency = _Latency()  # Firebase verification (misses)
+        self.cached_latency = _Latency()  # Cache hits
+
+    @staticmethod
+    def _key(id_token):
+        return hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+
+    def verify(self, id_token):
+        """Returns the decoded token (cached or freshly verified). Raises like auth.verify_id_token."""
+        start = time.perf_counter()
+        key = self._key(id_token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.cached_latency.add(time.perf_counter() - start)
+                return entry[0]
+            if entry:
+                self._drop(key)
+            self.misses += 1
+
+        try:
+            decoded = auth.verify_id_token(id_token, clock_skew_seconds=TOKEN_CLOCK_SKEW)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.verify_latency.add(elapsed)
+
+        expires_at = min(float(decoded.get('exp', now)) + TOKEN_CLOCK_SKEW, now + self.max_ttl)
+        with self._lock:
+            self._entries[key] = (decoded, expires_at)
+            self._by_uid.setdefault(decoded.get('uid'), set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return decoded
+
+    def invalidate_uid(self, uid):
+        """Forgets every cached token of a user (account deleted/disabled, role revoked)."""
+        with self._lock:
+            keys = self._by_uid.pop(uid, set())
+            for key in keys:
+                self._entries.pop(key, None)
+            if keys:
+                self.invalidations += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_uid.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_ttl_seconds': self.max_ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'failures': self.failures,
+                'invalidations': self.invalidations,
+                'verify_latency': self.verify_latency.to_dict(),
+                'cached_latency': self.cached_latency.to_dict()
+            }
+
+    def _drop(self, key):
+        decoded, _ = self._entries.pop(key)
+        keys = self._by_uid.get(decoded.get('uid'))
+        if keys:
+            keys.discard(key)
+            if not keys:
+                del self._by_uid[decoded.get('uid')]
+
+
+class RoleCache:
+    """
+    uid -> role from the Firestore 'users' collection, kept current by a snapshot
+    listener (role edits and deletions apply immediately). Entries also expire after
+    ROLE_CACHE_TTL in case the listener is down.
+    """
+    def __init__(self, token_cache=None, ttl=ROLE_CACHE_TTL):
+        self.token_cache = token_cache
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._roles = {}     # uid -> (exists, role, cached_at)
+        self._watch = None
+        self._listener_failed_at = None
+        self.hits = 0
+        self.misses = 0
+        self.listener_updates = 0
+        self.read_latency = _Latency()
+
+    def start_listener(self):
+        with self._lock:
+            if self._watch is not None:
+                return
+            self._watch = False  # Starting (don't race a second start)
+        try:
+            watch = db.collection("users").on_snapshot(self._on_snapshot)
+            with self._lock:
+                self._watch = watch
+            print("[AuthCache] Listening for user role changes")
+        except Exception as e:
+            print(f"[AuthCache] Users listener unavailable, using TTL only (retry in {ROLE_LISTENER_RETRY:.0f}s): {e}")
+            with self._lock:
+                self._watch = None
+                self._listener_failed_at = time.time()
+
+    def get(self, uid):
+        """Returns (exists, role) for a user."""
+        if self._watch is None and (self._listener_failed_at is None
+                                    or time.time() - self._listener_failed_at >= ROLE_LISTENER_RETRY):
+            self.start_listener()
+        now = time.time()
+        with self._lock:
+            entry = self._roles.get(uid)
+            if entry and now - entry[2] < self.ttl:
+                self.hits += 1
+                return entry[0], entry[1]
+            self.misses += 1
+
+        start = time.perf_counter()
+        doc = db.collection("users").document(uid).get()
+        exists = doc.exists
+        role = (doc.to_dict() or {}).get("role") if exists else None
+        with self._lock:
+            self.read_latency.add(time.perf_counter() - start)
+            self._roles[uid] = (exists, role, time.time())
+        return exists, role
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._roles),
+                'ttl_seconds': self.ttl,
+                'listening': bool(self._watch),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'listener_updates': self.listener_updates,
+                'read_latency': self.read_latency.to_dict()
+            }
+
+    def _on_snapshot(self, col_snapshot, changes, read_time):
+        now = time.time()
+        for change in changes:
+            uid = change.document.id
+            removed = change.type.name == 'REMOVED'
+            role = None if removed else (change.document.to_dict() or {}).get("role")
+            with self._lock:
+                previous = self._roles.get(uid)
+                self._roles[uid] = (not removed, role, now)
+                self.listener_updates += 1
+            # Role taken away or account removed: drop its verified tokens too
+            if self.token_cache and previous and (removed or previous[1] != role):
+                self.token_cache.invalidate_uid(uid)
+
+
+token_cache = TokenCache()
+role_cache = RoleCache(token_cache)
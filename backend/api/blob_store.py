@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import base64
+import hashlib
+import threading
+from pathlib import Path
+
+BLOB_GC_GRACE = 3600          # Unreferenced blobs are kept this long (seconds) before GC deletes them
+BLOB_MAX_SIZE = 20 * 1024 * 1024
+
+_MIME_EXT = {'audio/webm': '.webm', 'audio/ogg': '.ogg', 'audio/mpeg': '.mp3', 'audio/mp3': '.mp3',
+             'audio/wav': '.wav', 'audio/x-wav': '.wav', 'audio/wave': '.wav', 'audio/mp4': '.m4a'}
+
+
+def decode_data_url(value):
+    """'data:audio/webm;base64,....' (or bare base64) -> (bytes, extension)."""
+    ext = '.wav'
+    if value.startswith('data:') and ',' in value:
+        header, value = value.split(',', 1)
+        ext = _MIME_EXT.get(header[5:].split(';')[0].lower(), ext)
+    return base64.b64decode(value), ext
+
+
+class BlobStore:
+    """
+    Content-addressed store for recorded announcement audio: blobs/<sha256><ext>.
+    Firestore documents and tasks only carry the hash. References are (hash, owner)
+    pairs (owner = schedule id) kept in refs.json; gc() deletes blobs nobody references.
+    """
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._refs_file = self.root / "refs.json"
+        self._lock = threading.Lock()
+        self._refs = {}        # sha256 -> set(owner)
+        self._released = {}    # sha256 -> time its last reference went away
+        self.collected = 0
+        self._load()
+
+    def put(self, data, ext='.wav'):
+        """Stores bytes (once per content). Returns the sha256."""
+        if len(data) > BLOB_MAX_SIZE:
+            raise ValueError(f"Audio larger than {BLOB_MAX_SIZE} bytes")
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if self._find(digest) is None:
+                tmp = self.root / f".{digest}.tmp"
+                with open(tmp, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, self.root / f"{digest}{ext}")
+            self._released.setdefault(digest, time.time())  # Unreferenced until retained
+        return digest
+
+    def path(self, digest):
+        with self._lock:
+            return self._find(digest)
+
+    def externalize(self, data, owner=None):
+        """
+        Moves a base64 'audio' field of a schedule dict into the store, leaving 'audio_hash'.
+        Retains the blob for owner when given. Returns the hash (or the existing one).
+        """
+        audio = data.pop('audio', None)
+        if audio:
+            data['audio_hash'] = self.put(*decode_data_url(audio))
+        if not data.get('audio_hash'):
+            data.pop('audio_hash', None)
+        elif owner:
+            self.retain(data['audio_hash'], owner)
+        return data.get('audio_hash')
+
+    # --- Reference counting ---
+    def retain(self, digest, owner):
+        with self._lock:
+            self._refs.setdefault(digest, set()).add(owner)
+            self._released.pop(digest, None)
+            self._save()
+
+    def release(self, owner):
+        """Drops every reference held by owner (schedule deleted, edited or played)."""
+        with self._lock:
+            changed = False
+            for digest, owners in list(self._refs.items()):
+                if owner in owners:
+                    owners.discard(owner)
+                    changed = True
+                    if not owners:
+                        del self._refs[digest]
+                        self._released[digest] = time.time()
+            if changed:
+                self._save()
+
+    def refcount(self, digest):
+        with self._lock:
+            return len(self._refs.get(digest, ()))
+
+    def gc(self, in_use=(), grace=BLOB_GC_GRACE):
+        """Deletes blobs with no references (and not in `in_use`) for longer than grace. Returns the count."""
+        cutoff = time.time() - grace
+        removed = 0
+        with self._lock:
+            for path in list(self.root.iterdir()):
+                digest = path.name.split('.')[0]
+                if not digest or path == self._refs_file or digest in self._refs or digest in in_use:
+                    continue
+                if self._released.setdefault(digest, path.stat().st_mtime) > cutoff:
+                    continue
+                path.unlink(missing_ok=True)
+                self._released.pop(digest, None)
+                removed += 1
+            self.collected += removed
+        if removed:
+            print(f"[BlobStore] GC: removed {removed} unreferenced blob(s)")
+        return removed
+
+    def stats(self):
+        with self._lock:
+            files = [p for p in self.root.iterdir() if p.name.split('.')[0] and p != self._refs_file]
+            return {
+                'blobs': len(files),
+                'mb': round(sum(p.stat().st_size for p in files) / 1024 / 1024, 2),
+                'referenced': len(self._refs),
+                'references': sum(len(o) for o in self._refs.values()),
+                'collected': self.collected
+            }
+
+    # --- Internals ---
+    def _find(self, digest):
+        if not digest or not all(c in '0123456789abcdef' for c in digest):
+            return None
+        matches = list(self.root.glob(f"{digest}.*"))
+        return matches[0] if matches else None
+
+    def _save(self):
+        tmp = self._refs_file.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({d: sorted(o) for d, o in self._refs.items()}, f)
+        os.replace(tmp, self._refs_file)
+
+    def _load(self):
+        for tmp in self.root.glob('.*.tmp'):
+            tmp.unlink(missing_ok=True)
+        try:
+            with open(self._refs_file) as f:
+                self._refs = {d: set(o) for d, o in json.load(f).items()}
+        except (OSError, ValueError):
+            self._refs = {}
@@ -1,5 +1,6 @@
 import threading
 import time
+import random
 import os
 import uuid
 from enum import IntEnum
@@ -9,6 +10,8 @@ from firebase_admin import firestore
 from firebase_admin import firestore
 from api.firebaseConfig import db
 from api.audio_service import audio_service 
+from api.piper_pool import RenderPriority
+from api.prerender import PRERENDER_LOOKAHEAD, PRERENDER_SCAN_INTERVAL
 from api.notification_service import notification_service # <--- NEW IMPORT
 
 # --- 1. Constants & Enums ---
@@ -32,6 +35,8 @@ class TaskType:
     SCHEDULE = 'schedule'
     BACKGROUND = 'background'
 
+INTRO_CLIP = "intro"  # system_sounds/intro.mp3, served from the audio service's sound bank
+
 # --- 2. Data Structures ---
 class Task:
     def __init__(self, 
@@ -55,7 +60,7 @@ class Task:
             'id': self.id,
             'type': self.type,
             'priority': int(self.priority),
-            'data': self.data,
+            'data': {k: v for k, v in self.data.items() if k != 'audio'},  # Audio travels as 'audio_hash'
             'status': int(self.status),
             'created_at': self.created_at.isoformat(),
             'scheduled_time': self.scheduled_time.isoformat()
@@ -94,12 +99,15 @@ class PAController:
         self.background_resume_time = 0
         self.background_play_start: Optional[datetime] = None
         self.last_background_content: Optional[str] = None
+        self.background_playlist_index = 0  # Position in the (shuffled) playlist, kept across suspend/resume
+        self.background_ducked = False  # Suspended background is still playing, ducked under the current task
 
         # Reset Logic on init to ensure clean state
         self._reset_state()
         
         # Cleanup State
         self.last_cleanup = datetime.now()
+        self.last_prerender_scan = datetime.min
 
         # Start Scheduler Thread
         self.scheduler_thread = threading.Thread(target=self._scheduler_loop, daemon=True)
@@ -139,6 +147,12 @@ class PAController:
             count = 0
             for doc in docs:
                 data = doc.to_dict()
+                if data.get('audio'):
+                    # Migration: move inline base64 audio into the blob store, keep only the hash
+                    audio_service.schedule_audio.externalize(data)
+                    doc.reference.update({'audio_hash': data['audio_hash'], 'audio': firestore.DELETE_FIELD})
+                if data.get('audio_hash'):
+                    audio_service.schedule_audio.retain(data['audio_hash'], doc.id)
                 try:
                     # Parse Date/Time
                     dt_str = f"{data.get('date')} {data.get('time')}"
@@ -163,6 +177,7 @@ class PAController:
             # Sort queue
             self.queue.sort(key=lambda x: x.scheduled_time)
             print(f"[Controller] Resilience: Loaded {count} pending tasks.")
+            audio_service.schedule_audio.gc(in_use=self._audio_hashes_in_use())
             
         except Exception as e:
             print(f"[Controller] Failed to load pending schedules: {e}")
@@ -199,7 +214,7 @@ class PAController:
                 
                 # IDEMPOTENCY CHECK: If it's the SAME background track already playing, IGNORE.
                 if self.current_task and self.current_task.type == TaskType.BACKGROUND and new_task.type == TaskType.BACKGROUND:
-                    if self.current_task.data.get('content') == new_task.data.get('content'):
+                    if self._background_key(self.current_task) == self._background_key(new_task):
                         # Check start_time to distinguish between "Seek" and "Redundant Play"
                         # If start_time is 0, it's usually a redundant "New Play" click.
                         # If start_time is 0, it's usually a redundant "New Play" click.
@@ -214,13 +229,14 @@ class PAController:
 
                 # FRESH START: If it's a new Background Music request, reset the resume offset
                 if new_task.type == TaskType.BACKGROUND:
-                    new_content = new_task.data.get('content')
+                    new_content = self._background_key(new_task)
                     if new_content != self.last_background_content:
                         print(f"[Controller] New Track: {new_content}. Resetting Resume Point.")
                         self.background_resume_time = 0
+                        self.background_playlist_index = 0
                         self.last_background_content = new_content
                     else:
-                        print(f"[Controller] Resuming Track: {new_content} at {self.background_resume_time}s")
+                        print(f"[Controller] Resuming Track: {new_content} at #{self.background_playlist_index} {self.background_resume_time}s")
                     
                     self.background_play_start = None
 
@@ -274,12 +290,9 @@ class PAController:
 
                 print(f"[Controller] Logout: PAUSING Background Music (Persistence Mode)")
                 
-                # Stop Audio Service & Save Offset
+                # Save Offset & Stop Audio Service
+                self._save_background_position()
                 audio_service.stop()
-                if self.background_play_start:
-                    elapsed = (datetime.now() - self.background_play_start).total_seconds()
-                    self.background_resume_time += elapsed
-                    self.background_play_start = None
                 
                 # Mark as Interrupted (Paused) & Update Firestore
                 self.current_task.status = State.INTERRUPTED
@@ -364,10 +377,7 @@ class PAController:
             # Stop Audio
             if self.current_task and self.current_task.type == TaskType.BACKGROUND:
                 # Calculate final offset before stopping
-                if self.background_play_start:
-                    elapsed = (datetime.now() - self.background_play_start).total_seconds()
-                    self.background_resume_time += elapsed
-                    self.background_play_start = None
+                self._save_background_position()
                 
                 # If we are hard stopping (Manual Stop), clear the resume point
                 # (Unless we want it to stay for next time? User said "resume where it stops")
@@ -393,6 +403,18 @@ class PAController:
             )
 
             # RESUME SUSPENDED TASK
+            if self.suspended_task and self.background_ducked:
+                 # Ducked music never stopped: just ramp it back up (no restart, no seek)
+                 self.background_ducked = False
+                 if audio_service.unduck_background():
+                     print(f"[Controller] [RESUME] Unducking Background Task {self.suspended_task.id}")
+                     self.current_task = self.suspended_task
+                     self.current_task.status = State.PLAYING
+                     self.suspended_task = None
+                     self._update_firestore_state(self.current_task, Priority.BACKGROUND, 'BACKGROUND')
+                     return
+                 self._save_background_position()  # Ended while ducked: restart from where it got to
+
             if self.suspended_task:
                  print(f"[Controller] [RESUME] Found Suspended Task: {self.suspended_task.type} (ID: {self.suspended_task.id})")
                  # Small delay for smooth transition
@@ -413,6 +435,7 @@ class PAController:
     def remove_from_queue(self, schedule_id: str):
         with self._lock:
              self.queue = [t for t in self.queue if t.id != schedule_id]
+        audio_service.prerender.invalidate(schedule_id)  # Edited/deleted: prepared audio is stale
 
     def get_active_emergency_user(self) -> Optional[str]:
         with self._lock:
@@ -427,7 +450,8 @@ class PAController:
                 print("[Controller] Seek Denied: No Background Music playing")
                 return False
             
-            # Update resume time and restart
+            # Update resume time (within the current playlist track) and restart
+            self._save_background_position()
             self.background_resume_time = time_seconds
             self.background_play_start = None # Reset start tracking
             
@@ -437,8 +461,8 @@ class PAController:
             self._start_task(task)
             return True
 
-    def play_realtime_chunk(self, audio_base64: str):
-        """Decodes RAW PCM chunks, wraps in WAV header, and plays immediately"""
+    def play_realtime_chunk(self, audio_base64: str, seq: Optional[int] = None, timestamp: Optional[float] = None):
+        """Decodes RAW PCM chunks and queues them in the live jitter buffer (ordered by seq)"""
         # Ensure we are actually in a Voice Broadcast state
         if not self.current_task or self.current_task.type != TaskType.VOICE:
             print("[Controller] Denied Speak: No Voice Broadcast Active")
@@ -454,19 +478,131 @@ class PAController:
             
              decoded_pcm = base64.b64decode(audio_base64)
              
-             # Feed Raw PCM directly to AudioService Stream
-             audio_service.feed_stream(decoded_pcm)
+             # Feed the frame (raw PCM or negotiated codec) to AudioService Stream
+             audio_service.feed_stream(decoded_pcm, seq=seq, timestamp=timestamp)
              
         except Exception as e:
             print(f"[Controller] Chunk Error: {e}")
 
+    def play_realtime_pcm(self, pcm: bytes, seq: Optional[int] = None, timestamp: Optional[float] = None,
+                          task_id: Optional[str] = None) -> bool:
+        """Binary path (WebSocket): one frame (raw PCM or negotiated codec) straight into the stream.
+        With task_id, only that voice task may be fed. Returns False if denied."""
+        task = self.current_task
+        if not task or task.type != TaskType.VOICE:
+            return False
+        if task_id and task.id != task_id:
+            return False
+        audio_service.feed_stream(pcm, seq=seq, timestamp=timestamp)
+        return True
+
     # --- INTERNAL LOGIC ---
+    # --- BACKGROUND PLAYLISTS ---
+    @staticmethod
+    def _background_key(task: Task):
+        """Identity of a background request: the playlist (and its modes) or the single track."""
+        playlist = task.data.get('playlist')
+        if playlist:
+            return f"playlist:{'|'.join(playlist)}:{bool(task.data.get('shuffle'))}:{task.data.get('repeat') or 'off'}"
+        return task.data.get('content')
+
+    def _background_tracks(self, task: Task):
+        """Track order for a background task. The shuffle order is drawn once and kept in the task (survives suspend)."""
+        playlist = task.data.get('playlist') or ([task.data['content']] if task.data.get('content') else [])
+        if task.data.get('shuffle') and len(playlist) > 1:
+            if sorted(task.data.get('order') or []) != sorted(playlist):
+                order = list(playlist)
+                random.shuffle(order)
+                task.data['order'] = order
+            return list(task.data['order'])
+        return list(playlist)
+
+    def _save_background_position(self):
+        """Stores where background music is (playlist track + offset) so a resume continues there."""
+        if not self.background_play_start:
+            return  # Not playing; the saved point is current
+        position = audio_service.background_position()
+        if position:
+            self.background_playlist_index, self.background_resume_time = position
+        else:
+            elapsed = (datetime.now() - self.background_play_start).total_seconds()
+            self.background_resume_time += elapsed
+        self.background_play_start = None
+
+    def _on_background_advance(self, task: Task, tracks, index):
+        """Gapless switch to the next playlist track (called from the audio engine)."""
+        with self._lock:
+            ducked = self.background_ducked and self.suspended_task is task
+            if self.current_task is not task and not ducked:
+                return
+            self.background_playlist_index = index
+            self.background_resume_time = 0
+            self.background_play_start = datetime.now()
+            task.data.pop('start_time', None)
+            task.data['content'] = tracks[index]
+            print(f"[Controller] Background Playlist: now playing {tracks[index]} (track {index + 1}/{len(tracks)})")
+            if not ducked:
+                self._update_firestore_state(task, Priority.BACKGROUND, 'BACKGROUND')
+
+    def _on_background_finished(self, task: Task):
+        """The playlist ran out (repeat off): end the task like a manual stop."""
+        with self._lock:
+            ducked = self.background_ducked and self.suspended_task is task
+            if self.current_task is not task and not ducked:
+                return
+            self.background_playlist_index = 0
+            self.background_resume_time = 0
+            self.background_play_start = None
+            self.last_background_content = None
+            if ducked:
+                # Ran out under an announcement: nothing left to resume
+                self.background_ducked = False
+                self.suspended_task = None
+                audio_service.stop_background()
+                print("[Controller] Background Playlist finished (while ducked).")
+                return
+        print("[Controller] Background Playlist finished.")
+        self.stop_task(task.id, user='System')
+
+    @staticmethod
+    def _prerender_spec(task: Task):
+        """What a schedule plays (the prepared render's identity): intro, text/voice or recorded audio."""
+        return {
+            'intro': INTRO_CLIP,
+            'text': task.data.get('message') or "Scheduled Announcement.",
+            'voice': task.data.get('voice', 'female'),
+            'audio_hash': task.data.get('audio_hash')
+        }
+
+    def _prerender_upcoming(self):
+        """Lookahead: queue renders for schedules due within PRERENDER_LOOKAHEAD (nearest first)."""
+        horizon = datetime.now() + timedelta(seconds=PRERENDER_LOOKAHEAD)
+        for task in self.queue:
+            if task.type == TaskType.SCHEDULE and task.scheduled_time <= horizon:
+                audio_service.prerender.prepare(task.id, task.scheduled_time.timestamp(), **self._prerender_spec(task))
+
+    def _audio_hashes_in_use(self):
+        """Blob hashes of queued/playing/suspended tasks (protected from GC even if unreferenced)."""
+        tasks = self.queue + [self.current_task, self.suspended_task]
+        return {t.data.get('audio_hash') for t in tasks if t and t.data.get('audio_hash')}
+
+    def _release_ducked_background(self):
+        """Turns ducked background music into a plain suspended task (position saved, audio stopped)."""
+        self._save_background_position()
+        audio_service.stop_background()
+        self.background_ducked = False
+        print(f"  -> [SUSPEND] Stopped ducked background at track #{self.background_playlist_index}, {self.background_resume_time}s")
+
     def _add_to_queue(self, task: Task):
         self.queue.append(task)
         # Sort by scheduled_time
         self.queue.sort(key=lambda x: x.scheduled_time)
 
     def _preempt_current_task(self, new_priority, new_task_type=None):
+        if new_task_type == TaskType.EMERGENCY and self.background_ducked:
+            # Nothing plays under an emergency: ducked music becomes a normal suspend
+            self._release_ducked_background()
+
         if not self.current_task:
             return
 
@@ -512,16 +648,19 @@ class PAController:
                  self.current_task = None
                  # Ensure we don't have a suspended task hanging around if we are switching
                  self.suspended_task = None 
+                 self.background_ducked = False
             else:
                  # Soft Stop: Suspend
                  print(f"  -> [SUSPEND] Suspending Background Task {self.current_task.id} for {new_priority}")
                  
-                 # Save offset correctly
-                 if self.background_play_start:
-                     elapsed = (datetime.now() - self.background_play_start).total_seconds()
-                     self.background_resume_time += elapsed
-                     print(f"  -> Saved resume offset: {self.background_resume_time}s")
-                     self.background_play_start = None
+                 if new_task_type != TaskType.EMERGENCY and audio_service.duck_background():
+                     # Keeps playing underneath (audio_service.stop() spares it); resumed by ramping back up
+                     self.background_ducked = True
+                     print(f"  -> [DUCK] Background keeps playing under the announcement")
+                 else:
+                     # Save playlist position and offset correctly
+                     self._save_background_position()
+                     print(f"  -> Saved resume point: track #{self.background_playlist_index} at {self.background_resume_time}s")
 
                  self.suspended_task = self.current_task
                  self.current_task = None
@@ -537,6 +676,8 @@ class PAController:
         audio_service.stop()
 
     def _start_task(self, task: Task):
+        resumed = task.status == State.INTERRUPTED  # Re-queued after preemption: not a first start
+        audio_service.cancel_first_sample()  # A previous task's waiter must not time this task's audio
         self.current_task = task
         self.current_task.status = State.PLAYING
         
@@ -550,7 +691,7 @@ class PAController:
             self.emergency_mode = True
             self.emergency_owner = task.data.get('user')
             # Play Siren on Pi (Start quiet)
-            audio_service.play_siren(zones=['All Zones'], volume=0.002)
+            audio_service.play_siren(zones=['All Zones'], volume=0.002, pattern=task.data.get('siren_pattern'))
             
             # NOTIFICATION: Emergency Started
             notification_service.create(
@@ -592,43 +733,43 @@ class PAController:
              time.sleep(0.5)
 
              # 2. Start the Streaming Pipe
-             audio_service.start_streaming(zones)
+             audio_service.start_streaming(zones, codec=task.data.get('codec', 'pcm16'))
 
         elif task.type == TaskType.SCHEDULE:
              # Check if it's Audio File or Text
-             audio_data = task.data.get('audio')
+             if task.data.get('audio'):
+                 audio_service.schedule_audio.externalize(task.data, owner=task.id)  # Legacy inline base64
+             audio_hash = task.data.get('audio_hash')
              
-             if audio_data:
-                 print(f"[Controller] Playing Audio File Schedule...")
+             # Lookahead render ready? (intro + body already joined on disk)
+             prepared = audio_service.prerender.take(task.id, **self._prerender_spec(task))
+             waiter = None
+             if not resumed:
+                 due = task.scheduled_time.timestamp()
+                 path = 'prepared' if prepared else 'cold'
+                 waiter = audio_service.expect_first_sample(lambda at: audio_service.prerender.record_lateness(path, at - due))
+             played = False
+             
+             if prepared:
+                 print(f"[Controller] Playing Prepared Schedule...")
                  try:
-                     # Remove header if present (data:audio/webm;base64,)
-                     if "base64," in audio_data:
-                         audio_data = audio_data.split("base64,")[1]
-                     
-                     import base64
-                     decoded_audio = base64.b64decode(audio_data)
-                     
-                     # Save to temp file
-                     temp_filename = f"temp_broadcast_{uuid.uuid4().hex}.wav" # Most pipes handle webm/wav
-                     temp_path = os.path.join("system_sounds", temp_filename)
-                     abs_temp = os.path.abspath(temp_path)
-                     
-                     with open(abs_temp, "wb") as f:
-                         f.write(decoded_audio)
-                                          # Play Intro -> Audio File
-                     intro_path = os.path.join("system_sounds", "intro.mp3")
-                     abs_intro = os.path.abspath(intro_path)
-                     
-                     audio_service.play_wav(abs_intro, abs_temp, zones=task.data.get('zones'))
-                     
-                     # Cleanup happens by next write or OS, but let's try to be clean 
-                     # (Actually audio_service is async/threaded usually? 
-                     # If _play_multizone blocks (it seems to for Linux), we can delete after.
-                     # If Windows, it returns immediately. 
-                     # Let's leave it for OS cleanup or future robust GC).
-                     
+                     audio_service.play_prepared(prepared, zones=task.data.get('zones'))
+                     played = True
                  except Exception as e:
-                     print(f"[Controller] Failed to decode/play audio: {e}")
+                     print(f"[Controller] Failed to play prepared audio: {e}")
+             
+             elif audio_hash:
+                 print(f"[Controller] Playing Audio File Schedule...")
+                 audio_path = audio_service.schedule_audio.path(audio_hash)
+                 if audio_path:
+                     # Play Intro (sound bank clip) -> Recorded Audio (straight from the blob store)
+                     try:
+                         audio_service.play_wav(INTRO_CLIP, str(audio_path), zones=task.data.get('zones'))
+                         played = True
+                     except Exception as e:
+                         print(f"[Controller] Failed to play audio: {e}")
+                 else:
+                     print(f"[Controller] Error: Schedule audio {audio_hash[:12]} missing from blob store")
              
              else:
                  # Text TTS
@@ -638,9 +779,14 @@ class PAController:
                  voice = task.data.get('voice', 'female') # Default to female
     
                  # UPDATED: Use chained playback (Intro -> Text) Non-Blocking
-                 intro_path = os.path.join("system_sounds", "intro.mp3")
-                 abs_intro = os.path.abspath(intro_path)
-                 audio_service.play_announcement(abs_intro, msg, voice=voice, zones=task.data.get('zones'))
+                 audio_service.play_announcement(INTRO_CLIP, msg, voice=voice, zones=task.data.get('zones'))
+                 played = True
+             
+             # Hit or miss, this schedule's lookahead entry is done (a late render must not linger or hold a slot)
+             audio_service.prerender.invalidate(task.id)
+             
+             if waiter and not played:
+                 audio_service.cancel_first_sample(waiter)  # No audio: don't time the next source against this schedule
              
              # NOTIFICATION: Schedule Started
              notification_service.create(
@@ -664,9 +810,7 @@ class PAController:
                      
                 print(f"[Controller] Speaking Text: {msg} (Voice: {voice}) Zones: {zones}")
                 # UPDATED: Use chained playback
-                intro_path = os.path.join("system_sounds", "intro.mp3")
-                abs_intro = os.path.abspath(intro_path)
-                audio_service.play_announcement(abs_intro, msg, voice=voice, zones=zones)
+                audio_service.play_announcement(INTRO_CLIP, msg, voice=voice, zones=zones, priority=RenderPriority.REALTIME)
                 
                 # NOTIFICATION: Text Broadcast Started
                 notification_service.create(
@@ -680,38 +824,59 @@ class PAController:
                 print("[Controller] Error: Text task has no content/message to speak.")
                 
         elif task.type == TaskType.BACKGROUND:
-            # --- BACKGROUND MUSIC PLAYBACK ---
-            filename = task.data.get('content')
-            if filename:
-                media_path = os.path.join("media", filename)
-                abs_media = os.path.abspath(media_path)
+            # --- BACKGROUND MUSIC PLAYBACK (single track or playlist) ---
+            tracks = self._background_tracks(task)
+            if tracks:
+                missing = [f for f in tracks if not os.path.exists(os.path.abspath(os.path.join("media", f)))]
+                tracks = [f for f in tracks if f not in missing]
+                for filename in missing:
+                    print(f"[Controller] Error: Media file not found: {filename}")
+
+            if tracks:
+                index = min(self.background_playlist_index, len(tracks) - 1)
+                filename = tracks[index]
+                print(f"[Controller] Playing Background Music: {filename} (track {index + 1}/{len(tracks)})")
                 
-                if os.path.exists(abs_media):
-                    print(f"[Controller] Playing Background Music: {filename}")
-                    
-                    # Determine Start Offset
-                    # 1. Check if Task Data has 'start_time' (explicit seek)
-                    # 2. Otherwise use saved 'background_resume_time'
-                    start_offset = task.data.get('start_time', self.background_resume_time)
-                    print(f"  -> Offset: {start_offset}s")
-                    
-                    # Track when we actually started playing
-                    self.background_play_start = datetime.now()
-                    
-                    # Async Playback on All Zones (or specified)
-                    zones = task.data.get('zones', ['All Zones'])
-                    if isinstance(zones, str): zones = [z.strip() for z in zones.split(',')]
-                    audio_service.play_background_music(abs_media, zones=zones, start_time=start_offset)
-                    
+                # Determine Start Offset
+                # 1. Check if Task Data has 'start_time' (explicit seek)
+                # 2. Otherwise use saved 'background_resume_time'
+                start_offset = task.data.get('start_time', self.background_resume_time)
+                print(f"  -> Offset: {start_offset}s")
+                
+                # Track when we actually started playing
+                self.background_play_start = datetime.now()
+                
+                # Async Playback on All Zones (or specified)
+                zones = task.data.get('zones', ['All Zones'])
+                if isinstance(zones, str): zones = [z.strip() for z in zones.split(',')]
+                started = audio_service.play_background_playlist(
+                    [os.path.abspath(os.path.join("media", f)) for f in tracks],
+                    zones=zones,
+                    start_index=index,
+                    start_time=start_offset,
+                    repeat=task.data.get('repeat') or 'off',
+                    on_advance=lambda i: self._on_background_advance(task, tracks, i),
+                    on_finish=lambda: self._on_background_finished(task)
+                )
+                if not started:
+                    row = audio_service.media_library.get(filename) or {}
                     notification_service.create(
-                        "Music Started",
-                        f"Now playing: {filename}",
-                        type="info",
+                        "Track Not Ready",
+                        f"{filename} is still being prepared for playback ({int((row.get('playback_progress') or 0) * 100)}%)"
+                        if row.get('playback_status') != 'failed' else f"{filename} could not be converted for playback",
+                        type="warning",
                         target_user=task.data.get('user'),
                         target_role="admin"
                     )
-                else:
-                    print(f"[Controller] Error: Media file not found: {abs_media}")
+                    return
+                
+                notification_service.create(
+                    "Music Started",
+                    f"Now playing: {filename}" + (f" (playlist, {len(tracks)} tracks)" if len(tracks) > 1 else ""),
+                    type="info",
+                    target_user=task.data.get('user'),
+                    target_role="admin"
+                )
             else:
                 print("[Controller] Error: Background task missing content (filename).")
 
@@ -733,11 +898,11 @@ class PAController:
              
              # 3. Play Voice (Blocking)
              print("[Controller] Stopping Siren for Voice Announcement...")
-             audio_service.play_announcement(None, script, voice='female', zones=['All Zones']) # skip_stop=False
+             audio_service.play_announcement(None, script, voice='female', zones=['All Zones'], priority=RenderPriority.EMERGENCY) # skip_stop=False
              
              # 4. Resume Siren
              print("[Controller] Voice Finished. Resuming Siren...")
-             audio_service.play_siren(zones=['All Zones'], volume=0.002)
+             audio_service.play_siren(zones=['All Zones'], volume=0.002, pattern=task.data.get('siren_pattern'))
 
              # --- AUTO-UNLOCK DEACTIVATION & VOLUME RAMP ---
              # Once the script is done, we clear current_task so frontend shows "DEACTIVATE"
@@ -811,6 +976,11 @@ class PAController:
                 self.last_cleanup = datetime.now()
 
             with self._lock:
+                # 0. Lookahead: prepare audio of schedules due soon
+                if (datetime.now() - self.last_prerender_scan).total_seconds() >= PRERENDER_SCAN_INTERVAL:
+                    self.last_prerender_scan = datetime.now()
+                    self._prerender_upcoming()
+
                 # 1. Check for Due Tasks
                 now = datetime.now()
                 candidates = [t for t in self.queue if t.scheduled_time <= now]
@@ -834,6 +1004,8 @@ class PAController:
                 # Mark as Completed in DB (for the specific instance)
                 try:
                     db.collection('schedules').document(next_task.id).update({'status': 'Completed'})
+                    # Played: this instance no longer holds its audio (recurrences retain their own)
+                    audio_service.schedule_audio.release(next_task.id)
                     
                     # NOTIFICATION: Schedule Completed
                     notification_service.create(
@@ -898,6 +1070,8 @@ class PAController:
                 _, new_ref = db.collection('schedules').add(new_data)
                 new_id = new_ref.id
                 print(f"[Scheduler] Created recurring instance: {new_id} for {new_data['date']} at {new_data['time']}")
+                if new_data.get('audio_hash'):
+                    audio_service.schedule_audio.retain(new_data['audio_hash'], new_id)
                 
                 new_task = Task(
                     id=new_id,
@@ -963,6 +1137,11 @@ class PAController:
                  print(f"[Controller] Cleanup: Deleted {count} old log entries.")
              else:
                  print("[Controller] Cleanup: No old data to delete.")
+
+             # 3. Schedule audio nobody references anymore
+             with self._lock:
+                 in_use = self._audio_hashes_in_use()
+             audio_service.schedule_audio.gc(in_use=in_use)
                  
         except Exception as e:
             print(f"[Controller] Cleanup Failed: {e}")
@@ -0,0 +1,199 @@
+import re
+import time
+import threading
+import subprocess
+
+# --- Device Policy ---
+DEVICE_CONTROLS = ["Speaker", "PCM", "Master", "Headphone", "Playback"]  # Common playback control names
+DEVICE_TARGET_VOLUME = 100       # Percent; the mixer does all gain in software
+DEVICE_HOTPLUG_POLL = 2.0        # Seconds between /proc/asound/cards checks (cheap file read)
+DEVICE_DRIFT_INTERVAL = 30.0     # Seconds between amixer re-reads of every managed control
+PROC_CARDS = "/proc/asound/cards"
+
+_CARD_LINE = re.compile(r'^\s*(\d+)\s+\[([^\]]*)\]\s*:\s*(.*)$')
+_SCONTROL = re.compile(r"Simple mixer control '([^']+)',(\d+)")
+_PERCENT = re.compile(r'\[(\d+)%\]')
+_SWITCH = re.compile(r'\[(on|off)\]')
+
+
+def _amixer(*args, timeout=2.0):
+    try:
+        result = subprocess.run(['amixer', *args], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                text=True, timeout=timeout)
+        return result.stdout if result.returncode == 0 else ""
+    except Exception:
+        return ""
+
+
+class DeviceRegistry:
+    """
+    ALSA cards and their playback controls, discovered once and cached.
+    Playback only consults the cache; amixer runs at discovery, on hotplug
+    and when a periodic re-read finds a control has drifted.
+    """
+    def __init__(self, controls=DEVICE_CONTROLS, target_volume=DEVICE_TARGET_VOLUME):
+        self.controls = list(controls)
+        self.target_volume = target_volume
+        self._lock = threading.Lock()
+        # card_id -> {'id', 'name', 'description', 'controls': {name: {'volume', 'muted'}}, 'discovered'}
+        self.cards = {}
+        self._cards_raw = None
+        self.reapplied = 0     # Controls corrected after drift (since start)
+        self.last_check = None
+        self._watcher = None
+        self._listeners = []
+
+    # --- Playback Path ---
+    def ensure_active(self, card_id):
+        """
+        Makes sure the card is unmuted at target volume. No subprocesses when the cache says it already is.
+        Raises ValueError for a card that isn't in /proc/asound/cards (nothing is cached for it).
+        """
+        card_id = int(card_id)
+        with self._lock:
+            card = self.cards.get(card_id)
+        if card is None:
+            self.refresh()  # Only cards listed by the kernel get discovered (hotplug since the last poll)
+            with self._lock:
+                card = self.cards.get(card_id)
+            if card is None:
+                raise ValueError(f"Unknown sound card {card_id}")
+        for name, state in card['controls'].items():
+            if self._drifted(state):
+                self._apply(card_id, name)
+
+    def on_change(self, callback):
+        """callback(added, removed) runs when cards appear or disappear (lists of card ids)."""
+        self._listeners.append(callback)
+
+    # --- Discovery / Drift ---
+    def refresh(self, force=False):
+        """Re-reads /proc/asound/cards; discovers new cards and forgets removed ones."""
+        raw = self._read_proc_cards()
+        if raw == self._cards_raw and not force:
+            return False
+        found = self._parse_cards(raw)
+        first = self._cards_raw is None
+        with self._lock:
+            removed = [cid for cid in self.cards if cid not in found]
+            added = [cid for cid in found if cid not in self.cards]
+            for cid in removed:
+                del self.cards[cid]
+            self._cards_raw = raw
+        for cid, info in found.items():
+            if force or cid not in self.cards:
+                self._discover(cid, info)
+        if removed:
+            print(f"[Devices] Cards removed: {removed}")
+        if (added or removed) and not first:
+            for callback in self._listeners:
+                try: callback(added, removed)
+                except Exception as e: print(f"[Devices] Change listener failed: {e}")
+        return True
+
+    def check_drift(self):
+        """Re-reads every managed control and re-applies those that drifted. Returns the number fixed."""
+        fixed = 0
+        with self._lock:
+            snapshot = {cid: list(card['controls'].keys()) for cid, card in self.cards.items()}
+        for card_id, names in snapshot.items():
+            for name in names:
+                state = self._read_control(card_id, name)
+                with self._lock:
+                    if card_id in self.cards:
+                        self.cards[card_id]['controls'][name] = state
+                if self._drifted(state):
+                    print(f"[Devices] Card {card_id} '{name}' drifted to {state}, re-applying")
+                    self._apply(card_id, name)
+                    fixed += 1
+        self.last_check = time.time()
+        return fixed
+
+    def start_watching(self, hotplug_poll=DEVICE_HOTPLUG_POLL, drift_interval=DEVICE_DRIFT_INTERVAL):
+        if self._watcher:
+            return
+        def watch():
+            last_drift = time.monotonic()
+            while True:
+                time.sleep(hotplug_poll)
+                try:
+                    self.refresh()
+                    if time.monotonic() - last_drift >= drift_interval:
+                        last_drift = time.monotonic()
+                        self.check_drift()
+                except Exception as e:
+                    print(f"[Devices] Watch error: {e}")
+        self._watcher = threading.Thread(target=watch, daemon=True)
+        self._watcher.start()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'target_volume': self.target_volume,
+                'reapplied': self.reapplied,
+                'last_check': self.last_check,
+                'cards': {str(cid): dict(card, controls=dict(card['controls'])) for cid, card in self.cards.items()}
+            }
+
+    # --- Internal ---
+    def _drifted(self, state):
+        if state.get('stuck'):
+            return False  # Apply didn't take (e.g. capped hardware); retried at the next drift check
+        if state.get('muted'):
+            return True
+        volume = state.get('volume')
+        return volume is not None and volume < self.target_volume
+
+    def _discover(self, card_id, info=None):
+        """Finds the managed controls on a card, reads their state and applies the policy once."""
+        available = {name for name, _ in _SCONTROL.findall(_amixer('-c', str(card_id), 'scontrols'))}
+        controls = {}
+        for name in self.controls:
+            if name in available:
+                controls[name] = self._read_control(card_id, name)
+        card = dict(info or {'id': card_id, 'name': str(card_id), 'description': ''},
+                    controls=controls, discovered=time.time())
+        with self._lock:
+            self.cards[card_id] = card
+        print(f"[Devices] Card {card_id} ({card['name']}): controls {list(controls.keys())}")
+        for name, state in controls.items():
+            if self._drifted(state):
+                self._apply(card_id, name)
+        return card
+
+    def _read_control(self, card_id, name):
+        out = _amixer('-c', str(card_id), 'sget', name)
+        percents = [int(p) for p in _PERCENT.findall(out)]
+        switches = _SWITCH.findall(out)
+        return {
+            'volume': min(percents) if percents else None,
+            'muted': 'off' in switches
+        }
+
+    def _apply(self, card_id, name):
+        _amixer('-c', str(card_id), 'set', name, f'{self.target_volume}%', 'unmute')
+        state = self._read_control(card_id, name)
+        if self._drifted(state):
+            state['stuck'] = True
+        with self._lock:
+            if card_id in self.cards:
+                self.cards[card_id]['controls'][name] = state
+            self.reapplied += 1
+
+    @staticmethod
+    def _read_proc_cards():
+        try:
+            with open(PROC_CARDS, 'r') as f:
+                return f.read()
+        except OSError:
+            return ""
+
+    @staticmethod
+    def _parse_cards(raw):
+        cards = {}
+        for line in raw.splitlines():
+            m = _CARD_LINE.match(line)
+            if m:
+                cid = int(m.group(1))
+                cards[cid] = {'id': cid, 'name': m.group(2).strip(), 'description': m.group(3).strip()}
+        return cards
@@ -0,0 +1,217 @@
+import time
+import threading
+import numpy as np
+
+from api.mixer import Source, Resampler, pcm16_to_float, to_stereo, MIXER_RATE
+from api.voice_codec import make_decoder
+
+# --- Playout Policy ---
+JITTER_MIN_DELAY = 0.06        # Seconds of audio buffered before playout starts (floor)
+JITTER_MAX_DELAY = 0.5         # Cap on the adaptive playout delay
+JITTER_DELAY_FACTOR = 4.0      # Target delay = min + factor * interarrival jitter
+JITTER_MAX_EXCESS = 0.25       # Buffered audio beyond target + this is dropped (delay shrinks back)
+JITTER_CONCEALMENT = 'repeat'  # Lost chunk: 'repeat' (last chunk, attenuated, once) or 'silence'
+JITTER_REPEAT_GAIN = 0.5
+
+
+class JitterBufferSource(Source):
+    """
+    Live voice source for chunks that may arrive late, duplicated or out of order.
+    Chunks carry a sequence number and (optionally) a capture timestamp in ms.
+    Playout waits for an adaptive delay, plays chunks in sequence order,
+    conceals gaps and discards chunks that arrive after their slot.
+    Chunks are kept encoded and decoded in playout order (stateful codecs like
+    Opus must see packets in sequence); a lost chunk is concealed by the codec
+    (FEC from the next packet, or PLC) when it can, otherwise by repeat/silence.
+    """
+    def __init__(self, rate, channels=1, gain=1.0, name="live", concealment=JITTER_CONCEALMENT, decoder=None):
+        super().__init__(gain, name)
+        self.rate = rate
+        self.channels = channels
+        self.concealment = concealment
+        self.decoder = decoder or make_decoder('pcm16')
+        self.resampler = Resampler(rate)
+        self.closed = False
+        self._lock = threading.Lock()
+
+        self._packets = {}        # seq -> (encoded frame, seconds)
+        self._packet_seconds = 0.0
+        self._out = np.zeros((0, 2), dtype=np.float32)  # Resampled, ready for the mixer
+        self._next_seq = None
+        self._auto_seq = 0
+        self._buffering = True
+        self._last_chunk = None
+        self._last_duration = None
+        self._repeated = False
+
+        # Jitter estimate (RFC 3550 style, seconds)
+        self._first_arrival = None
+        self._prev_transit = None
+        self.jitter = 0.0
+        self.max_jitter = 0.0
+        self.target_delay = JITTER_MIN_DELAY
+
+        self.counters = {'received': 0, 'played': 0, 'lost': 0, 'late': 0,
+                         'duplicates': 0, 'dropped': 0, 'underruns': 0}
+        self.started_at = time.time()
+
+    # --- Producer side (request threads) ---
+    def push(self, data, seq=None, timestamp=None):
+        """Adds one encoded chunk (decoder's codec). timestamp = capture time in ms (client clock)."""
+        samples = self.decoder.samples(data)
+        if not samples:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self.stopped or self.closed:
+                return
+            if seq is None:
+                seq = self._auto_seq
+            seq = int(seq)
+            self._auto_seq = max(self._auto_seq, seq + 1)
+            self.counters['received'] += 1
+
+            if self._next_seq is not None and seq < self._next_seq:
+                self.counters['late'] += 1  # Its slot already played (or was concealed)
+                return
+            if seq in self._packets:
+                self.counters['duplicates'] += 1
+                return
+
+            duration = samples / self.rate
+            self._update_jitter(now, seq, duration, timestamp)
+            self._packets[seq] = (bytes(data), duration)
+            self._packet_seconds += duration
+
+    def close(self):
+        """Marks end of input; buffered audio still plays out."""
+        with self._lock:
+            self.closed = True
+
+    def buffered_seconds(self):
+        with self._lock:
+            return self._packet_seconds + len(self._out) / MIXER_RATE
+
+    def stats(self):
+        with self._lock:
+            c = dict(self.counters)
+            slots = c['played'] + c['lost']
+            return {
+                **c,
+                'loss_rate': round(c['lost'] / slots, 4) if slots else 0.0,
+                'jitter_ms': round(self.jitter * 1000, 1),
+                'max_jitter_ms': round(self.max_jitter * 1000, 1),
+                'playout_delay_ms': round(self.target_delay * 1000, 1),
+                'buffered_ms': round(self._packet_seconds * 1000, 1),
+                'duration_seconds': round(time.time() - self.started_at, 1)
+            }
+
+    # --- Mixer side ---
+    def _read(self, frames):
+        with self._lock:
+            if self._buffering:
+                if self._packets and (self._packet_seconds >= self.target_delay or self.closed):
+                    self._buffering = False
+                    if self._next_seq is None:
+                        self._next_seq = min(self._packets)
+                elif self.closed:
+                    return np.zeros((0, 2), dtype=np.float32)
+                else:
+                    return np.zeros((frames, 2), dtype=np.float32)
+
+            while len(self._out) < frames:
+                chunk = self._next_chunk()
+                if chunk is None:
+                    break
+                self._out = np.vstack([self._out, to_stereo(self.resampler.process(chunk))])
+            self._trim_excess()
+
+            block, self._out = self._out[:frames], self._out[frames:]
+            if len(block) < frames:
+                if self.closed and not self._packets:
+                    return block  # Drained: source ends
+                # Ran dry: pad and rebuffer up to the (possibly grown) target delay
+                self.counters['underruns'] += 1
+                self._buffering = True
+                block = np.vstack([block, np.zeros((frames - len(block), 2), dtype=np.float32)])
+            return block
+
+    def _next_chunk(self):
+        """Next chunk in sequence order, a concealment chunk for a lost one, or None to wait."""
+        packet = self._packets.pop(self._next_seq, None)
+        if packet is not None:
+            frame, duration = packet
+            self._packet_seconds -= duration
+            self._next_seq += 1
+            self._last_duration = duration
+            chunk = self._to_float(self.decoder.decode(frame))
+            if chunk is None:
+                self.counters['lost'] += 1  # Undecodable: conceal like a lost chunk
+                return self._conceal()
+            self._last_chunk = chunk
+            self._repeated = False
+            self.counters['played'] += 1
+            return chunk
+        if not self._packets:
+            return None  # Nothing newer either: underrun, not loss
+
+        # A later chunk is here but this one missed its playout slot: conceal it
+        # (if it still turns up, push() discards it as late)
+        following = self._packets.get(self._next_seq + 1)
+        self._next_seq += 1
+        self.counters['lost'] += 1
+        if self._last_duration:
+            samples = int(round((following[1] if following else self._last_duration) * self.rate))
+            chunk = self._to_float(self.decoder.conceal(samples, following[0] if following else None))
+            if chunk is not None and len(chunk):
+                self._last_chunk = chunk
+                return chunk
+        return self._conceal()
+
+    def _to_float(self, pcm):
+        usable = len(pcm or b'') - (len(pcm or b'') % (2 * self.channels))
+        return pcm16_to_float(pcm[:usable], self.channels) if usable else None
+
+    def _conceal(self):
+        last = self._last_chunk
+        if last is None:
+            return np.zeros((int(self.rate * 0.02), self.channels), dtype=np.float32)
+        if self.concealment == 'repeat' and not self._repeated:
+            self._repeated = True  # Repeat once; longer gaps fall back to silence
+            return last * JITTER_REPEAT_GAIN
+        return np.zeros_like(last)
+
+    def _trim_excess(self):
+        """
+        Drops the oldest chunks when the buffer grew well past the target (after a burst).
+        Dropped frames still go through the decoder (output discarded): stateful codecs
+        like Opus would otherwise predict the next frame from stale state.
+        """
+        while self._packets and self._packet_seconds > self.target_delay + JITTER_MAX_EXCESS:
+            seq = min(self._packets)
+            frame, duration = self._packets.pop(seq)
+            self.decoder.decode(frame)
+            self._packet_seconds -= duration
+            self._next_seq = seq + 1
+            self.counters['dropped'] += 1
+
+    def _update_jitter(self, arrival, seq, duration, timestamp):
+        if timestamp is not None:
+            media_time = float(timestamp) / 1000.0
+        else:
+            media_time = seq * duration  # Assumes equal-length chunks
+        if self._first_arrival is None:
+            self._first_arrival = arrival
+        transit = (arrival - self._first_arrival) - media_time
+        if self._prev_transit is not None:
+            d = abs(transit - self._prev_transit)
+            self.jitter += (d - self.jitter) / 16.0
+            self.max_jitter = max(self.max_jitter, self.jitter)
+        self._prev_transit = transit
+        self.target_delay = min(JITTER_MAX_DELAY, max(JITTER_MIN_DELAY, JITTER_MIN_DELAY + JITTER_DELAY_FACTOR * self.jitter))
+
+    def _close(self):
+        with self._lock:
+            self.closed = True
+            self._packets.clear()
+            self._packet_seconds = 0.0
@@ -0,0 +1,275 @@
+import os
+import sys
+import json
+import time
+import wave
+import threading
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    from scipy.signal import lfilter  # Optional: runs the K-weighting biquads natively
+except ImportError:
+    lfilter = None
+
+from api.mixer import Resampler, pcm16_to_float, to_stereo, MIXER_RATE
+
+# --- Normalization Policy ---
+LOUDNESS_TARGET = -16.0          # LUFS every media track is brought to
+LOUDNESS_MAX_BOOST = 10.0        # dB; quiet tracks are lifted at most this much
+LOUDNESS_MAX_CUT = 20.0          # dB
+LOUDNESS_PEAK_HEADROOM = 1.0     # dB kept below full scale after the correction
+LOUDNESS_BATCH_WORKERS = os.cpu_count() or 1
+LOUDNESS_SILENT = -120.0         # LUFS stored for tracks with nothing above the gate (so they aren't re-measured)
+
+# ITU-R BS.1770 K-weighting at 48 kHz (pre-filter shelf + RLB high-pass)
+_K_STAGES = (
+    ([1.53512485958697, -2.69169618940638, 1.19839281085285], [1.0, -1.69065929318241, 0.73248077421585]),
+    ([1.0, -2.0, 1.0], [1.0, -1.99004745483398, 0.99007225036621]),
+)
+_SUB_BLOCK = MIXER_RATE // 10    # 100 ms; gating blocks are 4 of these (400 ms, 75% overlap)
+_ABSOLUTE_GATE = -70.0
+_RELATIVE_GATE = -10.0
+_K_IMPULSE_LENGTH = 8192         # Samples of the cascade's impulse response kept (slowest pole decays below 1e-17)
+_BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+class _KWeighting:
+    """
+    The two BS.1770 K-weighting biquads run continuously over a whole stereo stream
+    (filter state carries across chunks). Uses scipy's lfilter when installed; otherwise
+    the cascade's impulse response, truncated where it has decayed to nothing, is
+    applied by FFT overlap-add, which gives the same output to float precision.
+    """
+    def __init__(self):
+        if lfilter is not None:
+            self._state = [np.zeros((2, 2)) for _ in _K_STAGES]  # Per stage: (order, channels)
+        else:
+            self._impulse = self._impulse_response(_K_IMPULSE_LENGTH)
+            self._tail = np.zeros((len(self._impulse) - 1, 2))
+
+    @staticmethod
+    def _impulse_response(n):
+        x = [1.0] + [0.0] * (n - 1)
+        for b, a in _K_STAGES:
+            y, x1, x2, y1, y2 = [], 0.0, 0.0, 0.0, 0.0
+            for x0 in x:
+                y0 = b[0] * x0 + b[1] * x1 + b[2] * x2 - a[1] * y1 - a[2] * y2
+                y.append(y0)
+                x1, x2, y1, y2 = x0, x1, y0, y1
+            x = y
+        return np.array(x)
+
+    def process(self, block):
+        block = block.astype(np.float64)
+        if lfilter is not None:
+            for i, (b, a) in enumerate(_K_STAGES):
+                block, self._state[i] = lfilter(b, a, block, axis=0, zi=self._state[i])
+            return block
+        n = len(block) + len(self._impulse) - 1
+        size = 1 << (n - 1).bit_length()
+        spectrum = np.fft.rfft(self._impulse, size)[:, None]
+        out = np.fft.irfft(np.fft.rfft(block, size, axis=0) * spectrum, size, axis=0)[:n]
+        out[:len(self._tail)] += self._tail
+        self._tail = out[len(block):].copy()
+        return out[:len(block)]
+
+
+def _pcm_blocks(path, frames=_SUB_BLOCK * 50):
+    """Streams a file as float32 stereo at MIXER_RATE (WAV natively, others through SoX)."""
+    path = str(path)
+    if path.lower().endswith('.wav'):
+        try:
+            wf = wave.open(path, 'rb')
+        except (wave.Error, EOFError):
+            wf = None
+        if wf and wf.getsampwidth() != 2:
+            wf.close()
+            wf = None  # 24/32-bit or float WAV -> SoX
+        if wf:
+            with wf:
+                resampler = Resampler(wf.getframerate(), MIXER_RATE)
+                while True:
+                    data = wf.readframes(frames)
+                    if not data:
+                        return
+                    yield to_stereo(resampler.process(to_stereo(pcm16_to_float(data, wf.getnchannels()))))
+
+    cmd = ['sox', '-q', path, '-t', 'raw', '-r', str(MIXER_RATE), '-e', 'signed-integer', '-b', '16', '-c', '2', '-']
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            data = process.stdout.read(frames * 4)
+            if not data:
+                break
+            yield pcm16_to_float(data[:len(data) - len(data) % 4], 2)
+    finally:
+        process.kill()
+        process.wait()
+    if process.returncode not in (0, -9):
+        raise RuntimeError(f"sox exited with {process.returncode}")
+
+
+def measure_loudness(path):
+    """
+    EBU R128 / BS.1770 integrated loudness (LUFS) and sample peak (dBFS) of a file, measured
+    on the stereo signal the mixer actually plays, in one streaming pass.
+    """
+    weighting = _KWeighting()
+    energies = []  # Per 100 ms sub-block: summed channel mean-square after K-weighting
+    peak = 0.0
+    pending = np.zeros((0, 2))
+    for block in _pcm_blocks(path):
+        if not len(block):
+            continue
+        peak = max(peak, float(np.abs(block).max()))
+        filtered = weighting.process(block)
+        pending = np.vstack([pending, filtered]) if len(pending) else filtered
+        usable = len(pending) - len(pending) % _SUB_BLOCK
+        if usable:
+            subs = pending[:usable].reshape(-1, _SUB_BLOCK, 2)
+            energies.append((subs ** 2).mean(axis=1).sum(axis=1))
+            pending = pending[usable:]
+
+    energies = np.concatenate(energies) if energies else np.zeros(0)
+    if len(energies) < 4:
+        return {'integrated': None, 'peak': _db(peak)}
+    blocks = np.convolve(energies, np.ones(4) / 4, mode='valid')  # 400 ms blocks, 100 ms hop
+    with np.errstate(divide='ignore'):
+        levels = -0.691 + 10 * np.log10(blocks)
+    gated = blocks[levels > _ABSOLUTE_GATE]
+    if not len(gated):
+        return {'integrated': None, 'peak': _db(peak)}
+    relative = -0.691 + 10 * np.log10(gated.mean()) + _RELATIVE_GATE
+    gated = blocks[(levels > _ABSOLUTE_GATE) & (levels > relative)]
+    return {'integrated': round(float(-0.691 + 10 * np.log10(gated.mean())), 2), 'peak': _db(peak)}
+
+
+def _db(amplitude):
+    return round(float(20 * np.log10(amplitude)), 2) if amplitude > 0 else None
+
+
+def loudness_gain(integrated, peak):
+    """Linear correction gain towards LOUDNESS_TARGET, limited so the peak keeps its headroom."""
+    if integrated is None or integrated <= LOUDNESS_SILENT:
+        return 1.0
+    gain_db = min(max(LOUDNESS_TARGET - integrated, -LOUDNESS_MAX_CUT), LOUDNESS_MAX_BOOST)
+    if peak is not None:
+        gain_db = min(gain_db, -LOUDNESS_PEAK_HEADROOM - peak)
+    return float(10 ** (gain_db / 20))
+
+
+def _measure_job(path):
+    """
+    Measures one file in a fresh `python -m api.loudness` process (keeps the analysis off
+    the mixer's GIL). A new interpreter rather than a fork of this multithreaded server,
+    whose child could inherit a held lock, and rather than a multiprocessing spawn, which
+    would re-import app.py (and start a second audio service) in every worker.
+    """
+    result = subprocess.run([sys.executable, '-m', 'api.loudness', str(path)], cwd=_BACKEND_DIR,
+                            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode(errors='replace').strip()[-300:] or f"exit code {result.returncode}")
+    return json.loads(result.stdout)
+
+
+class LoudnessAnalyzer:
+    """
+    Measures media tracks off the request path; each measurement is its own Python
+    process, driven by a worker thread. Uploads go through a single background worker;
+    analyze_all() fans the library out across every core.
+    """
+    def __init__(self, library):
+        self.library = library
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = set()
+        self.analyzed = 0
+        self.failures = 0
+        self.cpu_seconds = 0.0
+        self.batch = None  # {'running', 'total', 'done', 'failed', 'workers', 'seconds'}
+
+    def submit(self, name):
+        """Queues one track for analysis (no-op if already queued)."""
+        row = self.library.get(name)
+        if not row:
+            return
+        with self._lock:
+            if name in self._pending:
+                return
+            self._pending.add(name)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="loudness")
+            future = self._executor.submit(_measure_job, str(self.library.media_dir / name))
+        future.add_done_callback(lambda f: self._finish(name, row['sha256'], f))
+
+    def analyze_all(self, force=False, workers=LOUDNESS_BATCH_WORKERS):
+        """Batch mode: analyses every track (or only unmeasured ones) in parallel. Returns False if one is running."""
+        with self._lock:
+            if self.batch and self.batch['running']:
+                return False
+            _, rows = self.library.query()
+            names = [r['name'] for r in rows if force or (r['loudness'] is None and r['peak'] is None)]
+            self.batch = {'running': True, 'total': len(names), 'done': 0, 'failed': 0,
+                          'workers': workers, 'seconds': None}
+        threading.Thread(target=self._run_batch, args=(names, workers), daemon=True).start()
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'target_lufs': LOUDNESS_TARGET,
+                'queued': len(self._pending),
+                'analyzed': self.analyzed,
+                'failures': self.failures,
+                'avg_seconds': round(self.cpu_seconds / self.analyzed, 2) if self.analyzed else None,
+                'batch': dict(self.batch) if self.batch else None
+            }
+
+    def _run_batch(self, names, workers):
+        start = time.perf_counter()
+        hashes = {n: (self.library.get(n) or {}).get('sha256') for n in names}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="loudness-batch") as pool:
+            futures = {pool.submit(_measure_job, str(self.library.media_dir / n)): n for n in names}
+            for future in futures:
+                ok = self._store(futures[future], hashes[futures[future]], future)
+                with self._lock:
+                    self.batch['done' if ok else 'failed'] += 1
+        with self._lock:
+            self.batch.update(running=False, seconds=round(time.perf_counter() - start, 2))
+        print(f"[Loudness] Batch: {self.batch['done']} analysed, {self.batch['failed']} failed in {self.batch['seconds']}s")
+
+    def _finish(self, name, sha256, future):
+        with self._lock:
+            self._pending.discard(name)
+        self._store(name, sha256, future)
+
+    def _store(self, name, sha256, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"[Loudness] Failed to analyse {name}: {e}")
+            with self._lock:
+                self.failures += 1
+            return False
+        row = self.library.get(name)
+        if not row or row['sha256'] != sha256:
+            return False  # Replaced while we were measuring; its re-index queues it again
+        # Silent (or too short to gate) tracks get a sentinel, so startup doesn't queue them again
+        integrated = result['integrated'] if result['integrated'] is not None else LOUDNESS_SILENT
+        self.library.set_loudness(name, integrated, result['peak'])
+        with self._lock:
+            self.analyzed += 1
+            self.cpu_seconds += result['seconds']
+        return True
+
+
+if __name__ == '__main__':
+    # Worker entry point (see _measure_job): prints the measurement as JSON
+    start = time.perf_counter()
+    measured = measure_loudness(sys.argv[1])
+    measured['seconds'] = time.perf_counter() - start
+    print(json.dumps(measured))
@@ -0,0 +1,323 @@
+import os
+import time
+import wave
+import sqlite3
+import hashlib
+import mimetypes
+import threading
+import subprocess
+from pathlib import Path
+
+from api.loudness import loudness_gain
+
+MEDIA_LIBRARY_DB = ".library.db"
+MEDIA_LIBRARY_POLL = 10.0       # Seconds between incremental rescans (catches files changed outside the API)
+MEDIA_SORT_COLUMNS = {
+    'name': 'name COLLATE NOCASE',
+    'date': 'mtime',
+    'size': 'size',
+    'duration': 'duration',
+    'loudness': 'loudness',
+}
+MEDIA_CODECS = {'.mp3': 'mp3', '.wav': 'pcm', '.flac': 'flac', '.ogg': 'vorbis', '.opus': 'opus',
+                '.m4a': 'aac', '.aac': 'aac', '.webm': 'opus'}
+
+# Columns added after the first release of the index
+_MIGRATIONS = {'peak': 'REAL', 'playback_status': 'TEXT', 'playback_progress': 'REAL', 'playback_error': 'TEXT'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    sha256 TEXT,
+    duration REAL,
+    sample_rate INTEGER,
+    channels INTEGER,
+    codec TEXT,
+    mime TEXT,
+    loudness REAL,
+    indexed_at REAL,
+    peak REAL,
+    playback_status TEXT,
+    playback_progress REAL,
+    playback_error TEXT
+);
+CREATE INDEX IF NOT EXISTS tracks_mtime ON tracks(mtime);
+CREATE INDEX IF NOT EXISTS tracks_codec ON tracks(codec);
+CREATE INDEX IF NOT EXISTS tracks_sha256 ON tracks(sha256);
+"""
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _soxi(path, flag):
+    try:
+        out = subprocess.run(['soxi', flag, str(path)], stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, timeout=10, check=True).stdout.strip()
+        return float(out) if out else None
+    except Exception:
+        return None
+
+
+class MediaLibrary:
+    """
+    SQLite index of media/ (size, mtime, hash, duration, format, loudness/peak).
+    Files are probed once and re-probed only when their size or mtime changes,
+    so listing the library never touches the files themselves.
+    """
+    def __init__(self, media_dir, seek_index=None):
+        self.media_dir = Path(media_dir)
+        self.media_dir.mkdir(parents=True, exist_ok=True)
+        self.seek_index = seek_index
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.media_dir / MEDIA_LIBRARY_DB), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+            existing = {r['name'] for r in self._db.execute("PRAGMA table_info(tracks)")}
+            for column, kind in _MIGRATIONS.items():
+                if column not in existing:
+                    self._db.execute(f"ALTER TABLE tracks ADD COLUMN {column} {kind}")
+            self._db.commit()
+        self.analyzer = None   # LoudnessAnalyzer, measures new/changed tracks
+        self.transcoder = None  # Transcoder, makes the canonical playback copy
+        self._watcher = None
+        self.scans = 0
+        self.probes = 0
+        self.last_scan = None  # {'at', 'seconds', 'added', 'updated', 'removed'}
+
+    # --- Queries ---
+    def query(self, search=None, codec=None, status=None, sort='name', order='asc', limit=None, offset=0):
+        """Returns (total, rows) for one page of the library."""
+        where, params = [], []
+        if search:
+            escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            where.append("name LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        if codec:
+            where.append("codec = ?")
+            params.append(codec.lower())
+        if status:
+            where.append("playback_status = ?")
+            params.append(status)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        column = MEDIA_SORT_COLUMNS.get(sort, MEDIA_SORT_COLUMNS['name'])
+        direction = 'DESC' if str(order).lower() == 'desc' else 'ASC'
+
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM tracks{clause}", params).fetchone()[0]
+            sql = f"SELECT * FROM tracks{clause} ORDER BY {column} {direction}, name"
+            page = list(params)
+            if limit is not None:
+                sql += " LIMIT ? OFFSET ?"
+                page += [int(limit), int(offset)]
+            elif offset:
+                sql += " LIMIT -1 OFFSET ?"
+                page.append(int(offset))
+            rows = [dict(r) for r in self._db.execute(sql, page).fetchall()]
+        return total, rows
+
+    def get(self, name):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM tracks WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row else None
+
+    # --- Updates ---
+    def update(self, name, sha256=None):
+        """(Re)probes one file and stores it (sha256 if the caller already hashed it). Returns its row, or None if the file is gone."""
+        path = self.media_dir / name
+        try:
+            st = path.stat()
+        except OSError:
+            self.remove(name)
+            return None
+        row = self._probe(path, st, sha256)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO tracks (name, size, mtime, sha256, duration, sample_rate, channels,"
+                " codec, mime, loudness, peak, indexed_at, playback_status, playback_progress, playback_error)"
+                " VALUES (:name, :size, :mtime, :sha256, :duration, :sample_rate, :channels, :codec, :mime,"
+                " :loudness, :peak, :indexed_at, :playback_status, :playback_progress, :playback_error)", row)
+            self._db.commit()
+        if self.transcoder and row['playback_status'] != 'ready':
+            if self.transcoder.is_ready(row['sha256']):
+                self.set_playback(row['sha256'], 'ready', 1.0)  # Same content is already transcoded
+                row.update(playback_status='ready', playback_progress=1.0)
+            else:
+                self.transcoder.submit(name)
+        if self.analyzer and row['loudness'] is None and row['peak'] is None:
+            self.analyzer.submit(name)
+        return row
+
+    def remove(self, name):
+        row = self.get(name)
+        with self._lock:
+            self._db.execute("DELETE FROM tracks WHERE name = ?", (name,))
+            self._db.commit()
+            shared = row and self._db.execute("SELECT 1 FROM tracks WHERE sha256 = ? LIMIT 1", (row['sha256'],)).fetchone()
+        if self.seek_index:
+            self.seek_index.remove(self.media_dir / name)
+        if self.transcoder and row and not shared:
+            self.transcoder.release(row['sha256'])
+
+    def set_loudness(self, name, loudness, peak):
+        with self._lock:
+            self._db.execute("UPDATE tracks SET loudness = ?, peak = ? WHERE name = ?", (loudness, peak, name))
+            self._db.commit()
+
+    def set_playback(self, sha256, status, progress=None, error=None):
+        """Transcode state for every track with this content."""
+        with self._lock:
+            self._db.execute("UPDATE tracks SET playback_status = ?, playback_progress = ?, playback_error = ? WHERE sha256 = ?",
+                             (status, progress, error, sha256))
+            self._db.commit()
+
+    def playback_path(self, path):
+        """Canonical playback copy of a media file if it is ready, else None."""
+        path = Path(path)
+        if not self.transcoder or path.parent.resolve() != self.media_dir.resolve():
+            return None
+        row = self.get(path.name)
+        if not row or row['playback_status'] != 'ready':
+            return None
+        playback = self.transcoder.playback_path(row['sha256'])
+        return playback if playback.exists() else None
+
+    def gain(self, path):
+        """Stored loudness correction (linear) for a media file; 1.0 if unmeasured or not in media/."""
+        path = Path(path)
+        if path.parent.resolve() != self.media_dir.resolve():
+            return 1.0
+        row = self.get(path.name)
+        return loudness_gain(row['loudness'], row['peak']) if row else 1.0
+
+    def sync(self):
+        """Incremental rescan: probes new/changed files, drops missing ones."""
+        start = time.perf_counter()
+        on_disk = {}
+        for entry in os.scandir(self.media_dir):
+            if entry.is_file() and not entry.name.startswith(('.', 'temp_')):
+                st = entry.stat()
+                on_disk[entry.name] = (st.st_size, st.st_mtime)
+        with self._lock:
+            known = {r['name']: (r['size'], r['mtime']) for r in self._db.execute("SELECT name, size, mtime FROM tracks")}
+
+        changed = [n for n, sig in on_disk.items() if known.get(n) != sig]
+        removed = [n for n in known if n not in on_disk]
+        for name in changed:
+            try:
+                self.update(name)
+            except Exception as e:
+                print(f"[MediaLibrary] Failed to index {name}: {e}")
+        for name in removed:
+            self.remove(name)
+        if self.analyzer and not self.scans:
+            # Tracks indexed before loudness analysis existed (or whose analysis was interrupted)
+            with self._lock:
+                unmeasured = [r['name'] for r in self._db.execute(
+                    "SELECT name FROM tracks WHERE loudness IS NULL AND peak IS NULL")]
+            for name in unmeasured:
+                self.analyzer.submit(name)
+        if self.transcoder and not self.scans:
+            # Tracks from before transcoding existed, whose job was cut short by a restart,
+            # or whose playback copy is gone
+            with self._lock:
+                untranscoded = [r['name'] for r in self._db.execute(
+                    "SELECT name, sha256, playback_status FROM tracks")
+                    if r['playback_status'] in (None, 'pending', 'transcoding')
+                    or (r['playback_status'] == 'ready' and not self.transcoder.is_ready(r['sha256']))]
+            for name in untranscoded:
+                self.transcoder.submit(name)
+
+        self.scans += 1
+        added = sum(1 for n in changed if n not in known)
+        self.last_scan = {
+            'at': time.time(),
+            'seconds': round(time.perf_counter() - start, 3),
+            'added': added,
+            'updated': len(changed) - added,
+            'removed': len(removed)
+        }
+        if changed or removed:
+            print(f"[MediaLibrary] Rescan: +{added} ~{len(changed) - added} -{len(removed)}")
+        return self.last_scan
+
+    def start_watching(self, interval=MEDIA_LIBRARY_POLL):
+        if self._watcher:
+            return
+        def watch():
+            while True:
+                try: self.sync()
+                except Exception as e: print(f"[MediaLibrary] Rescan failed: {e}")
+                time.sleep(interval)
+        self._watcher = threading.Thread(target=watch, daemon=True)
+        self._watcher.start()
+
+    def stats(self):
+        with self._lock:
+            count, size, duration = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(duration), 0) FROM tracks").fetchone()
+        return {
+            'tracks': count,
+            'total_mb': round(size / 1024 / 1024, 2),
+            'total_hours': round(duration / 3600, 2),
+            'scans': self.scans,
+            'probes': self.probes,
+            'last_scan': self.last_scan
+        }
+
+    # --- Probing ---
+    def _probe(self, path, st, sha256=None):
+        self.probes += 1
+        suffix = path.suffix.lower()
+        row = {
+            'name': path.name,
+            'size': st.st_size,
+            'mtime': st.st_mtime,
+            'sha256': sha256 or _sha256(path),
+            'duration': None,
+            'sample_rate': None,
+            'channels': None,
+            'codec': MEDIA_CODECS.get(suffix, suffix.lstrip('.') or None),
+            'mime': mimetypes.guess_type(path.name)[0] or 'application/octet-stream',
+            'loudness': None,
+            'peak': None,
+            'indexed_at': time.time(),
+            'playback_status': None,
+            'playback_progress': None,
+            'playback_error': None
+        }
+        previous = self.get(path.name)
+        if previous and previous['sha256'] == row['sha256']:
+            # Touched, not changed
+            for key in ('loudness', 'peak', 'playback_status', 'playback_progress', 'playback_error'):
+                row[key] = previous[key]
+
+        if suffix == '.mp3' and self.seek_index:
+            index = self.seek_index.get(path)
+            if index:
+                row.update(duration=index['duration'], sample_rate=index['sample_rate'],
+                           channels=index.get('channels'))
+                return row
+        if suffix == '.wav':
+            try:
+                with wave.open(str(path), 'rb') as wf:
+                    rate = wf.getframerate()
+                    row.update(duration=round(wf.getnframes() / rate, 3), sample_rate=rate,
+                               channels=wf.getnchannels())
+                    return row
+            except (wave.Error, EOFError):
+                pass
+        duration, rate, channels = _soxi(path, '-D'), _soxi(path, '-r'), _soxi(path, '-c')
+        row.update(duration=round(duration, 3) if duration else None,
+                   sample_rate=int(rate) if rate else None,
+                   channels=int(channels) if channels else None)
+        return row
@@ -0,0 +1,301 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from pathlib import Path
+
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024       # Suggested client chunk (a lost chunk costs at most this much)
+UPLOAD_MAX_CHUNK = 32 * 1024 * 1024
+UPLOAD_MAX_SIZE = 4 * 1024 * 1024 * 1024
+UPLOAD_SESSION_TTL = 24 * 3600            # Unfinished uploads are dropped after a day
+
+
+class OffsetMismatch(ValueError):
+    """A chunk didn't start where the server's copy ends (client should resume from `offset`)."""
+    def __init__(self, offset):
+        super().__init__(f"Upload is at byte {offset}")
+        self.offset = offset
+
+
+def safe_name(filename):
+    """Display name for a file in media/ (no paths, no hidden/internal names)."""
+    name = os.path.basename(str(filename or '').replace('\\', '/')).strip()
+    if not name or name.startswith('.'):
+        raise ValueError(f"Invalid filename: {filename!r}")
+    return name
+
+
+class MediaStore:
+    """
+    Content-addressed media storage: each distinct file is one blob in media/.blobs/<sha256>,
+    and every display name in media/ is a hard link to its blob, so the same track uploaded
+    twice takes the space once and the link count is the blob's reference count.
+    Uploads are chunked sessions in media/.uploads/ that survive dropped connections
+    and restarts; the SHA-256 is computed while the chunks stream in.
+    """
+    def __init__(self, media_dir):
+        self.media_dir = Path(media_dir).resolve()
+        self.blobs_dir = self.media_dir / ".blobs"
+        self.uploads_dir = self.media_dir / ".uploads"
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.uploads_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._sessions = {}   # upload_id -> session dict (mirrored to <id>.json)
+        self._hashers = {}    # upload_id -> (sha256 object, bytes hashed); lost on restart, rebuilt on complete
+        self.dedup_hits = 0
+        self.resumes = 0
+        self._load_sessions()
+
+    # --- Chunked uploads ---
+    def create(self, filename, size, sha256=None, user=None):
+        """
+        Starts an upload. If the client sent the hash of content we already hold,
+        the file is linked at once and {'complete': True, 'name', 'sha256'} is returned.
+        """
+        filename = safe_name(filename)
+        size = int(size)
+        if size < 0 or size > UPLOAD_MAX_SIZE:
+            raise ValueError(f"Upload size must be between 0 and {UPLOAD_MAX_SIZE} bytes")
+        sha256 = sha256.lower() if sha256 else None
+        if sha256 and (self.blobs_dir / sha256).exists():
+            name = self._link(sha256, filename)
+            with self._lock:
+                self.dedup_hits += 1
+            return {'complete': True, 'name': name, 'sha256': sha256, 'size': size}
+
+        upload_id = uuid.uuid4().hex
+        session = {'id': upload_id, 'filename': filename, 'size': size, 'offset': 0, 'sha256': sha256,
+                   'user': user, 'created': time.time(), 'updated': time.time()}
+        self._part(upload_id).touch()
+        with self._lock:
+            self._sessions[upload_id] = session
+            self._hashers[upload_id] = (hashlib.sha256(), 0)
+            self._save(session)
+        self.expire()
+        return dict(session, complete=False, chunk_size=UPLOAD_CHUNK_SIZE)
+
+    def status(self, upload_id):
+        with self._lock:
+            return dict(self._session(upload_id))
+
+    def write(self, upload_id, offset, data):
+        """Appends one chunk at `offset`. Raises OffsetMismatch if it isn't where the upload stands."""
+        if len(data) > UPLOAD_MAX_CHUNK:
+            raise ValueError(f"Chunk larger than {UPLOAD_MAX_CHUNK} bytes")
+        with self._lock:
+            session = self._session(upload_id)
+            if offset != session['offset']:
+                raise OffsetMismatch(session['offset'])
+            if offset + len(data) > session['size']:
+                raise ValueError("Chunk runs past the declared upload size")
+            if upload_id not in self._hashers:
+                self.resumes += 1  # First chunk since a restart; the hash is redone on complete
+                self._hashers[upload_id] = (None, None)
+            with open(self._part(upload_id), 'r+b') as f:
+                f.seek(offset)
+                f.write(data)
+                f.truncate()
+            hasher, hashed = self._hashers.get(upload_id, (None, None))
+            if hasher is not None and hashed == offset:
+                hasher.update(data)
+                self._hashers[upload_id] = (hasher, offset + len(data))
+            session['offset'] = offset + len(data)
+            session['updated'] = time.time()
+            self._save(session)
+            return dict(session)
+
+    def complete(self, upload_id):
+        """Verifies and stores a finished upload. Returns {'name', 'sha256', 'size', 'deduplicated'}."""
+        with self._lock:
+            session = self._session(upload_id)
+            if session['offset'] != session['size']:
+                raise OffsetMismatch(session['offset'])
+            hasher, hashed = self._hashers.pop(upload_id, (None, None))
+            del self._sessions[upload_id]
+        part = self._part(upload_id)
+        if hasher is None or hashed != session['size']:
+            hasher = _hash_file(part)  # Resumed after a restart: hash what is on disk
+        digest = hasher.hexdigest()
+        self._meta(upload_id).unlink(missing_ok=True)
+        if session['sha256'] and session['sha256'] != digest:
+            part.unlink(missing_ok=True)
+            raise ValueError("Uploaded content does not match the declared SHA-256")
+        deduplicated = self._store_blob(part, digest)
+        return {'name': self._link(digest, session['filename']), 'sha256': digest,
+                'size': session['size'], 'deduplicated': deduplicated}
+
+    def abort(self, upload_id):
+        with self._lock:
+            self._session(upload_id)
+            del self._sessions[upload_id]
+            self._hashers.pop(upload_id, None)
+        self._part(upload_id).unlink(missing_ok=True)
+        self._meta(upload_id).unlink(missing_ok=True)
+
+    def expire(self, ttl=UPLOAD_SESSION_TTL):
+        """Drops upload sessions that haven't received a chunk within ttl."""
+        cutoff = time.time() - ttl
+        with self._lock:
+            stale = [uid for uid, s in self._sessions.items() if s['updated'] < cutoff]
+        for upload_id in stale:
+            try: self.abort(upload_id)
+            except KeyError: pass
+
+    # --- Single-request uploads ---
+    def ingest(self, fileobj, filename):
+        """Streams a whole file (legacy multipart upload) into the store, hashing as it goes."""
+        filename = safe_name(filename)
+        part = self.uploads_dir / f"ingest-{uuid.uuid4().hex}.part"
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with open(part, 'wb') as f:
+                for chunk in iter(lambda: fileobj.read(1024 * 1024), b''):
+                    hasher.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+        except Exception:
+            part.unlink(missing_ok=True)
+            raise
+        digest = hasher.hexdigest()
+        deduplicated = self._store_blob(part, digest)
+        return {'name': self._link(digest, filename), 'sha256': digest, 'size': size, 'deduplicated': deduplicated}
+
+    # --- Names ---
+    def path(self, name):
+        """Absolute path of a display name. Raises ValueError for names that would leave media/."""
+        path = (self.media_dir / safe_name(name)).resolve()
+        if path.parent != self.media_dir:
+            raise ValueError(f"Invalid filename: {name!r}")
+        return path
+
+    def remove(self, name, sha256=None):
+        """Deletes a display name; its blob goes once no other name links to it."""
+        path = self.path(name)
+        st = path.stat()
+        os.remove(path)
+        candidates = [self.blobs_dir / sha256] if sha256 else self._blobs_with_inode(st)
+        for blob in candidates:
+            try:
+                if blob.stat().st_ino == st.st_ino and blob.stat().st_nlink <= 1:
+                    blob.unlink()
+            except OSError:
+                pass
+
+    def stats(self):
+        blobs = linked = 0
+        blob_bytes = linked_bytes = 0
+        inodes = set()
+        for entry in os.scandir(self.blobs_dir):
+            st = entry.stat()
+            blobs += 1
+            blob_bytes += st.st_size
+            inodes.add(st.st_ino)
+        for entry in os.scandir(self.media_dir):
+            if entry.is_file() and not entry.name.startswith('.'):
+                st = entry.stat()
+                if st.st_ino in inodes:
+                    linked += 1
+                    linked_bytes += st.st_size
+        with self._lock:
+            sessions = len(self._sessions)
+        return {
+            'blobs': blobs,
+            'blob_mb': round(blob_bytes / 1024 / 1024, 2),
+            'linked_files': linked,
+            'saved_mb': round((linked_bytes - blob_bytes) / 1024 / 1024, 2),
+            'dedup_hits': self.dedup_hits,
+            'resumed_uploads': self.resumes,
+            'open_uploads': sessions
+        }
+
+    # --- Internals ---
+    def _store_blob(self, part, digest):
+        """Moves a finished part into the blob store. Returns True if the content was already there."""
+        blob = self.blobs_dir / digest
+        with self._lock:
+            if blob.exists():
+                part.unlink(missing_ok=True)
+                self.dedup_hits += 1
+                return True
+            os.replace(part, blob)
+            os.chmod(blob, 0o444)  # Blobs are shared between names; never modify in place
+            return False
+
+    def _link(self, digest, filename):
+        """
+        Points a display name at a blob. The same name with the same content is a no-op;
+        a different file already using the name gets 'name (1).ext', 'name (2).ext', ...
+        """
+        blob = self.blobs_dir / digest
+        stem, ext = os.path.splitext(filename)
+        n = 0
+        while n < 1000:
+            name = filename if n == 0 else f"{stem} ({n}){ext}"
+            path = self.media_dir / name
+            with self._lock:
+                if not path.exists():
+                    try:
+                        os.link(blob, path)
+                    except OSError:
+                        shutil.copyfile(blob, path)  # Filesystem without hard links: no dedup, still works
+                    return name
+                if os.path.samefile(path, blob):
+                    return name
+            # Not our blob (copy, or predates the store): compare content without holding the lock
+            try:
+                if _hash_file(path).hexdigest() == digest:
+                    return name
+            except FileNotFoundError:
+                continue  # Deleted meanwhile: the name is free again
+            n += 1
+        raise ValueError(f"Too many files named like {filename}")
+
+    def _blobs_with_inode(self, st):
+        if st.st_nlink <= 1:
+            return []  # Not linked to a blob (file predates the store, or copied)
+        return [Path(e.path) for e in os.scandir(self.blobs_dir) if e.inode() == st.st_ino]
+
+    def _session(self, upload_id):
+        session = self._sessions.get(upload_id)
+        if session is None:
+            raise KeyError(upload_id)
+        return session
+
+    def _part(self, upload_id):
+        return self.uploads_dir / f"{upload_id}.part"
+
+    def _meta(self, upload_id):
+        return self.uploads_dir / f"{upload_id}.json"
+
+    def _save(self, session):
+        tmp = self._meta(session['id']).with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(session, f)
+        os.replace(tmp, self._meta(session['id']))
+
+    def _load_sessions(self):
+        for meta in self.uploads_dir.glob('*.json'):
+            try:
+                with open(meta) as f:
+                    session = json.load(f)
+                # The part file is the truth (the metadata may lag the last write)
+                session['offset'] = min(self._part(session['id']).stat().st_size, session['size'])
+                self._sessions[session['id']] = session
+            except (OSError, ValueError, KeyError):
+                meta.unlink(missing_ok=True)
+        for part in self.uploads_dir.glob('ingest-*.part'):
+            part.unlink(missing_ok=True)  # Interrupted single-request uploads can't resume
+        if self._sessions:
+            print(f"[MediaStore] {len(self._sessions)} unfinished upload(s) can be resumed")
+
+
+def _hash_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h
@@ -0,0 +1,953 @@
+import time
+import wave
+import threading
+import subprocess
+from collections import deque
+
+import numpy as np
+
+try:
+    import alsaaudio  # Optional: pyalsaaudio writes straight to the device (no aplay process)
+except ImportError:
+    alsaaudio = None
+
+# --- Engine Format ---
+MIXER_RATE = 48000
+MIXER_CHANNELS = 2
+MIXER_BLOCK = 1024               # Frames per mix cycle (~21 ms)
+MIXER_PREFILL_BLOCKS = 3         # Silence written when a sink opens (absorbs scheduling jitter)
+SINK_IDLE_CLOSE = 30.0           # Seconds an on-demand card sink stays open with nothing routed to it
+SINK_REOPEN_INTERVAL = 5.0       # Retry period for a persistent sink whose device failed
+DECODER_BUFFER_SECONDS = 2.0     # Read-ahead for streamed file decoding
+SINK_QUEUE_BLOCKS = 8            # Per-sink ring buffer (~170 ms); 0 = write inline from the mix thread
+SINK_OVERFLOW_POLICY = 'drop_oldest'  # When a card can't keep up: 'drop_oldest' (stay live) or 'drop_newest'
+SINK_CLOSE_TIMEOUT = 0.2         # Seconds to let a writer thread finish before its device is closed under it
+SINK_PACE_DEPTH = 2              # Mix thread runs ahead of each card until this many blocks are queued (device clock paces mixing)
+
+
+# --- PCM Helpers ---
+def pcm16_to_float(data, channels):
+    """Interleaved signed 16-bit bytes -> float32 array (frames, channels)."""
+    samples = np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768.0
+    return samples.reshape(-1, channels)
+
+
+def to_stereo(pcm):
+    if pcm.ndim == 1:
+        pcm = pcm.reshape(-1, 1)
+    if pcm.shape[1] == 2:
+        return pcm
+    if pcm.shape[1] == 1:
+        return np.repeat(pcm, 2, axis=1)
+    return pcm[:, :2]
+
+
+class Resampler:
+    """Streaming linear-interpolation resampler (keeps phase across chunks)."""
+    def __init__(self, src_rate, dst_rate=MIXER_RATE):
+        self.ratio = src_rate / dst_rate  # Input frames per output frame
+        self.pos = 0.0
+        self.tail = None
+
+    def process(self, x):
+        if self.ratio == 1.0 or len(x) == 0:
+            return x
+        if self.tail is not None:
+            x = np.vstack([self.tail, x])
+        n = len(x)
+        if n - 1 < self.pos:
+            self.tail = x[-1:]
+            self.pos -= n - 1
+            return np.zeros((0, x.shape[1]), dtype=np.float32)
+        count = int(np.floor((n - 1 - self.pos) / self.ratio)) + 1
+        positions = self.pos + np.arange(count) * self.ratio
+        idx = positions.astype(np.int64)
+        frac = (positions - idx).astype(np.float32)[:, None]
+        nxt = np.minimum(idx + 1, n - 1)
+        out = x[idx] * (1.0 - frac) + x[nxt] * frac
+        self.tail = x[-1:]
+        self.pos = (self.pos + count * self.ratio) - (n - 1)
+        return out.astype(np.float32)
+
+
+def decode_file(path, rate=MIXER_RATE, start_time=0):
+    """Decodes a whole audio file to float32 stereo at `rate` (WAV natively, others via SoX)."""
+    path = str(path)
+    if path.lower().endswith('.wav'):
+        try:
+            with wave.open(path, 'rb') as wf:
+                if wf.getsampwidth() == 2:
+                    src_rate = wf.getframerate()
+                    if start_time > 0:
+                        wf.setpos(min(wf.getnframes(), int(start_time * src_rate)))
+                    pcm = pcm16_to_float(wf.readframes(wf.getnframes()), wf.getnchannels())
+                    return to_stereo(Resampler(src_rate, rate).process(to_stereo(pcm)))
+        except wave.Error:
+            pass  # Compressed WAV / WebM in disguise -> let SoX handle it
+
+    cmd = ['sox', '-q', path, '-t', 'raw', '-r', str(rate), '-e', 'signed-integer', '-b', '16', '-c', '2', '-']
+    if start_time > 0:
+        cmd.extend(['trim', str(start_time)])
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+    return pcm16_to_float(result.stdout, 2)
+
+
+# --- Sources ---
+class Source:
+    """Something the engine pulls stereo float32 blocks from."""
+    def __init__(self, gain=1.0, name="source"):
+        self.name = name
+        self.gain = float(gain)
+        self.done = threading.Event()
+        self.started = threading.Event()  # Set when the engine mixes its first block
+        self.queued_at = None
+        self.stopped = False
+        self._ramp_target = self.gain
+        self._ramp_left = 0
+        self._ramp_step = 0.0
+
+    def set_gain(self, target, ramp_seconds=0.0, rate=MIXER_RATE):
+        """Sets gain, optionally as a per-sample linear ramp."""
+        frames = int(ramp_seconds * rate)
+        if frames <= 0:
+            self.gain = self._ramp_target = float(target)
+            self._ramp_left = 0
+            return
+        self._ramp_target = float(target)
+        self._ramp_step = (self._ramp_target - self.gain) / frames
+        self._ramp_left = frames
+
+    def read_block(self, frames):
+        """Returns (samples, ended). Samples are gain-applied and only shorter than `frames` at the end."""
+        block = self._read(frames)
+        return self._apply_gain(block), len(block) < frames
+
+    def stop(self):
+        self.stopped = True
+        try:
+            self._close()
+        finally:
+            self.done.set()
+
+    # Subclass hooks
+    def _read(self, frames):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    def _apply_gain(self, block):
+        frames = len(block)
+        if self._ramp_left > 0:
+            n = min(frames, self._ramp_left)
+            env = np.full(frames, self._ramp_target, dtype=np.float32)
+            env[:n] = self.gain + self._ramp_step * np.arange(1, n + 1, dtype=np.float32)
+            self._ramp_left -= n
+            self.gain = float(env[n - 1]) if self._ramp_left else self._ramp_target
+            return block * env[:, None]
+        if self.gain == 1.0:
+            return block
+        return block * self.gain
+
+
+class BufferSource(Source):
+    """Fully decoded PCM held in memory (chimes, TTS renders)."""
+    def __init__(self, pcm, gain=1.0, loop=False, name="buffer"):
+        super().__init__(gain, name)
+        self.pcm = to_stereo(pcm).astype(np.float32, copy=False)
+        self.loop = loop
+        self.pos = 0
+
+    def _read(self, frames):
+        if self.loop and len(self.pcm):
+            idx = (self.pos + np.arange(frames)) % len(self.pcm)
+            self.pos = (self.pos + frames) % len(self.pcm)
+            return self.pcm[idx]
+        block = self.pcm[self.pos:self.pos + frames]
+        self.pos += len(block)
+        return block
+
+
+class StreamSource(Source):
+    """
+    PCM pushed from another thread (live voice, streamed TTS, file decoders).
+    Underruns play silence; the source ends once closed and drained.
+    """
+    def __init__(self, rate, channels=1, gain=1.0, max_seconds=None, name="stream"):
+        super().__init__(gain, name)
+        self.channels = channels
+        self.resampler = Resampler(rate)
+        self.max_frames = int(max_seconds * MIXER_RATE) if max_seconds else None
+        self.closed = False
+        self.underruns = 0
+        self._chunks = deque()
+        self._buffered = 0
+        self._partial = b''
+        self._cond = threading.Condition()
+
+    def push_pcm(self, data):
+        """Queues interleaved 16-bit PCM bytes. Blocks while the read-ahead buffer is full."""
+        data = self._partial + data
+        usable = len(data) - (len(data) % (2 * self.channels))
+        self._partial = data[usable:]
+        if not usable:
+            return
+        block = to_stereo(self.resampler.process(pcm16_to_float(data[:usable], self.channels)))
+        with self._cond:
+            while self.max_frames and self._buffered >= self.max_frames and not self.stopped:
+                self._cond.wait(0.1)
+            if self.stopped:
+                return
+            self._chunks.append(block)
+            self._buffered += len(block)
+
+    def close(self):
+        """Marks end of input; remaining audio still plays out."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def buffered_seconds(self):
+        return self._buffered / MIXER_RATE
+
+    def _read(self, frames):
+        out = []
+        need = frames
+        with self._cond:
+            while need and self._chunks:
+                chunk = self._chunks[0]
+                if len(chunk) <= need:
+                    out.append(self._chunks.popleft())
+                    need -= len(chunk)
+                else:
+                    out.append(chunk[:need])
+                    self._chunks[0] = chunk[need:]
+                    need = 0
+            self._buffered -= frames - need
+            self._cond.notify_all()
+            closed = self.closed
+
+        if need and not closed:
+            self.underruns += 1
+            out.append(np.zeros((need, 2), dtype=np.float32))
+        if not out:
+            return np.zeros((0, 2), dtype=np.float32)
+        return np.vstack(out) if len(out) > 1 else out[0]
+
+    def _close(self):
+        with self._cond:
+            self.closed = True
+            self._chunks.clear()
+            self._buffered = 0
+            self._cond.notify_all()
+
+
+class DecoderSource(StreamSource):
+    """
+    Decodes a (long) file once with SoX in the background, read-ahead bounded.
+    With `seek` = (byte_offset, skip_seconds) from the seek index, SoX is fed the MP3
+    from that frame on, so only `skip_seconds` (< one index step) is decoded and dropped.
+    """
+    def __init__(self, path, start_time=0, gain=1.0, name=None, seek=None):
+        super().__init__(MIXER_RATE, channels=2, gain=gain,
+                         max_seconds=DECODER_BUFFER_SECONDS, name=name or str(path))
+        self.path = str(path)
+        self.seek = seek
+        if seek:
+            offset, start_time = seek
+        source = ['-t', 'mp3', '-'] if seek else [self.path]
+        cmd = ['sox', '-q'] + source + ['-t', 'raw', '-r', str(MIXER_RATE),
+               '-e', 'signed-integer', '-b', '16', '-c', '2', '-']
+        if start_time > 0:
+            cmd.extend(['trim', str(start_time)])
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE if seek else None,
+                                        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        if seek:
+            threading.Thread(target=self._feed, args=(offset,), daemon=True).start()
+        threading.Thread(target=self._pump, daemon=True).start()
+
+    def _feed(self, offset):
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                while not self.stopped:
+                    data = f.read(65536)
+                    if not data:
+                        break
+                    self.process.stdin.write(data)
+        except Exception:
+            pass
+        try:
+            self.process.stdin.close()
+        except Exception:
+            pass
+
+    def _pump(self):
+        try:
+            while not self.stopped:
+                data = self.process.stdout.read(16384)
+                if not data:
+                    break
+                self.push_pcm(data)
+        except Exception:
+            pass
+        self.close()
+
+    def _close(self):
+        super()._close()
+        try:
+            self.process.kill()
+        except Exception:
+            pass
+
+
+class WavFileSource(StreamSource):
+    """
+    Streams a 16-bit PCM WAV from disk in-process (no SoX). Used for transcoded
+    playback copies: at the mixer rate there is nothing to decode and a seek is a frame offset.
+    """
+    def __init__(self, path, start_time=0, gain=1.0, name=None):
+        self.wav = wave.open(str(path), 'rb')
+        super().__init__(self.wav.getframerate(), channels=self.wav.getnchannels(), gain=gain,
+                         max_seconds=DECODER_BUFFER_SECONDS, name=name or str(path))
+        if start_time > 0:
+            self.wav.setpos(min(self.wav.getnframes(), int(start_time * self.wav.getframerate())))
+        threading.Thread(target=self._pump, daemon=True).start()
+
+    def _pump(self):
+        try:
+            while not self.stopped:
+                data = self.wav.readframes(MIXER_BLOCK * 4)
+                if not data:
+                    break
+                self.push_pcm(data)
+        except Exception:
+            pass
+        finally:
+            self.wav.close()
+        self.close()
+
+
+class SequenceSource(Source):
+    """Plays child sources back-to-back with no gap (intro -> body)."""
+    def __init__(self, sources, gain=1.0, name="sequence"):
+        super().__init__(gain, name)
+        self.sources = [s for s in sources if s is not None]
+        self.index = 0
+
+    def _read(self, frames):
+        parts = []
+        need = frames
+        while need and self.index < len(self.sources):
+            child = self.sources[self.index]
+            block, ended = child.read_block(need)
+            if ended:
+                self.index += 1
+                child.done.set()
+            if len(block):
+                parts.append(block)
+                need -= len(block)
+        if not parts:
+            return np.zeros((0, 2), dtype=np.float32)
+        return np.vstack(parts) if len(parts) > 1 else parts[0]
+
+    def _close(self):
+        for s in self.sources:
+            s.stop()
+
+
+class PlaylistSource(Source):
+    """
+    Plays tracks back-to-back with no gap. As soon as a track starts, the next one is
+    opened on a background thread (its decoder read-ahead fills meanwhile), so the
+    switch is sample-accurate and costs nothing on the mix thread.
+    `loader(index, start_time)` returns a Source, or None for a track to skip.
+    `repeat` is 'off', 'all' or 'one'.
+    """
+    def __init__(self, loader, count, start_index=0, start_time=0, repeat='off',
+                 gain=1.0, name="playlist", on_advance=None):
+        super().__init__(gain, name)
+        self.loader = loader
+        self.count = count
+        self.repeat = repeat
+        self.on_advance = on_advance   # Called (off the mix thread) with the new index at each track change
+        self.finished = False          # Ran out of tracks (as opposed to being stopped)
+        self.index = start_index
+        self.position_frames = int(start_time * MIXER_RATE)
+        self.switches = 0
+        self.gap_blocks = 0            # Mix blocks of silence because the next track wasn't open yet
+        self._next = None
+        self._next_ready = threading.Event()
+        self._prefetching = False
+        self.current = loader(start_index, start_time)
+        if self.current is None:
+            self.index, self.current = self._load_from(self._following(start_index))
+            self.position_frames = 0
+        if self.current is None:
+            self.finished = True
+        else:
+            self._prefetch()
+
+    def position(self):
+        """(track index, seconds into that track)."""
+        return self.index, self.position_frames / MIXER_RATE
+
+    def _following(self, index):
+        if self.repeat == 'one':
+            return index
+        if index + 1 < self.count:
+            return index + 1
+        return 0 if self.repeat == 'all' else None
+
+    def _load_from(self, index):
+        """First loadable track at or after index (each track tried at most once)."""
+        for _ in range(self.count):
+            if index is None or self.stopped:
+                return None, None
+            source = self.loader(index, 0)
+            if source is not None:
+                return index, source
+            index = self._following(index) if self.repeat != 'one' else None
+        return None, None
+
+    def _prefetch(self):
+        self._next_ready.clear()
+        following = self._following(self.index)
+        if following is None:
+            self._prefetching = False
+            return
+        self._prefetching = True
+        def load():
+            index, source = self._load_from(following)
+            if self.stopped and source is not None:
+                source.stop()
+                return
+            self._next = (index, source)
+            self._next_ready.set()
+        threading.Thread(target=load, daemon=True).start()
+
+    def _read(self, frames):
+        parts = []
+        need = frames
+        while need and not self.finished:
+            if self.current is None:
+                if not self._prefetching:
+                    self.finished = True
+                    break
+                if not self._next_ready.is_set():
+                    self.gap_blocks += 1
+                    parts.append(np.zeros((need, 2), dtype=np.float32))  # Next track still opening
+                    break
+                self._switch()
+                continue
+            block, ended = self.current.read_block(need)
+            if len(block):
+                parts.append(block)
+                need -= len(block)
+                self.position_frames += len(block)
+            if ended:
+                self.current.stop()
+                self.current = None
+                if self._next_ready.is_set():
+                    self._switch()
+        if not parts:
+            return np.zeros((0, 2), dtype=np.float32)
+        return np.vstack(parts) if len(parts) > 1 else parts[0]
+
+    def _switch(self):
+        index, source = self._next
+        self._next = None
+        if source is None:
+            self._prefetching = False
+            self.finished = True
+            return
+        self.current = source
+        self.index = index
+        self.position_frames = 0
+        self.switches += 1
+        if self.on_advance:
+            threading.Thread(target=self.on_advance, args=(index,), daemon=True).start()
+        self._prefetch()
+
+    def _close(self):
+        if self.current:
+            self.current.stop()
+        if self._next and self._next[1]:
+            self._next[1].stop()
+
+
+# --- Output Sinks ---
+class OutputSink:
+    """Long-lived destination for interleaved 16-bit stereo PCM at MIXER_RATE."""
+    def __init__(self, name):
+        self.name = name
+        self.frames_written = 0
+        self.broken = False
+
+    def write(self, data):
+        raise NotImplementedError
+
+    def flush(self):
+        """Discards audio queued but not yet handed to the device (no-op for direct writers)."""
+        pass
+
+    def close(self):
+        pass
+
+
+class NullSink(OutputSink):
+    """Discards audio (tests, benchmarks, cards that failed to open)."""
+    def write(self, data):
+        self.frames_written += len(data) // 4
+
+
+class FileSink(OutputSink):
+    """Records everything the card would have played into a WAV file."""
+    def __init__(self, name, path):
+        super().__init__(name)
+        self._wav = wave.open(str(path), 'wb')
+        self._wav.setnchannels(MIXER_CHANNELS)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(MIXER_RATE)
+
+    def write(self, data):
+        self._wav.writeframes(data)
+        self.frames_written += len(data) // 4
+
+    def close(self):
+        try: self._wav.close()
+        except Exception: pass
+
+
+class AlsaSink(OutputSink):
+    """ALSA card output: pyalsaaudio when installed, otherwise one long-lived `aplay` pipe."""
+    def __init__(self, card_id):
+        super().__init__(f"card{card_id}")
+        self.card_id = card_id
+        self.device = f"plughw:{card_id},0"
+        self.pcm = None
+        self.process = None
+        if alsaaudio is not None:
+            self.pcm = alsaaudio.PCM(type=alsaaudio.PCM_PLAYBACK, mode=alsaaudio.PCM_NORMAL,
+                                     device=self.device, channels=MIXER_CHANNELS, rate=MIXER_RATE,
+                                     format=alsaaudio.PCM_FORMAT_S16_LE, periodsize=MIXER_BLOCK)
+        else:
+            self.process = subprocess.Popen(
+                ['aplay', '-q', '-D', self.device, '-t', 'raw', '-f', 'S16_LE',
+                 '-r', str(MIXER_RATE), '-c', str(MIXER_CHANNELS)],
+                stdin=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+
+    def write(self, data):
+        try:
+            if self.pcm is not None:
+                self.pcm.write(data)
+            else:
+                self.process.stdin.write(data)
+                self.process.stdin.flush()
+            self.frames_written += len(data) // 4
+        except Exception as e:
+            print(f"[Mixer] Sink {self.device} failed: {e}")
+            self.broken = True
+
+    def close(self):
+        try:
+            if self.pcm is not None:
+                self.pcm.close()
+            elif self.process:
+                self.process.stdin.close()
+                self.process.terminate()
+        except Exception:
+            pass
+
+
+class BufferedSink(OutputSink):
+    """
+    Bounded ring buffer + writer thread in front of another sink, so one slow
+    or stalled card never holds up the mix thread (or the other cards).
+    """
+    def __init__(self, inner, capacity=SINK_QUEUE_BLOCKS, policy=SINK_OVERFLOW_POLICY, block=MIXER_BLOCK):
+        if policy not in ('drop_oldest', 'drop_newest'):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        super().__init__(inner.name)
+        self.inner = inner
+        self.capacity = capacity
+        self.policy = policy
+        self.block_time = block / MIXER_RATE
+        self.underruns = 0   # Writer found the queue empty when the device needed data
+        self.overruns = 0    # Blocks dropped because the queue was full
+        self.max_depth = 0
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._writer, daemon=True, name=f"sink-{inner.name}")
+        self._thread.start()
+
+    @property
+    def broken(self):
+        return self.inner.broken
+
+    @broken.setter
+    def broken(self, value):
+        pass  # Owned by the inner sink
+
+    @property
+    def frames_written(self):
+        return self.inner.frames_written
+
+    @frames_written.setter
+    def frames_written(self, value):
+        pass
+
+    def queue_depth(self):
+        return len(self._queue)
+
+    def write(self, data):
+        """Never blocks: enqueues or applies the overflow policy."""
+        with self._cond:
+            if len(self._queue) >= self.capacity:
+                self.overruns += 1
+                if self.policy == 'drop_newest':
+                    return
+                self._queue.popleft()
+            self._queue.append(data)
+            self.max_depth = max(self.max_depth, len(self._queue))
+            self._cond.notify_all()
+
+    def wait_below(self, depth, timeout):
+        """
+        Blocks until fewer than `depth` blocks are queued, i.e. until the device has
+        consumed one. Returns (had_to_wait, in_time); a full queue (stalled card) never waits.
+        """
+        with self._cond:
+            if len(self._queue) < depth or len(self._queue) >= self.capacity or self._closed:
+                return False, True
+            return True, self._cond.wait_for(lambda: len(self._queue) < depth or self._closed, timeout)
+
+    def flush(self):
+        with self._cond:
+            self._queue.clear()
+        self.inner.flush()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(SINK_CLOSE_TIMEOUT)
+        if self._thread.is_alive():
+            self.inner.close()  # Writer is stuck in the device; closing it unblocks the write
+
+    def stats(self):
+        return {
+            'queue_depth': len(self._queue),
+            'max_depth': self.max_depth,
+            'capacity': self.capacity,
+            'policy': self.policy,
+            'underruns': self.underruns,
+            'overruns': self.overruns
+        }
+
+    def _writer(self):
+        starved = False
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    if not self._cond.wait(self.block_time * 2) and not starved:
+                        # Fed blocks stopped arriving (mix thread late): count once per gap
+                        self.underruns += 1
+                        starved = True
+                if self._closed:
+                    break
+                data = self._queue.popleft()
+                self._cond.notify_all()  # Room for the mix thread (see wait_below)
+            starved = False
+            self.inner.write(data)
+            if self.inner.broken:
+                break
+        self.inner.close()
+
+
+# --- Engine ---
+class _Voice:
+    def __init__(self, source, routes):
+        self.source = source
+        self.routes = routes  # {card_id: 'left' | 'right' | None (stereo)}
+
+
+class MixerEngine:
+    """
+    Single in-process mixer: pulls every active source once per block,
+    routes it to card/channel targets and writes one stereo stream per card.
+    """
+    def __init__(self, sink_factory=None, block=MIXER_BLOCK):
+        self.block = block
+        self.sink_factory = sink_factory or AlsaSink
+        self.sinks = {}        # card_id -> OutputSink
+        self.persistent = set()  # Cards whose sink is kept open (idling on silence) for the service lifetime
+        self._sink_idle = {}   # card_id -> time nothing was routed to it
+        self._reopen_at = {}   # card_id -> next retry time for failed persistent sinks
+        self._voices = []
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread = None
+        self._running = True
+        self.blocks_mixed = 0
+        self._flush_gen = 0    # Bumped by stop_all(flush=True): blocks mixed before it are discarded
+        self._write_lock = threading.Lock()  # Orders block writes against sink flushes
+
+        # Start latency: play() -> first block handed to the sinks (+ sink lead)
+        self.start_latency = {'count': 0, 'last': None, 'avg': None, 'max': None}
+        self.on_start = None  # Optional fn(source, audible_at): called on the mix thread, keep it cheap
+
+    # --- Public API ---
+    def open_sinks(self, card_ids):
+        """Pre-opens persistent sinks so playback never pays device open / process spawn cost."""
+        with self._lock:
+            for card_id in card_ids:
+                self.persistent.add(card_id)
+                self._open_sink(card_id)
+            self._ensure_thread()
+            self._wake.notify_all()
+        print(f"[Mixer] Persistent sinks open: {sorted(self.sinks.keys())}")
+
+    def close_sinks(self, card_ids):
+        """Closes and forgets sinks (card unplugged or no longer in any zone); no reopen retries."""
+        closed = {}
+        with self._lock:
+            for card_id in card_ids:
+                self.persistent.discard(card_id)
+                self._reopen_at.pop(card_id, None)
+                self._sink_idle.pop(card_id, None)
+                sink = self.sinks.pop(card_id, None)
+                if sink is not None:
+                    closed[card_id] = sink
+        for sink in closed.values():
+            sink.close()  # Outside the lock: closing may wait on the device
+        if closed:
+            print(f"[Mixer] Closed sinks: {sorted(closed)}")
+
+    def play(self, source, routes):
+        """Starts mixing `source` into {card_id: mode}. Returns the source (wait on source.done)."""
+        source.queued_at = time.monotonic()
+        with self._lock:
+            for card_id in routes:
+                self._open_sink(card_id)
+            self._voices.append(_Voice(source, dict(routes)))
+            self._ensure_thread()
+            self._wake.notify_all()
+        return source
+
+    def remove(self, source):
+        with self._lock:
+            self._voices = [v for v in self._voices if v.source is not source]
+        source.stop()
+
+    def stop_all(self, flush=False, keep=()):
+        """
+        Drops every source except those in `keep`. flush=True also discards audio already
+        queued for the sinks (and the block being mixed), so the dropped sources go silent at once.
+        Queued blocks are mixes, so kept sources lose those few blocks too and carry on from there.
+        """
+        with self._lock:
+            voices = [v for v in self._voices if v.source not in keep]
+            self._voices = [v for v in self._voices if v.source in keep]
+            sinks = list(self.sinks.values()) if flush else []
+            if flush:
+                self._flush_gen += 1
+        for v in voices:
+            v.source.stop()
+        with self._write_lock:
+            for sink in sinks:
+                sink.flush()
+
+    def active_sources(self):
+        with self._lock:
+            return [v.source for v in self._voices]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate': MIXER_RATE,
+                'block_frames': self.block,
+                'blocks_mixed': self.blocks_mixed,
+                'sinks': {
+                    str(card_id): {
+                        'name': sink.name,
+                        'persistent': card_id in self.persistent,
+                        'broken': sink.broken,
+                        'frames_written': sink.frames_written,
+                        **(sink.stats() if isinstance(sink, BufferedSink) else {})
+                    } for card_id, sink in self.sinks.items()
+                },
+                'active_sources': [v.source.name for v in self._voices],
+                'start_latency': dict(self.start_latency)
+            }
+
+    def shutdown(self):
+        self.stop_all()
+        with self._lock:
+            self._running = False
+            self._wake.notify_all()
+            for sink in self.sinks.values():
+                sink.close()
+            self.sinks = {}
+
+    # --- Internal ---
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _open_sink(self, card_id):
+        sink = self.sinks.get(card_id)
+        if sink is not None and not sink.broken:
+            return sink
+        try:
+            sink = self.sink_factory(card_id)
+            if SINK_QUEUE_BLOCKS > 0:
+                sink = BufferedSink(sink, block=self.block)
+        except Exception as e:
+            print(f"[Mixer] Failed to open card {card_id}: {e}")
+            sink = NullSink(f"card{card_id}")
+            sink.broken = True
+        # Prefill a little silence so the first real block never underruns
+        silence = bytes(self.block * MIXER_CHANNELS * 2)
+        for _ in range(MIXER_PREFILL_BLOCKS):
+            sink.write(silence)
+        self.sinks[card_id] = sink
+        self._sink_idle.pop(card_id, None)
+        return sink
+
+    def _run(self):
+        block_time = self.block / MIXER_RATE
+        next_tick = time.monotonic()
+        while True:
+            with self._lock:
+                while self._running and not self.sinks:
+                    self._wake.wait()
+                    next_tick = time.monotonic()
+                if not self._running:
+                    return
+                voices = list(self._voices)
+                sinks = dict(self.sinks)
+                flush_gen = self._flush_gen
+
+            mixes = {card_id: np.zeros((self.block, 2), dtype=np.float32) for card_id in sinks}
+            finished = []
+            for voice in voices:
+                if voice.source.stopped:
+                    finished.append(voice)
+                    continue
+                if not voice.source.started.is_set():
+                    self._record_start(voice.source)
+                try:
+                    samples, ended = voice.source.read_block(self.block)
+                except Exception as e:
+                    print(f"[Mixer] Source {voice.source.name} failed: {e}")
+                    samples, ended = np.zeros((0, 2), dtype=np.float32), True
+                n = len(samples)
+                if n:
+                    mono = None
+                    for card_id, mode in voice.routes.items():
+                        mix = mixes.get(card_id)
+                        if mix is None:
+                            continue
+                        if mode is None:
+                            mix[:n] += samples
+                        else:
+                            if mono is None:
+                                mono = samples.mean(axis=1)
+                            mix[:n, 0 if mode == 'left' else 1] += mono
+                if ended:
+                    finished.append(voice)
+
+            with self._write_lock:
+                # A flush since the snapshot: this block may still carry the stopped sources
+                if flush_gen == self._flush_gen:
+                    for card_id, mix in mixes.items():
+                        pcm = (np.clip(mix, -1.0, 1.0) * 32767.0).astype('<i2').tobytes()
+                        sinks[card_id].write(pcm)
+            self.blocks_mixed += 1
+
+            if finished:
+                with self._lock:
+                    self._voices = [v for v in self._voices if v not in finished]
+                for voice in finished:
+                    voice.source.done.set()
+
+            self._close_idle_sinks()
+
+            # Pace to the devices: wait until the card queues drain below SINK_PACE_DEPTH, so the
+            # mix clock follows the sound card clocks and drift never fills or empties the queues.
+            # Wall time only paces sinks that never block (NullSink/FileSink, inline writes).
+            if self._wait_for_sinks(sinks.values(), block_time * 2):
+                next_tick = time.monotonic()
+                continue
+            next_tick += block_time
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -0.5:
+                next_tick = time.monotonic()  # Fell far behind (suspend/overload): resync
+
+    @staticmethod
+    def _wait_for_sinks(sinks, timeout):
+        """True if a device-backed sink queue set the pace (waited for it to drain)."""
+        deadline = time.monotonic() + timeout
+        paced = False
+        for sink in sinks:
+            if not isinstance(sink, BufferedSink) or sink.broken or isinstance(sink.inner, (NullSink, FileSink)):
+                continue
+            waited, _ = sink.wait_below(SINK_PACE_DEPTH, max(0.0, deadline - time.monotonic()))
+            paced = paced or waited
+        return paced
+
+    def _record_start(self, source):
+        lead = MIXER_PREFILL_BLOCKS * self.block / MIXER_RATE
+        latency = (time.monotonic() - source.queued_at) + lead if source.queued_at else lead
+        m = self.start_latency
+        m['count'] += 1
+        m['last'] = round(latency, 4)
+        m['avg'] = round(latency if m['avg'] is None else m['avg'] + (latency - m['avg']) / m['count'], 4)
+        m['max'] = m['last'] if m['max'] is None else max(m['max'], m['last'])
+        source.started.set()
+        if self.on_start:
+            self.on_start(source, time.time() + lead)
+
+    def _close_idle_sinks(self):
+        now = time.monotonic()
+        closing = []  # Closed after releasing the lock: joining a writer thread must not stall the mix
+        with self._lock:
+            routed = set()
+            for v in self._voices:
+                routed.update(v.routes.keys())
+            for card_id in list(self.sinks.keys()):
+                sink = self.sinks[card_id]
+                if sink.broken:
+                    closing.append(sink)
+                    del self.sinks[card_id]
+                    if card_id in self.persistent:
+                        self._reopen_at[card_id] = now + SINK_REOPEN_INTERVAL
+                    continue
+                if card_id in self.persistent:
+                    continue  # Idles on silence, never closed
+                if card_id in routed:
+                    self._sink_idle.pop(card_id, None)
+                    continue
+                since = self._sink_idle.setdefault(card_id, now)
+                if now - since > SINK_IDLE_CLOSE:
+                    print(f"[Mixer] Closing idle sink {sink.name}")
+                    closing.append(sink)
+                    del self.sinks[card_id]
+                    del self._sink_idle[card_id]
+
+            # Bring failed persistent sinks back (USB card re-plugged, device busy, ...)
+            for card_id, retry_at in list(self._reopen_at.items()):
+                if card_id in self.sinks:
+                    del self._reopen_at[card_id]
+                elif now >= retry_at:
+                    print(f"[Mixer] Reopening sink for card {card_id}")
+                    del self._reopen_at[card_id]
+                    self._open_sink(card_id)
+        for sink in closing:
+            sink.close()
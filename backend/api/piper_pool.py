@@ -0,0 +1,308 @@
+import os
+import json
+import time
+import queue
+import itertools
+import threading
+import subprocess
+from enum import IntEnum
+
+# --- Pool Configuration ---
+PIPER_MIN_WORKERS_PER_VOICE = 1  # Kept warm per voice model (each holds the model in RAM)
+PIPER_MAX_WORKERS_PER_VOICE = 4  # Burst cap: extra workers are spawned on demand (parallel segments)
+PIPER_WORKERS_PER_CORE = 1.0     # Burst cap is also limited to cores * this
+PIPER_IDLE_RETIRE = 120.0        # Seconds an on-demand worker may sit idle before it exits
+PIPER_RENDER_TIMEOUT = 30.0      # Seconds before a stuck worker is killed and restarted
+PIPER_HEALTH_INTERVAL = 10.0     # Seconds between health checks
+PIPER_MAX_FAST_FAILURES = 3      # Give up on a worker that keeps dying right after start
+
+
+class RenderPriority(IntEnum):
+    """Lower value = rendered first."""
+    EMERGENCY = 0
+    REALTIME = 10
+    SCHEDULE = 20
+    PRERENDER = 30
+
+
+class RenderJob:
+    def __init__(self, text, output_file, priority):
+        self.text = text
+        self.output_file = str(output_file)
+        self.priority = priority
+        self.done = threading.Event()
+        self.success = False
+        self.error = None
+        self.cancelled = False  # Set when the waiter gave up: workers skip it (or discard the result)
+
+
+class PiperWorker:
+    """A long-lived `piper --json-input` process with the voice model kept loaded."""
+    def __init__(self, piper_exe, model_path, output_dir, name):
+        self.piper_exe = piper_exe
+        self.model_path = model_path
+        self.output_dir = str(output_dir)
+        self.name = name
+        self.process = None
+        self.started_at = 0
+        self.fast_failures = 0
+        self.restarts = 0
+        self.jobs_done = 0
+        self.disabled = False
+        self._lines = queue.Queue()
+        self._restart_lock = threading.Lock()
+
+    def start(self):
+        self._lines = queue.Queue()
+        cmd = [self.piper_exe, "--model", self.model_path, "--json-input", "--output_dir", self.output_dir]
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1
+        )
+        self.started_at = time.time()
+        # Piper prints the output path once each utterance is written
+        threading.Thread(target=self._read_stdout, args=(self.process, self._lines), daemon=True).start()
+
+    @staticmethod
+    def _read_stdout(process, lines):
+        try:
+            for line in process.stdout:
+                lines.put(line.strip())
+        except Exception:
+            pass
+        lines.put(None)  # EOF marker
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def render(self, job, timeout=PIPER_RENDER_TIMEOUT):
+        """Synthesizes job.text into job.output_file. Returns True on success."""
+        if not self.is_alive():
+            return False
+        try:
+            self.process.stdin.write(json.dumps({"text": job.text, "output_file": job.output_file}) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            return False
+
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                print(f"[PiperPool] {self.name} timed out, killing")
+                self.kill()
+                return False
+            try:
+                line = self._lines.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if line is None:
+                return False
+            if os.path.abspath(line) == os.path.abspath(job.output_file):
+                self.jobs_done += 1
+                self.fast_failures = 0
+                return os.path.exists(job.output_file)
+
+    def kill(self):
+        if self.process:
+            try:
+                self.process.stdin.close()
+            except Exception:
+                pass
+            try:
+                self.process.kill()
+                self.process.wait(timeout=1)
+            except Exception:
+                pass
+
+    def restart(self):
+        with self._restart_lock:
+            if self.is_alive() or self.disabled:
+                return  # Already handled by another thread
+            if time.time() - self.started_at < 2.0:
+                self.fast_failures += 1
+            if self.fast_failures >= PIPER_MAX_FAST_FAILURES:
+                print(f"[PiperPool] {self.name} keeps failing on start, disabling")
+                self.disabled = True
+                return
+            self.kill()
+            self.restarts += 1
+            print(f"[PiperPool] Restarting {self.name}")
+            try:
+                self.start()
+            except Exception as e:
+                print(f"[PiperPool] Failed to restart {self.name}: {e}")
+
+
+class PiperPool:
+    """
+    Warm Piper workers per voice model fed through a priority queue,
+    so emergency renders jump ahead of schedule pre-renders.
+    Each voice keeps PIPER_MIN_WORKERS_PER_VOICE resident; when jobs queue up
+    behind busy workers, more are spawned (up to max_per_voice) and retire
+    again after PIPER_IDLE_RETIRE seconds without work.
+    """
+    def __init__(self, piper_exe, voices, output_dir, workers_per_core=PIPER_WORKERS_PER_CORE):
+        self.piper_exe = piper_exe
+        self.output_dir = output_dir
+        self._seq = itertools.count()
+        self._names = itertools.count()
+        self._running = True
+        self._lock = threading.Lock()
+
+        # Deduplicate aliases ('female', 'male') pointing at the same model
+        self.models = sorted(set(voices.values()))
+        self.max_per_voice = max(PIPER_MIN_WORKERS_PER_VOICE,
+                                 min(PIPER_MAX_WORKERS_PER_VOICE, int((os.cpu_count() or 1) * workers_per_core)))
+
+        self.queues = {}   # model_path -> PriorityQueue
+        self.workers = {}  # model_path -> [PiperWorker]
+        self._busy = {}    # model_path -> workers currently rendering
+        for model_path in self.models:
+            self.queues[model_path] = queue.PriorityQueue()
+            self.workers[model_path] = []
+            self._busy[model_path] = 0
+            for _ in range(PIPER_MIN_WORKERS_PER_VOICE):
+                self._spawn(model_path, permanent=True)
+
+        threading.Thread(target=self._health_loop, daemon=True).start()
+        print(f"[PiperPool] Started {PIPER_MIN_WORKERS_PER_VOICE} worker(s) for each of {len(self.models)} voice(s) "
+              f"(up to {self.max_per_voice} on demand)")
+
+    def available(self, model_path):
+        return any(not w.disabled for w in self.workers.get(model_path, []))
+
+    def submit(self, text, model_path, output_file, priority=RenderPriority.SCHEDULE):
+        """Queues a render without waiting. Returns the RenderJob (or None for unknown voices)."""
+        if model_path not in self.queues:
+            return None
+        job = RenderJob(text, output_file, priority)
+        self.queues[model_path].put((int(priority), next(self._seq), job))
+        self._scale(model_path)
+        return job
+
+    def wait(self, job, model_path, timeout=PIPER_RENDER_TIMEOUT * 2):
+        """Blocks until job finishes. Returns True on success (on timeout the job is cancelled)."""
+        deadline = time.time() + timeout
+        while not job.done.wait(1.0):
+            # Bail out early if every worker for this voice has been disabled
+            if time.time() > deadline or not self.available(model_path):
+                job.cancelled = True
+                return False
+        return job.success
+
+    def render(self, text, model_path, output_file, priority=RenderPriority.SCHEDULE, timeout=PIPER_RENDER_TIMEOUT * 2):
+        """Queues a render and blocks until it finishes. Returns True on success."""
+        job = self.submit(text, model_path, output_file, priority)
+        if job is None:
+            return False
+        return self.wait(job, model_path, timeout)
+
+    def stats(self):
+        with self._lock:
+            workers = {model: list(w) for model, w in self.workers.items()}
+            busy = dict(self._busy)
+        return {
+            os.path.basename(model): {
+                'queued': self.queues[model].qsize(),
+                'busy': busy[model],
+                'max_workers': self.max_per_voice,
+                'workers': [
+                    {
+                        'name': w.name,
+                        'alive': w.is_alive(),
+                        'disabled': w.disabled,
+                        'jobs_done': w.jobs_done,
+                        'restarts': w.restarts
+                    } for w in workers
+                ]
+            } for model, workers in workers.items()
+        }
+
+    def shutdown(self):
+        self._running = False
+        with self._lock:
+            workers = [w for ws in self.workers.values() for w in ws]
+        for w in workers:
+            w.kill()
+
+    # --- Internal ---
+    def _spawn(self, model_path, permanent=False):
+        worker = PiperWorker(self.piper_exe, model_path, self.output_dir,
+                             f"{os.path.basename(model_path)}#{next(self._names)}")
+        try:
+            worker.start()
+        except Exception as e:
+            print(f"[PiperPool] Failed to start {worker.name}: {e}")
+            return None
+        self.workers[model_path].append(worker)
+        threading.Thread(target=self._worker_loop, args=(worker, model_path, permanent), daemon=True).start()
+        return worker
+
+    def _scale(self, model_path):
+        """Spawns an extra worker when queued jobs outnumber idle ones (up to max_per_voice)."""
+        with self._lock:
+            live = sum(1 for w in self.workers[model_path] if not w.disabled)
+            if not live or live >= self.max_per_voice:
+                return  # No healthy worker to scale from, or at the cap
+            if self.queues[model_path].qsize() <= live - self._busy[model_path]:
+                return
+            worker = self._spawn(model_path)
+        if worker:
+            print(f"[PiperPool] Scaled up: {worker.name} ({live + 1} worker(s))")
+
+    def _worker_loop(self, worker, model_path, permanent):
+        jobs = self.queues[model_path]
+        idle_since = time.time()
+        while self._running and not worker.disabled:
+            try:
+                _, _, job = jobs.get(timeout=1.0)
+            except queue.Empty:
+                if not permanent and time.time() - idle_since > PIPER_IDLE_RETIRE:
+                    break
+                continue
+            if job.cancelled:
+                job.done.set()  # Waiter gave up while it was queued: don't render into an orphan file
+                continue
+            with self._lock:
+                self._busy[model_path] += 1
+            if not worker.is_alive():
+                worker.restart()
+            try:
+                job.success = worker.render(job)
+            except Exception as e:
+                job.error = str(e)
+                job.success = False
+            finally:
+                with self._lock:
+                    self._busy[model_path] -= 1
+            if not job.success and not worker.is_alive():
+                worker.restart()
+            if job.cancelled and job.success:
+                try: os.remove(job.output_file)  # Finished after its waiter gave up
+                except OSError: pass
+                job.success = False
+            job.done.set()
+            idle_since = time.time()
+
+        if not permanent:
+            with self._lock:
+                if worker in self.workers[model_path]:
+                    self.workers[model_path].remove(worker)
+            worker.kill()
+            print(f"[PiperPool] Retired idle worker {worker.name}")
+
+    def _health_loop(self):
+        while self._running:
+            time.sleep(PIPER_HEALTH_INTERVAL)
+            with self._lock:
+                workers = {model: list(w) for model, w in self.workers.items()}
+            for model_workers in workers.values():
+                for w in model_workers:
+                    if not w.disabled and not w.is_alive():
+                        print(f"[PiperPool] Health check: {w.name} is down")
+                        w.restart()
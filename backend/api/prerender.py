@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import queue
+import wave
+import hashlib
+import itertools
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from api.mixer import decode_file, MIXER_RATE
+from api.piper_pool import RenderPriority
+
+PRERENDER_LOOKAHEAD = 10 * 60   # Seconds: schedules due within this window get their audio prepared
+PRERENDER_SCAN_INTERVAL = 5     # Seconds between queue scans
+PRERENDER_MAX_ITEMS = 16        # Prepared files kept at once (nearest due first)
+
+
+class Prerenderer:
+    """
+    Prepares scheduled announcements before they are due: TTS render (or recorded
+    audio from the blob store), decode, and intro+body concatenation into one
+    48 kHz stereo WAV in piper_tts/prepared/, so playback starts on the first block.
+    Entries are keyed by schedule id and fingerprinted by their content; an edit
+    changes the fingerprint (or invalidates the id) and the old render is dropped.
+    Also keeps due-time -> first-sample lateness per path ('prepared' / 'cold').
+    """
+    def __init__(self, audio_service, prepared_dir):
+        self.audio = audio_service
+        self.dir = Path(prepared_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        for stale in self.dir.glob('*.wav'):
+            stale.unlink(missing_ok=True)  # Nothing is valid across a restart
+        self._lock = threading.Lock()
+        self._entries = {}       # key -> {'fingerprint', 'due', 'status', 'path', 'seconds'}
+        self._jobs = queue.PriorityQueue()  # (due, seq, job) - nearest due renders first
+        self._seq = itertools.count()
+        self._worker = None
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.lateness = {}       # path -> {'count', 'last', 'avg', 'min', 'max'} (seconds late, negative = early)
+
+    @staticmethod
+    def fingerprint(intro, text=None, voice=None, audio_hash=None):
+        spec = {'intro': intro, 'text': text if not audio_hash else None, 'voice': voice, 'audio': audio_hash}
+        return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:32]
+
+    def prepare(self, key, due, intro, text=None, voice='female', audio_hash=None):
+        """Queues a render for a schedule (no-op if the same content is prepared or queued)."""
+        fingerprint = self.fingerprint(intro, text, voice, audio_hash)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry['fingerprint'] == fingerprint:
+                entry['due'] = due
+                if entry['status'] != 'skipped' or self._ready_count() >= PRERENDER_MAX_ITEMS:
+                    return
+                entry['status'] = 'queued'  # Skipped at the cap and a slot has freed up since: retry
+            else:
+                if entry:
+                    self._drop(key)
+                self._entries[key] = {'fingerprint': fingerprint, 'due': due, 'status': 'queued', 'path': None, 'seconds': None}
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True, name="prerender")
+                self._worker.start()
+        self._jobs.put((due, next(self._seq), (key, fingerprint, intro, text, voice, audio_hash)))
+
+    def take(self, key, intro, text=None, voice='female', audio_hash=None):
+        """Path of the prepared WAV if it matches this content (the caller plays then discards it), else None."""
+        fingerprint = self.fingerprint(intro, text, voice, audio_hash)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry['fingerprint'] == fingerprint and entry['status'] == 'ready':
+                self.hits += 1
+                return entry['path']
+            self.misses += 1
+            return None
+
+    def invalidate(self, key):
+        """Drops whatever was prepared for a schedule (edited, deleted or played)."""
+        with self._lock:
+            self._drop(key)
+
+    def record_lateness(self, path, seconds):
+        with self._lock:
+            m = self.lateness.setdefault(path, {'count': 0, 'last': None, 'avg': None, 'min': None, 'max': None})
+            m['count'] += 1
+            m['last'] = round(seconds, 3)
+            m['avg'] = round(seconds if m['avg'] is None else m['avg'] + (seconds - m['avg']) / m['count'], 3)
+            m['min'] = m['last'] if m['min'] is None else min(m['min'], m['last'])
+            m['max'] = m['last'] if m['max'] is None else max(m['max'], m['last'])
+        print(f"[Prerender] Schedule lateness ({path}): {seconds:+.3f}s")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'lookahead_seconds': PRERENDER_LOOKAHEAD,
+                'entries': {k: {'status': e['status'], 'due': e['due'], 'render_seconds': e['seconds']}
+                            for k, e in self._entries.items()},
+                'hits': self.hits,
+                'misses': self.misses,
+                'failures': self.failures,
+                'lateness': {k: dict(v) for k, v in self.lateness.items()}
+            }
+
+    # --- Internals ---
+    def _ready_count(self):
+        return sum(1 for e in self._entries.values() if e['status'] == 'ready')
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry and entry['path']:
+            Path(entry['path']).unlink(missing_ok=True)
+
+    def _run(self):
+        while True:
+            _, _, (key, fingerprint, intro, text, voice, audio_hash) = self._jobs.get()
+            with self._lock:
+                entry = self._entries.get(key)
+                if not entry or entry['fingerprint'] != fingerprint or entry['status'] != 'queued':
+                    continue  # Invalidated or superseded while queued
+                if self._ready_count() >= PRERENDER_MAX_ITEMS:
+                    entry['status'] = 'skipped'
+                    continue
+                entry['status'] = 'rendering'
+            start = time.perf_counter()
+            path = self.dir / f"{hashlib.sha256(f'{key}:{fingerprint}'.encode()).hexdigest()[:32]}.wav"
+            try:
+                self._render(path, intro, text, voice, audio_hash)
+            except Exception as e:
+                print(f"[Prerender] Failed to prepare {key}: {e}")
+                path.unlink(missing_ok=True)
+                with self._lock:
+                    self.failures += 1
+                    if self._entries.get(key, {}).get('fingerprint') == fingerprint:
+                        self._entries[key]['status'] = 'failed'
+                continue
+            with self._lock:
+                entry = self._entries.get(key)
+                if not entry or entry['fingerprint'] != fingerprint:
+                    path.unlink(missing_ok=True)  # Edited while rendering
+                    continue
+                entry.update(status='ready', path=str(path), seconds=round(time.perf_counter() - start, 2))
+            print(f"[Prerender] Prepared {key} in {entry['seconds']}s")
+
+    def _render(self, path, intro, text, voice, audio_hash):
+        # 1. Body: recorded audio from the blob store, or the TTS render (cached by the TTS cache)
+        if audio_hash:
+            body = self.audio.schedule_audio.path(audio_hash)
+            if not body:
+                raise RuntimeError(f"audio {audio_hash[:12]} not in blob store")
+        else:
+            body = self.audio._generate_piper_audio(text, voice, priority=RenderPriority.PRERENDER)
+            if not body:
+                raise RuntimeError("TTS render failed")
+
+        # 2. Decode + concatenate intro and body at the mixer rate
+        parts = []
+        if intro:
+            clip = self.audio.sound_bank.get(intro) if self.audio.sound_bank else None
+            parts.append(clip if clip is not None else decode_file(self.audio._clip_path(intro)))
+        parts.append(decode_file(body))
+        pcm = np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+        # 3. One 16-bit stereo WAV (played straight from disk, nothing left to decode)
+        tmp = path.with_suffix('.tmp')
+        with wave.open(str(tmp), 'wb') as wf:
+            wf.setnchannels(2)
+            wf.setsampwidth(2)
+            wf.setframerate(MIXER_RATE)
+            wf.writeframes((np.clip(pcm, -1.0, 1.0) * 32767.0).astype('<i2').tobytes())
+        os.replace(tmp, path)
@@ -0,0 +1,57 @@
+import os
+import time
+import signal
+import threading
+import subprocess
+
+STOP_GRACE_SECONDS = 0.2   # SIGTERM -> SIGKILL escalation delay (handled off the caller's thread)
+
+_SIGKILL = getattr(signal, 'SIGKILL', signal.SIGTERM)
+
+
+def popen_group(cmd, **kwargs):
+    """Popen in its own process group (POSIX) so the whole tree can be signalled at once."""
+    if os.name == 'posix':
+        kwargs.setdefault('start_new_session', True)
+    return subprocess.Popen(cmd, **kwargs)
+
+
+def signal_group(proc, sig):
+    """Signals proc's process group, or just proc if it doesn't lead one. Never blocks."""
+    try:
+        if os.name == 'posix' and os.getpgid(proc.pid) == proc.pid:
+            os.killpg(proc.pid, sig)
+        elif sig == _SIGKILL:
+            proc.kill()
+        else:
+            proc.terminate()
+    except (ProcessLookupError, PermissionError, OSError):
+        pass  # Already gone
+
+
+def terminate_groups(procs, grace=STOP_GRACE_SECONDS):
+    """
+    Sends SIGTERM to every process group at once and returns immediately.
+    A reaper thread SIGKILLs whatever is still alive after `grace` and waits on it.
+    Returns the number of processes signalled.
+    """
+    live = [p for p in procs if p.poll() is None]
+    for proc in live:
+        signal_group(proc, signal.SIGTERM)
+    if live:
+        threading.Thread(target=_reap, args=(live, grace), daemon=True).start()
+    return len(live)
+
+
+def _reap(procs, grace):
+    deadline = time.monotonic() + grace
+    pending = list(procs)
+    while pending and time.monotonic() < deadline:
+        pending = [p for p in pending if p.poll() is None]
+        if pending:
+            time.sleep(0.01)
+    for proc in pending:
+        signal_group(proc, _SIGKILL)
+    for proc in procs:
+        try: proc.wait(timeout=1.0)
+        except Exception: pass
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from api.firebaseConfig import db, auth
 from api.routes.auth import verify_admin
+from api.auth_cache import token_cache
 from api.notification_service import notification_service
 from pydantic import BaseModel
 import datetime
@@ -132,6 +133,7 @@ def reset_user(uid: str, admin_user: dict = Depends(verify_admin)):
 
         # 1. Reset Password in Firebase Auth
         auth.update_user(uid, password="12345678")
+        token_cache.invalidate_uid(uid) # Old session must re-verify
         
         # Log
         db.collection("logs").add({
@@ -170,6 +172,7 @@ def delete_user(uid: str, admin_user: dict = Depends(verify_admin)):
         except auth.UserNotFoundError:
             # If user not in Auth but in Firestore, we proceed
             pass
+        token_cache.invalidate_uid(uid) # Cached sessions end now, not at token expiry
         
         # Log
         db.collection("logs").add({
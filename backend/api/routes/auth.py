@@ -1,14 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Header
-from firebase_admin import auth
-from api.firebaseConfig import db
 from api.notification_service import notification_service
+from api.auth_cache import token_cache, role_cache
 
 auth_router = APIRouter(prefix="/auth", tags=["auth"])
 
 from fastapi import Query
 # ... imports
 
-async def verify_token(
+def verify_token(
     authorization: str = Header(None), 
     token: str = Query(None)
 ):
@@ -16,6 +15,8 @@ async def verify_token(
     Verifies Firebase ID token.
     Accepts 'Authorization: Bearer <token>' HEADER 
     OR '?token=<token>' QUERY PARAM (for Beacons).
+    Sync on purpose: a cache miss verifies against Firebase (network / key fetch),
+    and FastAPI runs sync dependencies in its threadpool instead of on the event loop.
     """
     id_token = None
     
@@ -34,8 +35,8 @@ async def verify_token(
         )
     
     try:
-        # Allow 60 seconds of clock skew
-        decoded_token = auth.verify_id_token(id_token, clock_skew_seconds=60)
+        # Verified tokens are cached (keyed by hash, bounded by exp); 60 seconds of clock skew allowed
+        decoded_token = token_cache.verify(id_token)
         return decoded_token
     except Exception as e:
         print(f"Error verifying token: {e}") 
@@ -44,21 +45,29 @@ async def verify_token(
             detail=f"Invalid token: {str(e)}",
         )
 
-async def verify_admin(decoded_token: dict = Depends(verify_token)):
+def decode_token(id_token: str) -> dict:
+    """
+    Verifies a Firebase ID token outside of an HTTP dependency (WebSocket sessions).
+    Raises on invalid/expired tokens.
+    """
+    return token_cache.verify(id_token)
+
+def verify_admin(decoded_token: dict = Depends(verify_token)):
     """
     Verifies if the user associated with the token has admin privileges.
     Checks Firestore 'users' collection for the 'role' field.
+    Sync (threadpool) like verify_token: a role cache miss reads Firestore and may start the listener.
     """
     uid = decoded_token.get("uid")
     if not uid:
         raise HTTPException(status_code=401, detail="Invalid token payload")
 
-    user_doc = db.collection("users").document(uid).get()
-    if not user_doc.exists:
+    # Role cache is kept current by a Firestore listener on 'users'
+    exists, role = role_cache.get(uid)
+    if not exists:
         raise HTTPException(status_code=403, detail="User not found")
 
-    user_data = user_doc.to_dict()
-    if user_data.get("role") != "admin":
+    if role != "admin":
         raise HTTPException(status_code=403, detail="Admins only")
     
     return decoded_token
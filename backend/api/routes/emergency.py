@@ -1,15 +1,27 @@
 from fastapi import APIRouter, HTTPException
 from api.firebaseConfig import db
 from pydantic import BaseModel
+from typing import Optional
 import datetime
 from firebase_admin import firestore
 from api.controller import controller, Task, TaskType, Priority
+from api.audio_service import audio_service
+from api.siren import SIREN_PATTERNS
 
 emergency_route = APIRouter(prefix="/emergency", tags=["emergency"])
 
 class EmergencyAction(BaseModel):
     user: str
     action: str # ACTIVATED / DEACTIVATED
+    pattern: Optional[str] = None # Siren pattern: sweep / wail / yelp / hilo (default: SIREN_PATTERN)
+
+class SirenPatternRequest(BaseModel):
+    user: str
+    pattern: str
+
+def _check_pattern(pattern):
+    if pattern and pattern not in SIREN_PATTERNS:
+        raise HTTPException(status_code=400, detail=f"Unknown siren pattern: {pattern} (choose from {', '.join(SIREN_PATTERNS)})")
 
 @emergency_route.get("/")
 def get_emergency_status():
@@ -35,10 +47,14 @@ def toggle_emergency(action: EmergencyAction):
         
         # 1. Controller State Management (The Source of Truth)
         if should_activate:
+            _check_pattern(action.pattern)
+            data = {"user": action.user}
+            if action.pattern:
+                data["siren_pattern"] = action.pattern
             task = Task(
                 type=TaskType.EMERGENCY,
                 priority=Priority.EMERGENCY,
-                data={"user": action.user}
+                data=data
             )
             success = controller.request_playback(task)
         else:
@@ -125,6 +141,18 @@ def toggle_emergency(action: EmergencyAction):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to toggle emergency: {str(e)}")
 
+@emergency_route.post("/siren")
+def set_siren_pattern(req: SirenPatternRequest):
+    """Switches the running siren to another pattern (no gap). Only the activator can change it."""
+    _check_pattern(req.pattern)
+    active_user = controller.get_active_emergency_user()
+    if not controller.emergency_mode:
+        raise HTTPException(status_code=409, detail="No emergency active")
+    if active_user and active_user != req.user:
+        raise HTTPException(status_code=403, detail=f"Only the user who activated the emergency ({active_user}) can change the siren.")
+    audio_service.set_siren_pattern(req.pattern)
+    return {"pattern": req.pattern}
+
 @emergency_route.delete("/history")
 def clear_emergency_history(user: str = None):
     try:
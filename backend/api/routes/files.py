@@ -1,8 +1,12 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Response, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
 import os
-import shutil
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 from ..controller import controller
+from ..audio_service import audio_service
+from ..media_store import OffsetMismatch
 import logging
 
 router = APIRouter()
@@ -12,78 +16,146 @@ MEDIA_DIR = "media"
 if not os.path.exists(MEDIA_DIR):
     os.makedirs(MEDIA_DIR)
 
+def _file_entry(row):
+    """API shape of a library row (fields the dashboard already uses + metadata)."""
+    return {
+        "id": row["name"], # Use filename as ID for simplicity
+        "name": row["name"],
+        "size": f"{row['size'] / 1024 / 1024:.2f} MB",
+        "bytes": row["size"],
+        "date": datetime.fromtimestamp(row["mtime"]).strftime("%Y-%m-%d %H:%M"),
+        "type": row["mime"],
+        "url": f"/media/{row['name']}",
+        "duration": row["duration"],
+        "sample_rate": row["sample_rate"],
+        "channels": row["channels"],
+        "codec": row["codec"],
+        "loudness": row["loudness"],
+        "hash": row["sha256"],
+        "status": row["playback_status"],  # pending / transcoding / ready / failed
+        "progress": row["playback_progress"]
+    }
+
 @router.get("/")
-async def list_files():
-    """List all audio files in the media directory."""
+def list_files(
+    response: Response,
+    search: Optional[str] = None,
+    codec: Optional[str] = None,
+    status: Optional[str] = Query(None, pattern="^(pending|transcoding|ready|failed)$"),
+    sort: str = Query("name", pattern="^(name|date|size|duration|loudness)$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
+):
+    """List audio files from the media library index (filter, sort, paginate). Total in X-Total-Count."""
     try:
-        files = []
-        # DEBUG: correct absolute path
-        abs_media_path = os.path.abspath(MEDIA_DIR)
-        print(f"[Files] Scanning directory: {abs_media_path}")
-
-        for filename in os.listdir(MEDIA_DIR):
-            file_path = os.path.join(MEDIA_DIR, filename)
-            if os.path.isfile(file_path):
-                stats = os.stat(file_path)
-                files.append({
-                    "id": filename, # Use filename as ID for simplicity
-                    "name": filename,
-                    "size": f"{stats.st_size / 1024 / 1024:.2f} MB",
-                    "date": "Local File", # Simplify date or use stats.st_mtime
-                    "type": "audio/mpeg", # Generic or guess type
-                    "url": f"/media/{filename}"
-                })
-        return files
+        total, rows = audio_service.media_library.query(search=search, codec=codec, status=status, sort=sort,
+                                                        order=order, limit=limit, offset=offset)
+        response.headers["X-Total-Count"] = str(total)
+        return [_file_entry(row) for row in rows]
     except Exception as e:
         logging.error(f"Error listing files: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/upload")
 async def upload_file(file: UploadFile = File(...), user: str = Query("Unknown")):
-    """Upload an audio file to the media directory."""
+    """Upload an audio file in one request (small files). Stored by content; same name + same content is idempotent."""
     try:
-        file_location = os.path.join(MEDIA_DIR, file.filename)
+        stored = await run_in_threadpool(audio_service.media_store.ingest, file.file, file.filename)
+        logging.info(f"User {user} uploaded file: {stored['name']}" + (" (deduplicated)" if stored['deduplicated'] else ""))
         
-        # Check if file exists
-        # Check if file exists
-        if os.path.exists(file_location):
-            logging.info(f"File already exists: {file.filename}")
-            # Return existing file details (Idempotency)
-            stats = os.stat(file_location)
-            return {
-                "id": file.filename,
-                "name": file.filename,
-                "size": f"{stats.st_size / 1024 / 1024:.2f} MB",
-                "url": f"/media/{file.filename}"
-            }
-
-        with open(file_location, "wb+") as file_object:
-            shutil.copyfileobj(file.file, file_object)
-            
-        logging.info(f"User {user} uploaded file: {file.filename}")
-        
-        stats = os.stat(file_location)
-        return {
-            "id": file.filename,
-            "name": file.filename,
-            "size": f"{stats.st_size / 1024 / 1024:.2f} MB",
-            "url": f"/media/{file.filename}"
-        }
+        # Probe once (duration, format) so listings never have to
+        row = await run_in_threadpool(audio_service.media_library.update, stored['name'], stored['sha256'])
+        return _file_entry(row)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logging.error(f"Upload failed: {e}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+# --- Chunked / resumable uploads ---
+class UploadInit(BaseModel):
+    filename: str
+    size: int
+    sha256: Optional[str] = None  # Lets the server skip the transfer if it already has this content
+
+def _upload_error(e):
+    if isinstance(e, KeyError):
+        return HTTPException(status_code=404, detail="Upload not found or expired")
+    if isinstance(e, OffsetMismatch):
+        return HTTPException(status_code=409, detail={"message": str(e), "offset": e.offset})
+    return HTTPException(status_code=400, detail=str(e))
+
+async def _finish_upload(stored, user):
+    logging.info(f"User {user} uploaded file: {stored['name']}" + (" (deduplicated)" if stored.get('deduplicated', True) else ""))
+    row = await run_in_threadpool(audio_service.media_library.update, stored['name'], stored['sha256'])
+    return {"complete": True, "file": _file_entry(row)}
+
+@router.post("/uploads")
+async def start_upload(body: UploadInit, user: str = Query("Unknown")):
+    """Start a resumable upload. Returns upload_id and chunk_size, or the finished file if the content is already stored."""
+    try:
+        session = await run_in_threadpool(audio_service.media_store.create, body.filename, body.size, body.sha256, user)
+    except (KeyError, ValueError) as e:
+        raise _upload_error(e)
+    if session['complete']:
+        return await _finish_upload(session, user)
+    return session
+
+@router.get("/uploads/{upload_id}")
+async def upload_status(upload_id: str):
+    """Where an upload stands (resume from `offset`)."""
+    try:
+        return audio_service.media_store.status(upload_id)
+    except KeyError as e:
+        raise _upload_error(e)
+
+@router.put("/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, request: Request, offset: int = Query(..., ge=0)):
+    """Append one chunk (raw request body) at `offset`. 409 carries the offset to resume from."""
+    data = await request.body()
+    try:
+        return await run_in_threadpool(audio_service.media_store.write, upload_id, offset, data)
+    except (KeyError, ValueError) as e:
+        raise _upload_error(e)
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str, user: str = Query("Unknown")):
+    """Verify the hash, store the content (once) and publish it under its display name."""
+    try:
+        stored = await run_in_threadpool(audio_service.media_store.complete, upload_id)
+    except (KeyError, ValueError) as e:
+        raise _upload_error(e)
+    return await _finish_upload(stored, user)
+
+@router.delete("/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    """Cancel an upload and discard what was received."""
+    try:
+        audio_service.media_store.abort(upload_id)
+    except KeyError as e:
+        raise _upload_error(e)
+    return {"status": "success"}
+
 @router.delete("/{filename}")
 async def delete_file(filename: str, user: str = Query("Unknown")):
     """Delete a file from the media directory."""
     try:
-        file_path = os.path.join(MEDIA_DIR, filename)
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        # Same sanitization as uploads, resolved against the store's absolute media root
+        file_path = audio_service.media_store.path(filename)
+        filename = file_path.name
+        if file_path.is_file():
+            row = audio_service.media_library.get(filename)
+            audio_service.media_store.remove(filename, row['sha256'] if row else None)
+            audio_service.media_library.remove(filename)
             logging.info(f"User {user} deleted file: {filename}")
             return {"status": "success", "message": f"File {filename} deleted"}
         else:
             raise HTTPException(status_code=404, detail="File not found")
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logging.error(f"Delete failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
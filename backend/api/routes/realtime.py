@@ -1,9 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends, Header
+import json
+import time
+import struct
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Header, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from typing import Optional, List
 from pydantic import BaseModel
 from api.firebaseConfig import db, firestore_server_timestamp
 from api.controller import controller, Task, TaskType, Priority
-from api.routes.auth import verify_token
+from api.audio_service import audio_service
+from api.routes.auth import verify_token, decode_token
+from api.auth_cache import role_cache
+from api.voice_codec import negotiate_codec, supported_codecs
+
+# Binary voice frame: <uint32 seq><float64 capture timestamp ms> + payload (raw s16le mono 16 kHz, or one Opus packet)
+VOICE_FRAME_HEADER = struct.Struct('<Id')
 
 real_time_announcements_router = APIRouter(
     prefix="/realtime",
@@ -16,6 +27,10 @@ class BroadcastRequest(BaseModel):
     type: str = "voice" # 'voice' or 'text'
     content: Optional[str] = None # Text content or encoded metadata
     voice: Optional[str] = None # 'female' or 'male'
+    codecs: Optional[List[str]] = None # Voice: codecs the client can send, preferred first (e.g. ['opus', 'pcm16'])
+    playlist: Optional[List[str]] = None # Background: media files played back to back (gapless)
+    shuffle: bool = False # Background playlist: random order (drawn once, kept across suspend/resume)
+    repeat: str = "off" # Background playlist: 'off', 'all' or 'one'
 
 class BroadcastAction(BaseModel):
     user: str
@@ -38,6 +53,19 @@ def start_broadcast(req: BroadcastRequest, user_token: dict = Depends(verify_tok
     if req.type == 'background':
         task_type = TaskType.BACKGROUND
         priority = Priority.BACKGROUND
+        if req.repeat not in ('off', 'all', 'one'):
+            raise HTTPException(status_code=400, detail="repeat must be 'off', 'all' or 'one'")
+        if req.playlist:
+            req.content = req.content if req.content in req.playlist else req.playlist[0]
+        tracks = [audio_service.media_library.get(name) for name in (req.playlist or [req.content or ''])]
+        if tracks and all(t and t['playback_status'] != 'ready' for t in tracks):
+            # Only transcoded tracks are playable; tell the UI how far along it is
+            # (playlist tracks that aren't ready yet are skipped while playing)
+            raise HTTPException(status_code=409, detail={
+                "message": f"{tracks[0]['name']} is not ready for playback",
+                "status": tracks[0]['playback_status'],
+                "progress": tracks[0]['playback_progress']
+            })
     elif req.type == 'voice':
         task_type = TaskType.VOICE
         priority = Priority.REALTIME
@@ -45,26 +73,35 @@ def start_broadcast(req: BroadcastRequest, user_token: dict = Depends(verify_tok
         task_type = TaskType.TEXT
         priority = Priority.REALTIME
 
+    data = {
+        "user": req.user,
+        "zones": req.zones,
+        "content": req.content,
+        "voice": req.voice
+    }
+    if task_type == TaskType.BACKGROUND and req.playlist:
+        data.update(playlist=req.playlist, shuffle=req.shuffle, repeat=req.repeat)
+    if task_type == TaskType.VOICE:
+        data["codec"] = negotiate_codec(req.codecs)
+        data["uid"] = user_token.get("uid") # Owner: only this uid (or an admin) may stream into it over /ws
+
     task = Task(
         type=task_type,
         priority=priority,
-        data={
-            "user": req.user,
-            "zones": req.zones,
-            "content": req.content,
-            "voice": req.voice
-        }
+        data=data
     )
     
     success = controller.request_playback(task)
     if not success:
         raise HTTPException(status_code=409, detail="System Busy or Higher Priority Active")
     
-    return {"message": "Broadcast Started", "task_id": task.id}
+    return {"message": "Broadcast Started", "task_id": task.id, "codec": data.get("codec")}
 
 class SpeakRequest(BaseModel):
     user: str
-    audio_data: str # Base64 encoded
+    audio_data: str # Base64 encoded frame (raw PCM, or Opus if negotiated at /start)
+    seq: Optional[int] = None # Chunk sequence number (enables reordering / loss concealment)
+    timestamp: Optional[float] = None # Capture time in ms (client clock, used for jitter estimate)
 
 @real_time_announcements_router.post("/speak")
 def speak_chunk(req: SpeakRequest, user_token: dict = Depends(verify_token)):
@@ -72,13 +109,94 @@ def speak_chunk(req: SpeakRequest, user_token: dict = Depends(verify_token)):
     Receive and play a chunk of audio for the active broadcast.
     """
     try:
-        controller.play_realtime_chunk(req.audio_data)
+        controller.play_realtime_chunk(req.audio_data, seq=req.seq, timestamp=req.timestamp)
         return {"message": "Chunk processed"}
     except Exception as e:
         print(f"Speak error: {e}")
         # Return 200 to keep frontend streaming, but log error
         return {"message": "Chunk failed", "error": str(e)}
 
+@real_time_announcements_router.websocket("/ws")
+async def voice_socket(websocket: WebSocket, token: Optional[str] = None, ack: bool = False):
+    """
+    Live voice over one WebSocket: authenticated once, then binary frames
+    (VOICE_FRAME_HEADER + payload in the codec negotiated at /start) go straight into the controller.
+    Token via '?token=' or a first text message {"token": "..."}.
+    The socket is bound to the active voice task, which must belong to the token's uid (or the uid is an admin),
+    and is closed with 4401 when the token expires (reconnect with a fresh token).
+    ack=true echoes each frame's seq (uint32) once it has been queued.
+    Text {"type": "ping", "t": ...} is answered with {"type": "pong", "t": ...}.
+    """
+    await websocket.accept()
+    try:
+        if not token:
+            hello = json.loads(await websocket.receive_text())
+            token = hello.get("token")
+        decoded = await run_in_threadpool(decode_token, token)
+    except Exception as e:
+        print(f"[Realtime WS] Auth failed: {e}")
+        await websocket.close(code=4401, reason="Invalid token")
+        return
+
+    uid = decoded.get("uid")
+    task = controller.current_task
+    if not task or task.type != TaskType.VOICE:
+        await websocket.close(code=4409, reason="No voice broadcast active")
+        return
+    if task.data.get("uid") != uid:
+        # Role lookup may hit Firestore: keep it off the event loop
+        exists, role = await run_in_threadpool(role_cache.get, uid)
+        if not exists or role != "admin":
+            print(f"[Realtime WS] {uid} denied: voice task {task.id} belongs to {task.data.get('uid')}")
+            await websocket.close(code=4403, reason="Not the owner of the active broadcast")
+            return
+    task_id = task.id
+
+    async def expire():
+        await asyncio.sleep(max(0.0, decoded.get("exp", 0) - time.time()))
+        await websocket.close(code=4401, reason="Token expired")
+
+    watchdog = asyncio.create_task(expire()) if decoded.get("exp") else None
+    frames = denied = malformed = 0
+    await websocket.send_text(json.dumps({"type": "ready", "uid": uid, "task_id": task_id,
+                                          "codec": audio_service.stream_codec(), "codecs": supported_codecs()}))
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            data = message.get("bytes")
+            if data is not None:
+                if len(data) < VOICE_FRAME_HEADER.size:
+                    malformed += 1
+                    continue
+                seq, timestamp = VOICE_FRAME_HEADER.unpack_from(data)
+                # play_realtime_pcm takes locks and touches the jitter buffer: keep it off the event loop
+                if await run_in_threadpool(controller.play_realtime_pcm, data[VOICE_FRAME_HEADER.size:],
+                                           seq=seq, timestamp=timestamp, task_id=task_id):
+                    frames += 1
+                else:
+                    denied += 1
+                if ack:
+                    await websocket.send_bytes(struct.pack('<I', seq))
+                continue
+
+            text = message.get("text")
+            if text:
+                msg = json.loads(text)
+                if msg.get("type") == "ping":
+                    await websocket.send_text(json.dumps({"type": "pong", "t": msg.get("t")}))
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: receive() after the watchdog closed the socket
+        pass
+    except Exception as e:
+        print(f"[Realtime WS] Session error: {e}")
+    finally:
+        if watchdog:
+            watchdog.cancel()
+    print(f"[Realtime WS] Session closed ({uid}, task {task_id}): {frames} frames, {denied} denied, {malformed} malformed")
+
 @real_time_announcements_router.post("/stop")
 def stop_broadcast(user: str, type: str = "voice", task_id: Optional[str] = None, user_token: dict = Depends(verify_token)): 
     """
@@ -1,5 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi.responses import FileResponse
+from firebase_admin import firestore
 from api.firebaseConfig import db, firestore_server_timestamp
+from api.audio_service import audio_service
 from pydantic import BaseModel
 from typing import Optional
 from api.controller import controller, Task, TaskType, Priority
@@ -15,7 +18,8 @@ class ScheduleItem(BaseModel):
     repeat: str
     zones: list # List of strings
     type: str = 'text' # or 'voice'
-    audio: Optional[str] = None # Base64
+    audio: Optional[str] = None # Base64 on upload; stored in the blob store, documents keep 'audio_hash'
+    audio_hash: Optional[str] = None # SHA-256 of recorded audio (GET /scheduled/audio/{hash})
 
 @scheduled_announcements_router.get("/")
 def get_schedules():
@@ -50,12 +54,20 @@ def create_schedule(schedule: dict, user_token: dict = Depends(verify_token)):
         if len(existing) > 0:
             raise HTTPException(status_code=409, detail="Time slot already occupied. Please choose another time.")
 
-        # 3. Persistence (Firestore)
+        # 3. Persistence (Firestore) - recorded audio goes to the blob store, the document keeps its hash
         if "id" in schedule: del schedule["id"]
         schedule['status'] = 'Pending' # Default
+        try:
+            audio_hash = audio_service.schedule_audio.externalize(schedule)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid audio: {e}")
+        if audio_hash and not audio_service.schedule_audio.path(audio_hash):
+            raise HTTPException(status_code=400, detail="Unknown audio_hash")
         
         _, doc_ref = db.collection("schedules").add(schedule)
         doc_id = doc_ref.id
+        if audio_hash:
+            audio_service.schedule_audio.retain(audio_hash, doc_id)
         
         # 3. Sync to Controller Queue
         # Parse datetime for sorting
@@ -93,8 +105,21 @@ def create_schedule(schedule: dict, user_token: dict = Depends(verify_token)):
 @scheduled_announcements_router.put("/{id}")
 def update_schedule(id: str, schedule: dict, user_token: dict = Depends(verify_token)):
     try:
-        # 1. Persistence
-        db.collection("schedules").document(id).set(schedule, merge=True)
+        # 1. Persistence (audio by hash; an inline 'audio' field on the document is dropped)
+        try:
+            audio_hash = audio_service.schedule_audio.externalize(schedule)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid audio: {e}")
+        if audio_hash and not audio_service.schedule_audio.path(audio_hash):
+            raise HTTPException(status_code=400, detail="Unknown audio_hash")
+        doc = dict(schedule, audio=firestore.DELETE_FIELD)
+        if not audio_hash:
+            schedule.pop('audio_hash', None)
+            doc['audio_hash'] = firestore.DELETE_FIELD  # Recording removed (text schedule now)
+        db.collection("schedules").document(id).set(doc, merge=True)
+        audio_service.schedule_audio.release(id)
+        if audio_hash:
+            audio_service.schedule_audio.retain(audio_hash, id)
         
         # 2. Sync Controller (Remove old, Add new)
         controller.remove_from_queue(id)
@@ -125,6 +150,8 @@ def update_schedule(id: str, schedule: dict, user_token: dict = Depends(verify_t
         })
 
         return {"message": "Schedule updated and re-queued"}
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update schedule: {str(e)}")
 
@@ -133,6 +160,7 @@ def delete_schedule(id: str, user: str = "Admin", user_token: dict = Depends(ver
     try:
         # 1. Persistence
         db.collection("schedules").document(id).delete()
+        audio_service.schedule_audio.release(id) # Blob is collected once nothing references it
         
         # 2. Sync Controller
         controller.remove_from_queue(id)
@@ -152,3 +180,11 @@ def delete_schedule(id: str, user: str = "Admin", user_token: dict = Depends(ver
         return {"message": "Schedule deleted and unqueued"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete schedule: {str(e)}")
+
+@scheduled_announcements_router.get("/audio/{audio_hash}")
+def get_schedule_audio(audio_hash: str):
+    """Recorded audio of a schedule, by content hash (immutable, cacheable)."""
+    path = audio_service.schedule_audio.path(audio_hash)
+    if not path:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    return FileResponse(path, headers={"Cache-Control": "public, max-age=31536000, immutable"})
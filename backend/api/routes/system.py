@@ -0,0 +1,196 @@
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from typing import Optional
+from api.audio_service import audio_service
+from api.routes.auth import verify_admin
+from api.auth_cache import token_cache, role_cache
+
+system_router = APIRouter(prefix="/system", tags=["system"])
+
+@system_router.get("/tts-cache")
+def get_tts_cache(admin_user: dict = Depends(verify_admin)):
+    """
+    Inspect the TTS render cache (size, hit/miss counters, entries).
+    Protected: Admin only.
+    """
+    return audio_service.tts_cache.stats()
+
+@system_router.delete("/tts-cache")
+def purge_tts_cache(expired_only: bool = False, admin_user: dict = Depends(verify_admin)):
+    """
+    Purge the TTS render cache.
+    expired_only=true only applies the age/size budget (LRU eviction).
+    Protected: Admin only.
+    """
+    if expired_only:
+        removed = audio_service.tts_cache.prune()
+    else:
+        removed = audio_service.tts_cache.purge()
+    return {"message": "TTS cache purged", "removed": removed}
+
+@system_router.get("/tts-workers")
+def get_tts_workers(admin_user: dict = Depends(verify_admin)):
+    """
+    Warm Piper worker pool status (queue depth, health, restarts).
+    Protected: Admin only.
+    """
+    if not audio_service.piper_pool:
+        return {"enabled": False, "voices": {}}
+    return {"enabled": True, "voices": audio_service.piper_pool.stats()}
+
+@system_router.get("/tts-latency")
+def get_tts_latency(admin_user: dict = Depends(verify_admin)):
+    """
+    Time-to-first-sample for streamed vs file-rendered announcements.
+    Protected: Admin only.
+    """
+    return audio_service.get_tts_latency()
+
+@system_router.get("/audio-engine")
+def get_audio_engine(admin_user: dict = Depends(verify_admin)):
+    """
+    Mixer status: card sinks, active sources, playback start latency and stop() latency.
+    Protected: Admin only.
+    """
+    return {**audio_service.mixer.stats(), 'stop_latency': dict(audio_service.stop_latency)}
+
+@system_router.get("/sound-bank")
+def get_sound_bank(admin_user: dict = Depends(verify_admin)):
+    """
+    System sounds held in memory (clip names usable by the controller).
+    Protected: Admin only.
+    """
+    if not audio_service.sound_bank:
+        return {'clips': {}, 'reloads': 0}
+    return audio_service.sound_bank.stats()
+
+@system_router.get("/media-library")
+def get_media_library(admin_user: dict = Depends(verify_admin)):
+    """
+    Media index size, last rescan, loudness analysis, dedup savings and transcoding progress.
+    Protected: Admin only.
+    """
+    stats = audio_service.media_library.stats()
+    stats['loudness'] = audio_service.loudness.stats()
+    stats['storage'] = audio_service.media_store.stats()
+    stats['transcoding'] = audio_service.transcoder.stats()
+    return stats
+
+@system_router.post("/media-library/transcode")
+def transcode_media_library(force: bool = False, admin_user: dict = Depends(verify_admin)):
+    """
+    Bulk transcode of the library to the playback format across all cores (force=true redoes ready tracks).
+    Protected: Admin only.
+    """
+    if not audio_service.transcoder.transcode_all(force=force):
+        raise HTTPException(status_code=409, detail="A transcode batch is already running")
+    return audio_service.transcoder.stats()
+
+@system_router.post("/media-library/analyze")
+def analyze_media_library(force: bool = False, admin_user: dict = Depends(verify_admin)):
+    """
+    Batch loudness analysis of the library across all cores (force=true re-measures every track).
+    Protected: Admin only.
+    """
+    if not audio_service.loudness.analyze_all(force=force):
+        raise HTTPException(status_code=409, detail="A loudness batch is already running")
+    return audio_service.loudness.stats()
+
+@system_router.get("/schedule-prerender")
+def get_schedule_prerender(admin_user: dict = Depends(verify_admin)):
+    """
+    Lookahead pre-render of upcoming schedules (prepared entries, hits/misses) and
+    lateness: due time -> first sample at the speakers, per path (prepared vs cold).
+    Protected: Admin only.
+    """
+    return audio_service.prerender.stats()
+
+@system_router.get("/schedule-audio")
+def get_schedule_audio_store(admin_user: dict = Depends(verify_admin)):
+    """
+    Blob store of recorded schedule audio (blobs, references, GC count).
+    Protected: Admin only.
+    """
+    return audio_service.schedule_audio.stats()
+
+class DuckingSettings(BaseModel):
+    enabled: Optional[bool] = None
+    depth_db: Optional[float] = None # Background level under announcements (dB, <= 0)
+    attack: Optional[float] = None # Seconds to ramp down
+    release: Optional[float] = None # Seconds to ramp back up
+
+@system_router.get("/ducking")
+def get_ducking(admin_user: dict = Depends(verify_admin)):
+    """
+    Background music ducking under announcements (depth, attack/release).
+    Protected: Admin only.
+    """
+    return audio_service.ducking
+
+@system_router.put("/ducking")
+def update_ducking(settings: DuckingSettings, admin_user: dict = Depends(verify_admin)):
+    """
+    Change ducking settings (omitted fields are kept). Applies from the next announcement.
+    Protected: Admin only.
+    """
+    if settings.depth_db is not None and not -60 <= settings.depth_db <= 0:
+        raise HTTPException(status_code=400, detail="depth_db must be between -60 and 0")
+    for ramp in (settings.attack, settings.release):
+        if ramp is not None and not 0 <= ramp <= 10:
+            raise HTTPException(status_code=400, detail="attack/release must be between 0 and 10 seconds")
+    return audio_service.set_ducking(settings.enabled, settings.depth_db, settings.attack, settings.release)
+
+@system_router.get("/audio-devices")
+def get_audio_devices(admin_user: dict = Depends(verify_admin)):
+    """
+    ALSA cards, managed mixer controls and their cached volume/mute state.
+    Protected: Admin only.
+    """
+    if not audio_service.device_registry:
+        return {'cards': {}}
+    return audio_service.device_registry.stats()
+
+@system_router.post("/audio-devices/refresh")
+def refresh_audio_devices(admin_user: dict = Depends(verify_admin)):
+    """
+    Rediscover cards and re-read every control now (re-applies drifted settings).
+    Protected: Admin only.
+    """
+    if not audio_service.device_registry:
+        return {'cards': {}}
+    audio_service.device_registry.refresh(force=True)
+    fixed = audio_service.device_registry.check_drift()
+    return {'fixed': fixed, **audio_service.device_registry.stats()}
+
+@system_router.get("/zones")
+def get_zone_routing(admin_user: dict = Depends(verify_admin)):
+    """
+    Compiled zone routing table (zones, aliases, cards) and reload status.
+    Protected: Admin only.
+    """
+    return audio_service.zone_router.stats()
+
+@system_router.post("/zones/reload")
+def reload_zone_routing(admin_user: dict = Depends(verify_admin)):
+    """
+    Rebuild the routing table from zones_config.json now.
+    Protected: Admin only.
+    """
+    audio_service.zone_router.reload(force=True)
+    return audio_service.zone_router.stats()
+
+@system_router.get("/realtime-stats")
+def get_realtime_stats(admin_user: dict = Depends(verify_admin)):
+    """
+    Jitter, loss and playout-delay stats for the live voice broadcast and recent ones.
+    Protected: Admin only.
+    """
+    return audio_service.get_stream_stats()
+
+@system_router.get("/auth-cache")
+def get_auth_cache(admin_user: dict = Depends(verify_admin)):
+    """
+    Verified-token and role cache: hit rates and verification latency.
+    Protected: Admin only.
+    """
+    return {'tokens': token_cache.stats(), 'roles': role_cache.stats()}
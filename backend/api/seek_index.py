@@ -0,0 +1,179 @@
+import os
+import json
+import threading
+from pathlib import Path
+
+SEEK_INDEX_STEP = 0.25        # Seconds between stored seek points
+SEEK_PREROLL = 0.1            # Start this much earlier (MP3 bit reservoir) and trim it off
+SEEK_INDEX_VERSION = 2
+
+# MPEG audio Layer III tables
+_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],   # MPEG-1
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],       # MPEG-2 / 2.5
+}
+_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+def _parse_header(b):
+    """Returns (frame_bytes, samples, sample_rate) for an MPEG Layer III header, or None."""
+    if len(b) < 4 or b[0] != 0xFF or (b[1] & 0xE0) != 0xE0:
+        return None
+    version = (b[1] >> 3) & 0x03      # 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+    layer = (b[1] >> 1) & 0x03        # 1 = Layer III
+    bitrate_idx = (b[2] >> 4) & 0x0F
+    rate_idx = (b[2] >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_idx in (0, 15) or rate_idx == 3:
+        return None
+    padding = (b[2] >> 1) & 0x01
+    bitrate = _BITRATES[1 if version == 3 else 2][bitrate_idx] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_idx]
+    if version == 3:
+        return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+    return 72 * bitrate // sample_rate + padding, 576, sample_rate
+
+
+def _skip_id3(data):
+    if data[:3] != b'ID3' or len(data) < 10:
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def build_mp3_index(path, step=SEEK_INDEX_STEP):
+    """
+    Walks the MP3 frame headers (no decoding) and returns
+    {'sample_rate', 'channels', 'duration', 'points': [[seconds, byte_offset], ...]}, or None if not an MP3.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    pos = _skip_id3(data)
+    end = len(data)
+    points = []
+    samples_done = 0
+    sample_rate = None
+    channels = None
+    next_point = 0.0
+    first = True
+
+    while pos + 4 <= end:
+        header = _parse_header(data[pos:pos + 4])
+        # Resync: a header only counts if the next frame also starts with one
+        if header is None or (pos + header[0] + 4 <= end and _parse_header(data[pos + header[0]:pos + header[0] + 4]) is None):
+            pos += 1
+            continue
+        frame_bytes, frame_samples, rate = header
+        if sample_rate is None:
+            sample_rate = rate
+            channels = 1 if (data[pos + 3] >> 6) == 3 else 2   # Channel mode 3 = mono
+        if first:
+            first = False
+            # Xing/Info/VBRI tag frame carries no audio (decoders skip it)
+            if b'Xing' in data[pos:pos + 64] or b'Info' in data[pos:pos + 64] or b'VBRI' in data[pos:pos + 64]:
+                pos += frame_bytes
+                continue
+        t = samples_done / sample_rate
+        if t >= next_point:
+            points.append([round(t, 4), pos])
+            next_point += step
+        samples_done += frame_samples
+        pos += frame_bytes
+
+    if not points:
+        return None
+    return {'sample_rate': sample_rate, 'channels': channels, 'duration': round(samples_done / sample_rate, 3), 'points': points}
+
+
+class SeekIndex:
+    """
+    Per-file seek tables stored as sidecars in media/.index/, so seeking or resuming
+    a track starts the decoder at the right frame instead of decoding from the top.
+    """
+    def __init__(self, index_dir):
+        self.index_dir = Path(index_dir)
+        self._lock = threading.Lock()
+        self._memo = {}   # path -> (signature, index)
+        self.builds = 0
+
+    def locate(self, path, seconds):
+        """Returns (byte_offset, skip_seconds) to start decoding at `seconds`, or None (no index)."""
+        index = self.get(path)
+        if not index or seconds <= 0:
+            return None
+        target = max(0.0, seconds - SEEK_PREROLL)
+        points = index['points']
+        lo, hi = 0, len(points) - 1
+        while lo < hi:  # Last point at or before target
+            mid = (lo + hi + 1) // 2
+            if points[mid][0] <= target:
+                lo = mid
+            else:
+                hi = mid - 1
+        t, offset = points[lo]
+        return offset, max(0.0, seconds - t)
+
+    def get(self, path, build=True):
+        """Loads (or builds) the index for path. Stale sidecars are rebuilt."""
+        path = Path(path)
+        if path.suffix.lower() != '.mp3':
+            return None
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        signature = [st.st_size, int(st.st_mtime)]
+        with self._lock:
+            cached = self._memo.get(str(path))
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        sidecar = self._sidecar(path)
+        index = None
+        try:
+            with open(sidecar, 'r') as f:
+                stored = json.load(f)
+            if stored.get('signature') == signature and stored.get('version') == SEEK_INDEX_VERSION:
+                index = stored
+        except (OSError, ValueError):
+            pass
+        if index is None:
+            if not build:
+                return None
+            index = self.build(path)
+        if index:
+            with self._lock:
+                self._memo[str(path)] = (signature, index)
+        return index
+
+    def build(self, path):
+        path = Path(path)
+        try:
+            st = path.stat()
+            index = build_mp3_index(path)
+        except Exception as e:
+            print(f"[SeekIndex] Failed to index {path.name}: {e}")
+            return None
+        if not index:
+            return None
+        index.update({'version': SEEK_INDEX_VERSION, 'signature': [st.st_size, int(st.st_mtime)]})
+        try:
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self._sidecar(path).with_suffix('.tmp')
+            with open(tmp, 'w') as f:
+                json.dump(index, f)
+            os.replace(tmp, self._sidecar(path))
+        except OSError as e:
+            print(f"[SeekIndex] Failed to save index for {path.name}: {e}")
+        self.builds += 1
+        print(f"[SeekIndex] Indexed {path.name}: {index['duration']}s, {len(index['points'])} seek points")
+        return index
+
+    def remove(self, path):
+        with self._lock:
+            self._memo.pop(str(Path(path)), None)
+        try: self._sidecar(Path(path)).unlink()
+        except OSError: pass
+
+    def _sidecar(self, path):
+        return self.index_dir / f"{path.name}.seek.json"
@@ -0,0 +1,71 @@
+import threading
+import numpy as np
+
+from api.mixer import Source, MIXER_RATE
+
+SIREN_RELEASE_SECONDS = 0.005  # Fade on release (avoids a click without audible delay)
+
+# Pitch envelopes: shape of the sweep over one period, mapped onto [low, high] Hz
+# - sweep: rising saw (the original `synth 1 sine 600:1200` loop)
+# - wail:  slow rise and fall
+# - yelp:  fast rising saw
+# - hilo:  two alternating tones
+SIREN_PATTERNS = {
+    'sweep': {'low': 600.0, 'high': 1200.0, 'period': 1.0, 'shape': 'saw'},
+    'wail':  {'low': 600.0, 'high': 1200.0, 'period': 4.0, 'shape': 'triangle'},
+    'yelp':  {'low': 600.0, 'high': 1200.0, 'period': 0.3, 'shape': 'saw'},
+    'hilo':  {'low': 650.0, 'high': 900.0,  'period': 1.0, 'shape': 'square'},
+}
+
+
+class SirenSource(Source):
+    """
+    Sine oscillator synthesized block by block. Phase and sweep position carry
+    across blocks (and pattern changes), so the tone never gaps or clicks.
+    """
+    def __init__(self, pattern='sweep', gain=1.0, rate=MIXER_RATE, name="siren"):
+        super().__init__(gain, name)
+        self.rate = rate
+        self._phase = 0.0    # Oscillator phase (radians)
+        self._t = 0.0        # Position within the sweep period (seconds)
+        self._releasing = False
+        self._lock = threading.Lock()
+        self.pattern = None
+        self.set_pattern(pattern)
+
+    def set_pattern(self, pattern):
+        """Switches pattern at the next block, keeping the oscillator phase."""
+        if pattern not in SIREN_PATTERNS:
+            raise ValueError(f"Unknown siren pattern: {pattern} (choose from {', '.join(SIREN_PATTERNS)})")
+        with self._lock:
+            self.pattern = pattern
+            self._t = 0.0
+
+    def release(self, fade_seconds=SIREN_RELEASE_SECONDS):
+        """Fades out over a few milliseconds, then ends (source.done is set by the engine)."""
+        self.set_gain(0.0, fade_seconds, self.rate)
+        self._releasing = True
+
+    def _frequencies(self, frames):
+        p = SIREN_PATTERNS[self.pattern]
+        period = p['period']
+        t = (self._t + np.arange(frames) / self.rate) % period
+        self._t = (self._t + frames / self.rate) % period
+        pos = t / period
+        if p['shape'] == 'triangle':
+            env = 1.0 - np.abs(2.0 * pos - 1.0)
+        elif p['shape'] == 'square':
+            env = (pos >= 0.5).astype(np.float64)
+        else:
+            env = pos
+        return p['low'] + (p['high'] - p['low']) * env
+
+    def _read(self, frames):
+        if self._releasing and self._ramp_left == 0:
+            return np.zeros((0, 2), dtype=np.float32)
+        with self._lock:
+            freq = self._frequencies(frames)
+        phase = self._phase + 2 * np.pi * np.cumsum(freq) / self.rate
+        self._phase = float(phase[-1] % (2 * np.pi))
+        tone = np.sin(phase).astype(np.float32)
+        return np.repeat(tone[:, None], 2, axis=1)
@@ -0,0 +1,126 @@
+import os
+import time
+import threading
+from pathlib import Path
+
+from api.mixer import MIXER_RATE, decode_file
+
+SOUND_BANK_POLL_INTERVAL = 5.0   # Seconds between directory change checks
+SOUND_BANK_EXTENSIONS = {'.mp3', '.wav', '.ogg', '.flac'}
+SOUND_BANK_SKIP_PREFIXES = ('temp_',)  # Per-schedule recordings are not system clips
+
+
+class SoundBank:
+    """
+    System sounds decoded to PCM once and kept in memory per output
+    sample rate, so chimes start with no disk or decoder work.
+    """
+    def __init__(self, directory, rates=(MIXER_RATE,)):
+        self.directory = Path(directory)
+        self.rates = tuple(rates)
+        self._lock = threading.Lock()
+        self.clips = {}      # name -> {rate: float32 stereo array}
+        self.paths = {}      # name -> absolute path
+        self._signature = {} # filename -> (mtime, size)
+        self.reloads = 0
+        self._watcher = None
+        self.reload()
+
+    # --- Lookup ---
+    def resolve(self, key):
+        """Maps a clip name, filename or path inside the bank directory to a clip name."""
+        if key is None:
+            return None
+        p = Path(str(key))
+        if len(p.parts) > 1:
+            try:
+                if p.resolve().parent != self.directory.resolve():
+                    return None
+            except OSError:
+                return None
+        return p.stem if p.suffix else p.name
+
+    def get(self, key, rate=MIXER_RATE):
+        """Returns the decoded clip (shared, do not modify) or None."""
+        name = self.resolve(key)
+        with self._lock:
+            return self.clips.get(name, {}).get(rate)
+
+    def path(self, key):
+        name = self.resolve(key)
+        with self._lock:
+            return self.paths.get(name)
+
+    def names(self):
+        with self._lock:
+            return sorted(self.clips.keys())
+
+    def stats(self):
+        with self._lock:
+            return {
+                'directory': str(self.directory),
+                'reloads': self.reloads,
+                'clips': {
+                    name: {
+                        'seconds': round(len(next(iter(by_rate.values()))) / MIXER_RATE, 3) if by_rate else 0,
+                        'rates': sorted(by_rate.keys())
+                    } for name, by_rate in self.clips.items()
+                }
+            }
+
+    # --- Loading ---
+    def reload(self):
+        """Decodes new/changed files and drops removed ones. Returns True if anything changed."""
+        signature = self._scan()
+        if signature == self._signature:
+            return False
+
+        changed = [f for f, sig in signature.items() if self._signature.get(f) != sig]
+        removed = [f for f in self._signature if f not in signature]
+
+        decoded = {}
+        for filename in changed:
+            path = self.directory / filename
+            try:
+                decoded[Path(filename).stem] = (str(path), {rate: decode_file(path, rate=rate) for rate in self.rates})
+            except Exception as e:
+                print(f"[SoundBank] Failed to decode {filename}: {e}")
+
+        with self._lock:
+            for filename in removed:
+                self.clips.pop(Path(filename).stem, None)
+                self.paths.pop(Path(filename).stem, None)
+            for name, (path, by_rate) in decoded.items():
+                self.clips[name] = by_rate
+                self.paths[name] = path
+            self._signature = signature
+            self.reloads += 1
+
+        print(f"[SoundBank] Loaded {len(decoded)} clip(s), removed {len(removed)}: {self.names()}")
+        return True
+
+    def start_watching(self, interval=SOUND_BANK_POLL_INTERVAL):
+        if self._watcher:
+            return
+        def watch():
+            while True:
+                time.sleep(interval)
+                try: self.reload()
+                except Exception as e: print(f"[SoundBank] Reload failed: {e}")
+        self._watcher = threading.Thread(target=watch, daemon=True)
+        self._watcher.start()
+
+    def _scan(self):
+        signature = {}
+        if not self.directory.exists():
+            return signature
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            if entry.name.startswith(SOUND_BANK_SKIP_PREFIXES):
+                continue
+            if Path(entry.name).suffix.lower() not in SOUND_BANK_EXTENSIONS:
+                continue
+            st = entry.stat()
+            signature[entry.name] = (st.st_mtime, st.st_size)
+        return signature
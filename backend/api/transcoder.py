@@ -0,0 +1,195 @@
+import os
+import re
+import time
+import wave
+import shutil
+import threading
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from api.mixer import MIXER_RATE
+
+# --- Playback Format: what every sink consumes, so playback never decodes or resamples ---
+PLAYBACK_RATE = MIXER_RATE
+PLAYBACK_CHANNELS = 2
+TRANSCODE_WORKERS = 1                          # Uploads: one at a time, leaves cores for live audio
+TRANSCODE_BATCH_WORKERS = os.cpu_count() or 1  # Bulk re-transcode: every core
+TRANSCODE_PROGRESS_INTERVAL = 1.0              # Seconds between progress writes to the media index
+
+_SOX_PROGRESS = re.compile(rb'In:\s*([\d.]+)%')
+
+
+class Transcoder:
+    """
+    Converts media tracks to one canonical playback file (48 kHz stereo 16-bit WAV)
+    in media/.playback/<sha256>.wav. WAV on purpose: the mixer streams it with no
+    decoder process and seeks by frame offset, at ~11 MB per minute of audio
+    (FLAC would halve that but bring back a SoX decode on every play). Each job is an ffmpeg (or SoX) process, so the
+    worker threads here are a pool of transcoding processes. Status and progress are
+    written to the media index; a track is playable once its status is 'ready'.
+    """
+    def __init__(self, library, playback_dir):
+        self.library = library
+        self.playback_dir = Path(playback_dir)
+        self.playback_dir.mkdir(parents=True, exist_ok=True)
+        self.ffmpeg = shutil.which('ffmpeg')
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=TRANSCODE_WORKERS, thread_name_prefix="transcode")
+        self._active = set()     # sha256 being transcoded or queued
+        self._procs = {}         # sha256 -> running process
+        self.completed = 0
+        self.failures = 0
+        self.seconds_total = 0.0
+        self.batch = None        # {'running', 'total', 'done', 'failed', 'workers', 'seconds'}
+
+        for tmp in self.playback_dir.glob('*.tmp.*'):
+            tmp.unlink(missing_ok=True)  # Interrupted jobs
+        for other in self.playback_dir.glob('*.flac'):
+            other.unlink(missing_ok=True)  # Copies in another format (re-queued by the library scan)
+
+    def playback_path(self, sha256):
+        return self.playback_dir / f"{sha256}.wav"
+
+    def is_ready(self, sha256):
+        return bool(sha256) and self.playback_path(sha256).exists()
+
+    def submit(self, name, pool=None, force=False):
+        """
+        Queues a track for transcoding (once per content hash). Returns the future, or None if already queued.
+        With force, an existing playback copy stays playable until the new one replaces it.
+        """
+        row = self.library.get(name)
+        if not row:
+            return None
+        sha256 = row['sha256']
+        with self._lock:
+            if sha256 in self._active:
+                return None
+            self._active.add(sha256)
+        if not (force and self.is_ready(sha256)):
+            self.library.set_playback(sha256, 'pending', 0.0)
+        return (pool or self._pool).submit(self._job, name, sha256, force)
+
+    def transcode_all(self, force=False, workers=TRANSCODE_BATCH_WORKERS):
+        """Bulk (re-)transcode of the library across all cores. Returns False if a batch is already running."""
+        with self._lock:
+            if self.batch and self.batch['running']:
+                return False
+            self.batch = {'running': True, 'total': 0, 'done': 0, 'failed': 0, 'workers': workers, 'seconds': None}
+        _, rows = self.library.query()
+        seen, names = set(), []
+        for row in rows:
+            if row['sha256'] in seen or (not force and row['playback_status'] == 'ready'):
+                continue
+            seen.add(row['sha256'])
+            names.append(row['name'])
+        threading.Thread(target=self._run_batch, args=(names, workers, force), daemon=True).start()
+        return True
+
+    def release(self, sha256):
+        """Drops the playback copy of content no track uses anymore."""
+        with self._lock:
+            proc = self._procs.get(sha256)
+        if proc:
+            proc.kill()
+        self.playback_path(sha256).unlink(missing_ok=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'format': f"wav/{PLAYBACK_RATE}Hz/{PLAYBACK_CHANNELS}ch/s16",
+                'tool': 'ffmpeg' if self.ffmpeg else 'sox',
+                'active': len(self._active),
+                'completed': self.completed,
+                'failures': self.failures,
+                'avg_seconds': round(self.seconds_total / self.completed, 2) if self.completed else None,
+                'batch': dict(self.batch) if self.batch else None
+            }
+
+    # --- Internals ---
+    def _run_batch(self, names, workers, force):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcode-batch") as pool:
+            futures = [f for f in (self.submit(n, pool, force) for n in names) if f]
+            with self._lock:
+                self.batch['total'] = len(futures)
+            for future in futures:
+                ok = future.result()
+                with self._lock:
+                    self.batch['done' if ok else 'failed'] += 1
+        with self._lock:
+            self.batch.update(running=False, seconds=round(time.perf_counter() - start, 2))
+        print(f"[Transcoder] Batch: {self.batch['done']} ready, {self.batch['failed']} failed in {self.batch['seconds']}s")
+
+    def _job(self, name, sha256, force=False):
+        src = self.library.media_dir / name
+        dst = self.playback_path(sha256)
+        tmp = dst.with_suffix('.tmp.wav')
+        start = time.perf_counter()
+        try:
+            if force or not dst.exists():
+                duration = (self.library.get(name) or {}).get('duration')
+                status = 'ready' if dst.exists() else 'transcoding'  # A re-transcode keeps serving the old copy
+                self.library.set_playback(sha256, status, 0.0)
+                self._run(src, tmp, sha256, duration, status)
+                with wave.open(str(tmp), 'rb') as wf:
+                    if wf.getframerate() != PLAYBACK_RATE or wf.getnchannels() != PLAYBACK_CHANNELS or wf.getnframes() == 0:
+                        raise RuntimeError("transcoder produced an unexpected format")
+                os.replace(tmp, dst)
+            self.library.set_playback(sha256, 'ready', 1.0)
+            with self._lock:
+                self.completed += 1
+                self.seconds_total += time.perf_counter() - start
+            return True
+        except Exception as e:
+            tmp.unlink(missing_ok=True)
+            print(f"[Transcoder] Failed to transcode {name}: {e}")
+            if dst.exists():
+                self.library.set_playback(sha256, 'ready', 1.0, str(e)[:200])
+            else:
+                self.library.set_playback(sha256, 'failed', None, str(e)[:200])
+            with self._lock:
+                self.failures += 1
+            return False
+        finally:
+            with self._lock:
+                self._active.discard(sha256)
+                self._procs.pop(sha256, None)
+
+    def _run(self, src, tmp, sha256, duration, status):
+        if self.ffmpeg:
+            # Progress as key=value lines on stdout, errors only on stderr
+            cmd = [self.ffmpeg, '-nostdin', '-v', 'error', '-y', '-i', str(src), '-vn', '-ac', str(PLAYBACK_CHANNELS),
+                   '-ar', str(PLAYBACK_RATE), '-c:a', 'pcm_s16le', '-progress', 'pipe:1', '-nostats', str(tmp)]
+            progress_pipe, error_pipe = subprocess.PIPE, subprocess.PIPE
+        else:
+            # SoX -S writes its progress line and any errors to stderr
+            cmd = ['sox', '-S', str(src), '-r', str(PLAYBACK_RATE), '-c', str(PLAYBACK_CHANNELS),
+                   '-b', '16', '-e', 'signed-integer', str(tmp)]
+            progress_pipe, error_pipe = subprocess.DEVNULL, subprocess.PIPE
+        proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=progress_pipe, stderr=error_pipe)
+        with self._lock:
+            self._procs[sha256] = proc
+
+        stream = proc.stdout if self.ffmpeg else proc.stderr
+        last_write = 0.0
+        tail = b''
+        while True:
+            data = stream.read1(4096)
+            if not data:
+                break
+            if self.ffmpeg:
+                times = re.findall(rb'out_time_(?:us|ms)=(\d+)', data)  # Both are microseconds
+                progress = int(times[-1]) / 1e6 / duration if times and duration else None
+            else:
+                found = _SOX_PROGRESS.findall(data)
+                progress = float(found[-1]) / 100.0 if found else None
+                tail = (tail + b'\n'.join(l for l in re.split(rb'[\r\n]', data) if b'In:' not in l))[-500:]
+            if progress is not None and time.monotonic() - last_write >= TRANSCODE_PROGRESS_INTERVAL:
+                last_write = time.monotonic()
+                self.library.set_playback(sha256, status, round(min(progress, 0.99), 3))
+        if self.ffmpeg:
+            tail = proc.stderr.read()[-500:]
+        if proc.wait() != 0:
+            raise RuntimeError(tail.decode(errors='replace').strip() or f"exit code {proc.returncode}")
@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from pathlib import Path
+
+# --- Cache Budget ---
+TTS_CACHE_MAX_BYTES = 200 * 1024 * 1024   # 200 MB on the SD card
+TTS_CACHE_MAX_AGE = 30 * 24 * 3600         # Drop renders unused for 30 days
+TTS_CACHE_IN_USE_GRACE = 300               # Seconds after a lookup/store during which a render is never evicted (may still be playing)
+TTS_CACHE_INDEX_FLUSH = 60                 # Hits update last_access in memory; the index is rewritten at most this often (and on shutdown)
+
+
+class TTSCache:
+    """
+    Disk-backed, content-addressed store for rendered Piper WAV files.
+    Entries are keyed by (normalized text, voice model, model mtime) so a
+    re-downloaded or swapped voice never serves stale audio.
+    """
+    def __init__(self, cache_dir, max_bytes=TTS_CACHE_MAX_BYTES, max_age=TTS_CACHE_MAX_AGE):
+        self.cache_dir = Path(cache_dir)
+        self.index_path = self.cache_dir / "index.json"
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+        # key -> {'file', 'size', 'created', 'last_access', 'text', 'voice'}
+        self.entries = {}
+        self._dirty = False     # last_access changed since the index was written
+        self._saved_at = time.monotonic()
+
+        # Counters (since service start)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._load_index()
+
+    # --- Keys ---
+    @staticmethod
+    def normalize_text(text):
+        """Collapses whitespace so cosmetic edits don't defeat the cache."""
+        return " ".join(str(text).split())
+
+    def make_key(self, text, model_path):
+        try:
+            mtime = int(os.path.getmtime(model_path))
+        except OSError:
+            mtime = 0
+        raw = f"{self.normalize_text(text)}\0{Path(model_path).name}\0{mtime}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # --- Lookup / Store ---
+    def lookup(self, key):
+        """Returns the cached WAV path for key, or None (counts hit/miss)."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry:
+                path = self.cache_dir / entry['file']
+                expired = (time.time() - entry['last_access']) > self.max_age
+                if path.exists() and not expired:
+                    entry['last_access'] = time.time()
+                    self.hits += 1
+                    self._dirty = True
+                    if time.monotonic() - self._saved_at >= TTS_CACHE_INDEX_FLUSH:
+                        self._save_index()  # Batched: one write covers every hit since the last one
+                    return str(path)
+                # Stale index entry (file removed by hand or too old)
+                self._remove_entry(key)
+            self.misses += 1
+            return None
+
+    def flush(self):
+        """Writes pending last_access updates (service shutdown)."""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def contains(self, key):
+        """Non-counting presence check (used to pick the streaming path)."""
+        with self._lock:
+            entry = self.entries.get(key)
+            return bool(entry) and (self.cache_dir / entry['file']).exists()
+
+    def record_miss(self):
+        """Counts a miss for renders that bypass lookup() (streamed TTS)."""
+        with self._lock:
+            self.misses += 1
+
+    def staging_path(self, key):
+        """Unique temp path for a render in progress (committed by store())."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        return self.cache_dir / f"{key}.{uuid.uuid4().hex}.tmp.wav"
+
+    def store(self, key, rendered_path, text="", voice=""):
+        """Moves a finished render into the cache and enforces the budget."""
+        final_name = f"{key}.wav"
+        final_path = self.cache_dir / final_name
+        os.replace(rendered_path, final_path)
+
+        now = time.time()
+        with self._lock:
+            self.entries[key] = {
+                'file': final_name,
+                'size': final_path.stat().st_size,
+                'created': now,
+                'last_access': now,
+                'text': self.normalize_text(text)[:120],
+                'voice': voice
+            }
+            self._enforce_budget(keep=key)
+            self._save_index()
+        return str(final_path)
+
+    # --- Maintenance ---
+    def prune(self):
+        """Applies age/size limits now. Returns number of evicted entries."""
+        with self._lock:
+            before = self.evictions
+            self._enforce_budget()
+            self._save_index()
+            return self.evictions - before
+
+    def purge(self):
+        """Deletes every cached render. Returns number of removed entries."""
+        with self._lock:
+            count = len(self.entries)
+            for key in list(self.entries.keys()):
+                self._remove_entry(key)
+            # Leftover temp files from crashed renders
+            if self.cache_dir.exists():
+                for tmp in self.cache_dir.glob("*.tmp.wav"):
+                    try: tmp.unlink()
+                    except OSError: pass
+            self._save_index()
+            print(f"[TTSCache] Purged {count} renders")
+            return count
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'total_bytes': sum(e['size'] for e in self.entries.values()),
+                'max_bytes': self.max_bytes,
+                'max_age_seconds': self.max_age,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'items': sorted(
+                    ({'key': k, **v} for k, v in self.entries.items()),
+                    key=lambda e: e['last_access'], reverse=True
+                )
+            }
+
+    # --- Internal (caller holds _lock) ---
+    def _enforce_budget(self, keep=None):
+        now = time.time()
+        for key, entry in list(self.entries.items()):
+            if key != keep and (now - entry['last_access']) > self.max_age:
+                self._remove_entry(key)
+                self.evictions += 1
+
+        total = sum(e['size'] for e in self.entries.values())
+        if total <= self.max_bytes:
+            return
+        # LRU: oldest access first. Recently handed-out renders may be opened/played right now,
+        # so the budget can overshoot until they age past the grace period.
+        for key, entry in sorted(self.entries.items(), key=lambda kv: kv[1]['last_access']):
+            if total <= self.max_bytes:
+                break
+            if key == keep or now - entry['last_access'] < TTS_CACHE_IN_USE_GRACE:
+                continue
+            total -= entry['size']
+            self._remove_entry(key)
+            self.evictions += 1
+
+    def _remove_entry(self, key):
+        entry = self.entries.pop(key, None)
+        if entry:
+            try: (self.cache_dir / entry['file']).unlink()
+            except OSError: pass
+
+    def _load_index(self):
+        try:
+            if self.index_path.exists():
+                with open(self.index_path, 'r') as f:
+                    self.entries = json.load(f)
+                # Forget entries whose file has disappeared
+                self.entries = {k: v for k, v in self.entries.items()
+                                if v.get('file') and (self.cache_dir / v['file']).exists()}
+                print(f"[TTSCache] Loaded {len(self.entries)} cached renders")
+        except Exception as e:
+            print(f"[TTSCache] Failed to load index: {e}")
+            self.entries = {}
+
+    def _save_index(self):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self.index_path.with_suffix(".json.tmp")
+            with open(tmp, 'w') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp, self.index_path)
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        except Exception as e:
+            print(f"[TTSCache] Failed to save index: {e}")
@@ -0,0 +1,44 @@
+import re
+
+# --- Segmenting Limits ---
+SEGMENT_MAX_CHARS = 220   # Longer sentences are split at clause punctuation
+SEGMENT_MIN_CHARS = 20    # Shorter pieces are merged with a neighbour (keeps prosody natural)
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+|\n+')
+_CLAUSE_END = re.compile(r'(?<=[,;:])\s+')
+
+
+def split_segments(text, max_chars=SEGMENT_MAX_CHARS, min_chars=SEGMENT_MIN_CHARS):
+    """
+    Splits an announcement into sentence/clause segments that can be
+    synthesized independently and played back-to-back in order.
+    """
+    pieces = []
+    for sentence in _SENTENCE_END.split(str(text)):
+        sentence = " ".join(sentence.split())
+        if not sentence:
+            continue
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+
+        # Long sentence: break at clauses, packing them up to max_chars
+        current = ""
+        for clause in _CLAUSE_END.split(sentence):
+            if current and len(current) + 1 + len(clause) > max_chars:
+                pieces.append(current)
+                current = clause
+            else:
+                current = f"{current} {clause}" if current else clause
+        if current:
+            pieces.append(current)
+
+    # Merge fragments that are too short to be worth a separate render
+    segments = []
+    for piece in pieces:
+        if segments and (len(piece) < min_chars or len(segments[-1]) < min_chars) \
+                and len(segments[-1]) + 1 + len(piece) <= max_chars:
+            segments[-1] = f"{segments[-1]} {piece}"
+        else:
+            segments.append(piece)
+    return segments
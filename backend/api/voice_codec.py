@@ -0,0 +1,149 @@
+import time
+import threading
+
+try:
+    import opuslib  # Optional: enables Opus ingestion for live voice (needs libopus)
+except Exception:
+    opuslib = None
+
+VOICE_RATE = 16000
+VOICE_CHANNELS = 1
+OPUS_MAX_FRAME_SECONDS = 0.12   # Largest Opus frame (120 ms)
+
+# Opus TOC byte (RFC 6716 3.1): frame duration per config, in 1/400 s units
+_OPUS_FRAME_UNITS = [4, 8, 16, 24] * 3 + [4, 8] * 2 + [1, 2, 4, 8] * 4
+
+
+def supported_codecs():
+    """Codecs the server can decode, preferred first."""
+    return (['opus'] if opuslib is not None else []) + ['pcm16']
+
+
+def negotiate_codec(offered):
+    """Picks the first codec the client offered that we support (pcm16 if none/unknown)."""
+    supported = supported_codecs()
+    for codec in offered or []:
+        codec = str(codec).lower()
+        if codec in supported:
+            return codec
+    return 'pcm16'
+
+
+class VoiceDecoder:
+    """Turns one client frame into 16-bit PCM bytes, tracking per-frame decode CPU time."""
+    codec = None
+
+    def __init__(self):
+        self.frames = 0
+        self.errors = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_total = 0.0
+        self.cpu_max = 0.0
+        self._lock = threading.Lock()  # Decoder state is sequential; HTTP chunks arrive on several threads
+
+    def decode(self, frame):
+        with self._lock:
+            start = time.thread_time()
+            try:
+                pcm = self._decode(frame)
+            except Exception as e:
+                self.errors += 1
+                print(f"[VoiceCodec] {self.codec} decode failed: {e}")
+                return b''
+            cpu = time.thread_time() - start
+            self.frames += 1
+            self.bytes_in += len(frame)
+            self.bytes_out += len(pcm)
+            self.cpu_total += cpu
+            self.cpu_max = max(self.cpu_max, cpu)
+        return pcm
+
+    def samples(self, frame):
+        """Samples per channel one frame decodes to (without decoding it)."""
+        raise NotImplementedError
+
+    def conceal(self, samples, next_frame=None):
+        """
+        PCM standing in for a lost frame of `samples` length (decoded in playout order, so the
+        decoder state stays in sync), or None if the codec can't conceal (caller fills the gap).
+        """
+        return None
+
+    def stats(self):
+        return {
+            'codec': self.codec,
+            'frames': self.frames,
+            'errors': self.errors,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'compression': round(self.bytes_out / self.bytes_in, 2) if self.bytes_in else None,
+            'cpu_avg_us': round(self.cpu_total / self.frames * 1e6, 1) if self.frames else None,
+            'cpu_max_us': round(self.cpu_max * 1e6, 1)
+        }
+
+    def _decode(self, frame):
+        raise NotImplementedError
+
+
+class PcmDecoder(VoiceDecoder):
+    """Raw s16le passthrough (clients that can't encode)."""
+    codec = 'pcm16'
+
+    def _decode(self, frame):
+        return frame
+
+    def samples(self, frame):
+        return len(frame) // (2 * VOICE_CHANNELS)
+
+
+class OpusDecoder(VoiceDecoder):
+    """One Opus packet per frame, decoded to 16 kHz mono s16le."""
+    codec = 'opus'
+
+    def __init__(self, rate=VOICE_RATE, channels=VOICE_CHANNELS):
+        super().__init__()
+        if opuslib is None:
+            raise ValueError("Opus support needs the 'opuslib' package and libopus")
+        self.decoder = opuslib.Decoder(rate, channels)
+        self.rate = rate
+        self.max_frame = int(rate * OPUS_MAX_FRAME_SECONDS)
+        self.fec_frames = 0
+        self.plc_frames = 0
+
+    def _decode(self, frame):
+        return self.decoder.decode(bytes(frame), self.max_frame)
+
+    def samples(self, frame):
+        if not frame:
+            return 0
+        toc = frame[0]
+        count = (1, 2, 2, frame[1] & 0x3F if len(frame) > 1 else 0)[toc & 0x3]
+        return _OPUS_FRAME_UNITS[toc >> 3] * count * self.rate // 400
+
+    def conceal(self, samples, next_frame=None):
+        """In-band FEC from the next packet when it carries it, otherwise Opus PLC (decode without data)."""
+        with self._lock:
+            try:
+                if next_frame:
+                    self.fec_frames += 1
+                    return self.decoder.decode(bytes(next_frame), samples, decode_fec=True)
+                self.plc_frames += 1
+                return self.decoder.decode(b'', samples)
+            except Exception as e:
+                self.errors += 1
+                print(f"[VoiceCodec] opus concealment failed: {e}")
+                return None
+
+    def stats(self):
+        return {**super().stats(), 'fec_frames': self.fec_frames, 'plc_frames': self.plc_frames}
+
+
+def make_decoder(codec):
+    """Decoder for a negotiated codec. Raises ValueError for unsupported ones."""
+    codec = (codec or 'pcm16').lower()
+    if codec == 'pcm16':
+        return PcmDecoder()
+    if codec == 'opus':
+        return OpusDecoder()
+    raise ValueError(f"Unsupported voice codec: {codec}")
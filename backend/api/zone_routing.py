@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import threading
+from pathlib import Path
+
+ALL_ZONES = "All Zones"
+DEFAULT_CARD = 2                 # Pi speakers (used when nothing matches)
+ZONES_CONFIG_POLL = 2.0          # Seconds between zones_config.json mtime checks
+ZONES_MEMO_SIZE = 256            # Resolved zone lists kept per table (oldest dropped first)
+
+
+class ZoneTable:
+    """
+    Immutable routing table compiled from zones_config.json.
+
+    Accepted zone entries:
+      "Library": {"card": 2, "channel": "left", "aliases": ["Books"]}
+      "Hall":    [{"card": 2, "channel": "left"}, {"card": 3}]
+      "Block A": {"targets": [...], "aliases": [...]}
+    """
+    def __init__(self, config):
+        self.config = dict(config)
+        self.zones = {}     # zone name -> tuple of target dicts
+        self.lookup = {}    # lowercase name/alias -> zone name
+        self._memo = {}     # tuple(requested zones) -> targets (insertion ordered, bounded)
+        self._memo_lock = threading.Lock()
+
+        for name, val in self.config.items():
+            targets, aliases = self._parse_entry(val)
+            self.zones[name] = tuple(self._dedupe(targets))
+            self.lookup[name.lower()] = name
+            for alias in aliases:
+                self.lookup.setdefault(str(alias).lower(), name)
+
+        everything = [t for targets in self.zones.values() for t in targets]
+        self.all_targets = tuple(self._dedupe(everything)) or ({'card': DEFAULT_CARD, 'channel': None},)
+        self.cards = sorted({t['card'] for t in self.all_targets})
+
+    def resolve(self, zones):
+        """Maps requested zone names to [{'card', 'channel'}] (memoized per table)."""
+        if isinstance(zones, str):
+            zones = [zones]
+        key = tuple(zones or ())
+        with self._memo_lock:
+            cached = self._memo.get(key)
+        if cached is not None:
+            return list(cached)
+
+        if not key or ALL_ZONES in key:
+            targets = self.all_targets
+        else:
+            found = []
+            for z in key:
+                names = self._match(z)
+                if not names:
+                    print(f"[Zones] Warning: Zone '{z}' not found")
+                for name in names:
+                    found.extend(self.zones[name])
+            targets = tuple(self._dedupe(found)) or ({'card': DEFAULT_CARD, 'channel': None},)
+
+        with self._memo_lock:
+            if len(self._memo) >= ZONES_MEMO_SIZE:
+                del self._memo[next(iter(self._memo))]  # Requests are client-supplied: don't grow without bound
+            self._memo[key] = targets
+        return list(targets)
+
+    def _match(self, requested):
+        """Exact name/alias first, then the legacy case-insensitive substring match on names."""
+        needle = str(requested).lower()
+        if needle in self.lookup:
+            return [self.lookup[needle]]
+        return [name for name in self.zones if needle in name.lower()]
+
+    @staticmethod
+    def _parse_entry(val):
+        aliases = []
+        if isinstance(val, dict) and 'targets' in val:
+            aliases = val.get('aliases', [])
+            val = val['targets']
+        elif isinstance(val, dict):
+            aliases = val.get('aliases', [])
+        items = val if isinstance(val, list) else [val]
+        targets = []
+        for item in items:
+            if isinstance(item, dict):
+                targets.append({'card': item.get('card', DEFAULT_CARD), 'channel': item.get('channel')})
+            else:
+                targets.append({'card': item, 'channel': None})
+        return targets, aliases
+
+    @staticmethod
+    def _dedupe(targets):
+        seen = set()
+        out = []
+        for t in targets:
+            key = (t['card'], t['channel'])
+            if key not in seen:
+                seen.add(key)
+                out.append(t)
+        return out
+
+
+class ZoneRouter:
+    """Holds the current ZoneTable and swaps in a rebuilt one when zones_config.json changes."""
+    def __init__(self, config_path):
+        self.config_path = Path(config_path)
+        self.table = ZoneTable({})
+        self.reloads = 0
+        self.last_error = None
+        self._mtime = None
+        self._listeners = []
+        self._watcher = None
+        self.reload()
+
+    def resolve(self, zones):
+        return self.table.resolve(zones)
+
+    def on_change(self, callback):
+        """callback(table) runs after every successful rebuild."""
+        self._listeners.append(callback)
+
+    def reload(self, force=False):
+        """Rebuilds the table if the file changed. A broken file keeps the previous table."""
+        try:
+            mtime = os.path.getmtime(self.config_path)
+        except OSError:
+            mtime = None
+        if mtime == self._mtime and not force:
+            return False
+        self._mtime = mtime
+
+        try:
+            config = {}
+            if mtime is not None:
+                with open(self.config_path, 'r') as f:
+                    config = json.load(f)
+            table = ZoneTable(config)
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"[Zones] Failed to load {self.config_path}: {e} (keeping previous table)")
+            return False
+
+        self.table = table  # Atomic swap: readers see the old or the new table, never a mix
+        self.reloads += 1
+        self.last_error = None
+        print(f"[Zones] Loaded {len(table.zones)} zone(s) from {self.config_path}")
+        for callback in self._listeners:
+            try: callback(table)
+            except Exception as e: print(f"[Zones] Reload listener failed: {e}")
+        return True
+
+    def start_watching(self, interval=ZONES_CONFIG_POLL):
+        if self._watcher:
+            return
+        def watch():
+            while True:
+                time.sleep(interval)
+                self.reload()
+        self._watcher = threading.Thread(target=watch, daemon=True)
+        self._watcher.start()
+
+    def stats(self):
+        table = self.table
+        return {
+            'path': str(self.config_path),
+            'reloads': self.reloads,
+            'last_error': self.last_error,
+            'cards': table.cards,
+            'zones': {name: list(targets) for name, targets in table.zones.items()},
+            'aliases': {alias: name for alias, name in table.lookup.items() if alias != name.lower()}
+        }
@@ -7,6 +7,7 @@ from api.routes.scheduled import scheduled_announcements_router
 from api.routes.account import manage_account_router
 from api.routes.emergency import emergency_route
 from api.routes.files import router as files_router
+from api.routes.system import system_router
 from fastapi.staticfiles import StaticFiles
 import os
 import threading
@@ -54,6 +55,10 @@ async def lifespan(app: FastAPI):
     stop_event.set()
     try:
         audio_service.stop()
+        audio_service.mixer.shutdown()
+        audio_service.tts_cache.flush()
+        if audio_service.piper_pool:
+            audio_service.piper_pool.shutdown()
     except Exception as e:
         print(f"[LifeSpan] Cleanup skipped or failed: {e}")
 
@@ -65,6 +70,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count"],
 )
 
 app.include_router(auth_router)
@@ -73,6 +79,7 @@ app.include_router(scheduled_announcements_router)
 app.include_router(manage_account_router)
 app.include_router(emergency_route)
 app.include_router(files_router, prefix="/files")
+app.include_router(system_router)
 
 # Import and include the AI Router for Smart Scheduler
 from api.routes.ai import ai_router
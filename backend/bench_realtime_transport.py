@@ -0,0 +1,144 @@
+import sys
+import time
+import json
+import struct
+import base64
+import asyncio
+import argparse
+import threading
+
+import requests
+import websockets
+
+# Load test: live voice over HTTP POST /realtime/speak vs the /realtime/ws WebSocket.
+# Needs a running backend and a valid Firebase ID token (copy one from the browser session).
+# Reports sustained chunks/sec (flood) and per-chunk latency (paced at real time).
+
+FRAME_HEADER = struct.Struct('<Id')
+RATE = 16000
+
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def report(name, latencies, count, elapsed):
+    ms = [l * 1000 for l in latencies]
+    print(f"  {name:<10} {count / elapsed:8.1f} chunks/s   "
+          f"p50 {percentile(ms, 50):7.2f} ms   p99 {percentile(ms, 99):7.2f} ms   ({count} chunks)")
+
+
+# --- HTTP ---
+def run_http(base, token, user, chunk, seconds, paced, interval, workers):
+    headers = {"Authorization": f"Bearer {token}"}
+    payload = base64.b64encode(chunk).decode()
+    latencies, lock = [], threading.Lock()
+    seq = iter(range(1 << 31))
+    deadline = time.monotonic() + seconds
+
+    def worker():
+        session = requests.Session()
+        next_send = time.monotonic()
+        while time.monotonic() < deadline:
+            with lock:
+                n = next(seq)
+            t0 = time.perf_counter()
+            session.post(f"{base}/realtime/speak", headers=headers, timeout=10,
+                         json={"user": user, "audio_data": payload, "seq": n, "timestamp": time.time() * 1000})
+            with lock:
+                latencies.append(time.perf_counter() - t0)
+            if paced:
+                next_send += interval
+                time.sleep(max(0.0, next_send - time.monotonic()))
+
+    threads = [threading.Thread(target=worker) for _ in range(1 if paced else workers)]
+    start = time.monotonic()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return latencies, len(latencies), time.monotonic() - start
+
+
+# --- WebSocket ---
+async def _ws_session(url, chunk, seconds, paced, interval):
+    latencies, sent_at = [], {}
+    async with websockets.connect(url, max_size=None) as ws:
+        ready = json.loads(await ws.recv())
+        if ready.get("type") != "ready":
+            raise RuntimeError(f"Handshake failed: {ready}")
+
+        done = asyncio.Event()
+
+        async def receiver():
+            while not done.is_set() or sent_at:
+                try:
+                    msg = await asyncio.wait_for(ws.recv(), timeout=2.0)
+                except asyncio.TimeoutError:
+                    break
+                if isinstance(msg, bytes):
+                    (n,) = struct.unpack('<I', msg[:4])
+                    t0 = sent_at.pop(n, None)
+                    if t0 is not None:
+                        latencies.append(time.perf_counter() - t0)
+
+        recv_task = asyncio.create_task(receiver())
+        start = time.monotonic()
+        n = 0
+        next_send = start
+        while time.monotonic() - start < seconds:
+            sent_at[n] = time.perf_counter()
+            await ws.send(FRAME_HEADER.pack(n, time.time() * 1000) + chunk)
+            n += 1
+            if paced:
+                next_send += interval
+                await asyncio.sleep(max(0.0, next_send - time.monotonic()))
+            elif n % 64 == 0:
+                await asyncio.sleep(0)  # Let acks drain
+        done.set()
+        await recv_task
+        return latencies, len(latencies), time.monotonic() - start
+
+
+def run_ws(base, token, chunk, seconds, paced, interval):
+    url = base.replace("http", "ws", 1) + f"/realtime/ws?ack=true&token={token}"
+    return asyncio.run(_ws_session(url, chunk, seconds, paced, interval))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare HTTP and WebSocket live voice transports")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="Firebase ID token")
+    parser.add_argument("--user", default="LoadTest")
+    parser.add_argument("--zones", default="All Zones")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="Audio per chunk")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each run")
+    parser.add_argument("--http-workers", type=int, default=4, help="Concurrent HTTP senders in flood mode")
+    parser.add_argument("--no-broadcast", action="store_true", help="Don't start/stop a voice broadcast around the test")
+    args = parser.parse_args()
+
+    chunk = bytes(int(RATE * args.chunk_ms / 1000) * 2)  # Silence
+    interval = args.chunk_ms / 1000.0
+    headers = {"Authorization": f"Bearer {args.token}"}
+
+    if not args.no_broadcast:
+        r = requests.post(f"{args.url}/realtime/start", headers=headers,
+                          json={"user": args.user, "zones": [args.zones], "type": "voice"})
+        if r.status_code != 200:
+            print(f"Could not start broadcast: {r.status_code} {r.text}")
+            sys.exit(1)
+        task_id = r.json().get("task_id")
+
+    try:
+        print(f"\n=== Live voice transport: {args.chunk_ms} ms chunks, {args.seconds:.0f} s per run ===")
+        print("Sustained (flood):")
+        report("HTTP", *run_http(args.url, args.token, args.user, chunk, args.seconds, False, interval, args.http_workers))
+        report("WebSocket", *run_ws(args.url, args.token, chunk, args.seconds, False, interval))
+        print("Real-time pacing (latency):")
+        report("HTTP", *run_http(args.url, args.token, args.user, chunk, args.seconds, True, interval, 1))
+        report("WebSocket", *run_ws(args.url, args.token, chunk, args.seconds, True, interval))
+    finally:
+        if not args.no_broadcast:
+            requests.post(f"{args.url}/realtime/stop", headers=headers,
+                          params={"user": args.user, "type": "voice", "task_id": task_id})
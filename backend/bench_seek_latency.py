@@ -0,0 +1,61 @@
+import sys
+import os
+import time
+import tempfile
+import argparse
+
+# Ensure we can import backend modules
+sys.path.append(os.path.join(os.getcwd()))
+
+from api.mixer import DecoderSource, MIXER_BLOCK
+from api.seek_index import SeekIndex
+
+# Seek latency for background music: time from starting a decoder at an offset
+# until the first mix block is ready, SoX `trim` (decode from the top) vs the seek index.
+# Needs sox with MP3 support and a long MP3 (e.g. one from media/).
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def first_block_latency(path, offset, seek, timeout=60.0):
+    t0 = time.perf_counter()
+    source = DecoderSource(path, start_time=offset, seek=seek)
+    while source._buffered < MIXER_BLOCK and not source.closed and time.perf_counter() - t0 < timeout:
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - t0
+    source.stop()
+    return elapsed
+
+
+def run(path, offsets, repeats):
+    index = SeekIndex(tempfile.mkdtemp(prefix="seek_index_"))
+    t0 = time.perf_counter()
+    table = index.get(path)
+    build = time.perf_counter() - t0
+    if not table:
+        print(f"Not an indexable MP3: {path}")
+        sys.exit(1)
+
+    print(f"\n=== Seek latency: {os.path.basename(path)} ({table['duration']:.0f} s), {repeats} run(s) per offset ===")
+    print(f"  index build: {build * 1000:.1f} ms, {len(table['points'])} seek points")
+    print(f"  {'offset':>8}   {'sox trim p50':>13}   {'indexed p50':>12}")
+    for offset in offsets:
+        if offset >= table['duration']:
+            continue
+        trim = [first_block_latency(path, offset, None) for _ in range(repeats)]
+        indexed = [first_block_latency(path, offset, index.locate(path, offset)) for _ in range(repeats)]
+        print(f"  {offset:>7.0f}s   {percentile(trim, 50) * 1000:>10.1f} ms   {percentile(indexed, 50) * 1000:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark background music seek latency against offset")
+    parser.add_argument("path", help="MP3 file to seek in")
+    parser.add_argument("--offsets", default="0,30,120,300,600,1200,1800", help="Comma-separated seconds")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    run(args.path, [float(o) for o in args.offsets.split(",")], args.repeats)
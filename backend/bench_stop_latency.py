@@ -0,0 +1,60 @@
+import sys
+import os
+import time
+import argparse
+import numpy as np
+
+# Ensure we can import backend modules
+sys.path.append(os.path.join(os.getcwd()))
+
+from api.audio_service import audio_service
+from api.mixer import MixerEngine, NullSink, BufferSource, MIXER_RATE
+from api.siren import SirenSource
+from api.proc_utils import popen_group
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def run(zones, iterations, procs, real_sinks):
+    if not real_sinks:
+        # Measure the stop path itself, not the sound card
+        audio_service.mixer.shutdown()
+        audio_service.mixer = MixerEngine(sink_factory=lambda card_id: NullSink(f"card{card_id}"))
+        audio_service.mixer.open_sinks(range(zones))
+
+    tone = np.sin(2 * np.pi * 440 * np.arange(MIXER_RATE) / MIXER_RATE).astype(np.float32)
+    samples = []
+    for i in range(iterations):
+        # One siren + one looping tone per zone, plus stand-ins for Piper stream processes
+        for card_id in range(zones):
+            audio_service.mixer.play(SirenSource('wail', gain=0.1), {card_id: 'left'})
+            audio_service.mixer.play(BufferSource(tone, gain=0.1, loop=True), {card_id: 'right'})
+        for _ in range(procs):
+            audio_service._track_process(popen_group(['sleep', '30']))
+        time.sleep(0.05)  # Let the mixer pick the sources up
+
+        t0 = time.perf_counter()
+        audio_service.stop()
+        samples.append(time.perf_counter() - t0)
+
+    ms = [s * 1000 for s in samples]
+    print(f"\n=== stop() latency: {zones} zone(s), {procs} process(es), {iterations} runs ===")
+    print(f"  p50: {percentile(ms, 50):.3f} ms")
+    print(f"  p99: {percentile(ms, 99):.3f} ms")
+    print(f"  max: {max(ms):.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark AudioService.stop() latency")
+    parser.add_argument("--zones", type=int, default=4, help="Active zones (cards) with sources routed to them")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--procs", type=int, default=2, help="Tracked external processes per run")
+    parser.add_argument("--real-sinks", action="store_true", help="Keep the configured ALSA sinks instead of NullSinks")
+    args = parser.parse_args()
+
+    run(args.zones, args.iterations, args.procs, args.real_sinks)
+    audio_service.mixer.shutdown()
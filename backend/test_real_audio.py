@@ -35,9 +35,9 @@ def test_logic():
     print("Playing 'intro.mp3' on Library (Left Only)...")
     print("LISTEN: Right speaker should be SILENT.")
     
-    # Use internal method to test exact command logic
+    # Use internal method to test exact mixer routing
     intro_path = str(service.system_sounds_dir / "intro.mp3")
-    service._play_sequence_linux(intro_path, None, 2, channel='left', start_time=0)
+    service._play_multizone(intro_path, None, [{'card': 2, 'channel': 'left'}])
     
     print("Did it work?")
 
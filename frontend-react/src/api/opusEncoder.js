@@ -0,0 +1,53 @@
+// Opus encoding for live voice via WebCodecs (Chrome/Edge/Safari 16.4+, Firefox 130+).
+// Emits one raw Opus packet per 20 ms frame at 16 kHz mono, which is what the Pi's
+// decoder expects when 'opus' was negotiated at /realtime/start (backend needs opuslib + libopus).
+// Browsers without AudioEncoder keep sending pcm16.
+const OPUS_CONFIG = {
+  codec: 'opus',
+  sampleRate: 16000,
+  numberOfChannels: 1,
+  bitrate: 24000,
+  opus: { frameDuration: 20000, useinbandfec: true }, // FEC lets the Pi conceal a lost packet from the next one
+};
+
+export const opusSupported = async () => {
+  if (typeof window.AudioEncoder === 'undefined') return false;
+  try {
+    return (await window.AudioEncoder.isConfigSupported(OPUS_CONFIG)).supported === true;
+  } catch (e) {
+    return false;
+  }
+};
+
+// onPacket(bytes: Uint8Array, timestampMs: number) is called for every encoded packet
+export const createOpusEncoder = (onPacket) => {
+  const encoder = new window.AudioEncoder({
+    output: (chunk) => {
+      const bytes = new Uint8Array(chunk.byteLength);
+      chunk.copyTo(bytes);
+      onPacket(bytes, chunk.timestamp / 1000);
+    },
+    error: (e) => console.error('Opus encoder error', e),
+  });
+  encoder.configure(OPUS_CONFIG);
+
+  return {
+    // samples: Float32Array at 16 kHz, timestampMs: capture time
+    encode: (samples, timestampMs) => {
+      if (encoder.state !== 'configured') return;
+      const data = new window.AudioData({
+        format: 'f32',
+        sampleRate: OPUS_CONFIG.sampleRate,
+        numberOfChannels: 1,
+        numberOfFrames: samples.length,
+        timestamp: Math.round(timestampMs * 1000),
+        data: new Float32Array(samples), // Copy: the ScriptProcessor reuses its buffer
+      });
+      encoder.encode(data);
+      data.close();
+    },
+    close: () => {
+      if (encoder.state !== 'closed') encoder.close();
+    },
+  };
+};
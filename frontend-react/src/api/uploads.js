@@ -0,0 +1,60 @@
+import api from './axios';
+
+// Resumable chunked upload (backend: /files/uploads).
+// The upload id is kept in localStorage so a dropped connection or a page reload
+// continues from the last chunk the Pi has instead of starting over.
+const MAX_RETRIES = 8;
+const DEFAULT_CHUNK = 4 * 1024 * 1024;
+
+const storageKey = (file) => `upload:${file.name}:${file.size}:${file.lastModified}`;
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+export const uploadResumable = async (file, user, onProgress) => {
+  const userQuery = `user=${encodeURIComponent(user)}`;
+  const key = storageKey(file);
+  let session = null;
+
+  const savedId = localStorage.getItem(key);
+  if (savedId) {
+    try {
+      session = (await api.get(`/files/uploads/${savedId}`)).data;
+    } catch (e) {
+      localStorage.removeItem(key); // Expired or finished elsewhere
+    }
+  }
+  if (!session) {
+    const res = await api.post(`/files/uploads?${userQuery}`, { filename: file.name, size: file.size });
+    if (res.data.complete) return res.data.file; // Already stored on the Pi
+    session = res.data;
+    localStorage.setItem(key, session.id);
+  }
+
+  const chunkSize = session.chunk_size || DEFAULT_CHUNK;
+  let offset = session.offset;
+  let failures = 0;
+  onProgress?.(file.size ? offset / file.size : 1);
+
+  while (offset < file.size) {
+    try {
+      const res = await api.put(`/files/uploads/${session.id}?offset=${offset}`, file.slice(offset, offset + chunkSize), {
+        headers: { 'Content-Type': 'application/octet-stream' }
+      });
+      offset = res.data.offset;
+      failures = 0;
+      onProgress?.(offset / file.size);
+    } catch (err) {
+      const status = err.response?.status;
+      if (status === 409 && err.response.data?.detail?.offset !== undefined) {
+        offset = err.response.data.detail.offset; // Server has more/less than we thought: resume there
+        continue;
+      }
+      if (status && status < 500) throw err;
+      if (++failures > MAX_RETRIES) throw err;
+      await sleep(Math.min(30000, 1000 * 2 ** failures)); // Network drop: back off and retry
+    }
+  }
+
+  const done = await api.post(`/files/uploads/${session.id}/complete?${userQuery}`);
+  localStorage.removeItem(key);
+  return done.data.file;
+};
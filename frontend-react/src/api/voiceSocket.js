@@ -0,0 +1,74 @@
+import api from './axios';
+import { auth } from '../firebase';
+
+// Live voice over one WebSocket (backend: /realtime/ws).
+// Each binary frame is a 12-byte little-endian header (uint32 seq, float64 capture time in ms)
+// followed by the payload in the codec negotiated at /realtime/start.
+// The Pi closes the socket with 4401 when the ID token expires: we reconnect with a fresh one.
+// While the socket is not open, send() returns false so the caller can fall back to /realtime/speak.
+const HEADER_BYTES = 12;
+const MAX_RECONNECTS = 5;
+
+const socketUrl = (token) => {
+  const base = api.defaults.baseURL || `${window.location.protocol}//${window.location.host}`;
+  return `${base.replace(/^http/, 'ws').replace(/\/$/, '')}/realtime/ws?token=${encodeURIComponent(token)}`;
+};
+
+export const openVoiceSocket = () => {
+  let ws = null;
+  let ready = false;
+  let closed = false;
+  let reconnects = 0;
+  let seq = 0;
+
+  const connect = async () => {
+    const user = auth.currentUser;
+    if (!user || closed) return;
+    // Force a refresh after an expiry close, otherwise the cached token is fine
+    const token = await user.getIdToken(reconnects > 0);
+    if (closed) return;
+    ready = false;
+    ws = new WebSocket(socketUrl(token));
+    ws.binaryType = 'arraybuffer';
+    ws.onmessage = (e) => {
+      if (typeof e.data !== 'string') return;
+      const msg = JSON.parse(e.data);
+      if (msg.type === 'ready') {
+        ready = true;
+        reconnects = 0;
+      }
+    };
+    ws.onclose = (e) => {
+      ready = false;
+      // 4401: token expired or rejected. 4403/4409 (not ours / nothing active) are final.
+      if (!closed && (e.code === 4401 || e.code === 1006) && reconnects < MAX_RECONNECTS) {
+        reconnects += 1;
+        connect().catch((err) => console.error('Voice socket reconnect failed', err));
+      }
+    };
+  };
+
+  connect().catch((err) => console.error('Voice socket failed', err));
+
+  return {
+    nextSeq: () => seq++,
+    // payload: ArrayBuffer / typed array in the negotiated codec
+    send: (payload, frameSeq, timestamp = performance.now()) => {
+      if (!ready || ws?.readyState !== WebSocket.OPEN) return false;
+      const bytes = payload instanceof ArrayBuffer ? new Uint8Array(payload)
+        : new Uint8Array(payload.buffer, payload.byteOffset, payload.byteLength);
+      const frame = new Uint8Array(HEADER_BYTES + bytes.byteLength);
+      const header = new DataView(frame.buffer);
+      header.setUint32(0, frameSeq >>> 0, true);
+      header.setFloat64(4, timestamp, true);
+      frame.set(bytes, HEADER_BYTES);
+      ws.send(frame.buffer);
+      return true;
+    },
+    close: () => {
+      closed = true;
+      ready = false;
+      ws?.close();
+    },
+  };
+};
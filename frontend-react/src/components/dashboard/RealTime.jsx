@@ -2,6 +2,8 @@ import React, { useState, useEffect, useRef } from 'react';
 import { useApp } from '../../context/AppContext';
 import { useAuth } from '../../context/AuthContext';
 import api from '../../api/axios'; // Import API for direct Text Broadcast calls
+import { openVoiceSocket } from '../../api/voiceSocket';
+import { opusSupported, createOpusEncoder } from '../../api/opusEncoder';
 import Modal from '../common/Modal';
 
 const RealTime = () => {
@@ -173,6 +175,8 @@ const RealTime = () => {
   const processorRef = useRef(null);
   const sourceRef = useRef(null);
   const gainRef = useRef(null); // Gain Node for Muting
+  const voiceSocketRef = useRef(null); // Binary frames to /realtime/ws (HTTP /speak is the fallback)
+  const opusEncoderRef = useRef(null); // Set when the Pi negotiated Opus
   // audioContextRef is already defined at top of component
 
   // Helper: Float32 to Int16 PCM
@@ -214,6 +218,14 @@ const RealTime = () => {
             audioContextRef.current.close(); 
             audioContextRef.current = null;
         }
+        if (opusEncoderRef.current) {
+            opusEncoderRef.current.close();
+            opusEncoderRef.current = null;
+        }
+        if (voiceSocketRef.current) {
+            voiceSocketRef.current.close();
+            voiceSocketRef.current = null;
+        }
         
         // 2. Stop Backend Session
         stopBroadcast(currentUser?.name || 'Admin');
@@ -248,9 +260,10 @@ const RealTime = () => {
     
     try {
         // 1. Start Backend Session (Locks system, Plays Intro on Pi)
-        const success = await startBroadcast(currentUser?.name || 'Admin', zones);
+        const codecs = (await opusSupported()) ? ['opus', 'pcm16'] : ['pcm16'];
+        const codec = await startBroadcast(currentUser?.name || 'Admin', zones, codecs);
         
-        if (success) {
+        if (codec) {
             startTimeRef.current = Date.now();
             startTimeStrRef.current = new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
             
@@ -274,26 +287,25 @@ const RealTime = () => {
             const source = audioCtx.createMediaStreamSource(stream);
             sourceRef.current = source;
             
+            // Frames go over the WebSocket once it is up (bound to this broadcast on the Pi)
+            const voiceSocket = openVoiceSocket();
+            voiceSocketRef.current = voiceSocket;
+
             // ScriptProcessor (bufferSize, inputChannels, outputChannels)
-            // 16384 samples @ 16kHz ~= 1s latency (Stable for Pi)
-            const processor = audioCtx.createScriptProcessor(16384, 1, 1);
+            // 4096 samples @ 16kHz ~= 256ms per frame (the Pi's jitter buffer absorbs network spread)
+            const processor = audioCtx.createScriptProcessor(4096, 1, 1);
             processorRef.current = processor;
 
-            processor.onaudioprocess = async (e) => {
-                const inputData = e.inputBuffer.getChannelData(0);
-                
-                // Convert to Int16 PCM
-                const pcm16 = floatTo16BitPCM(inputData);
-                
-                // Convert to Base64
-                // Uint8Array view of the Int16Array
-                const pcmBytes = new Uint8Array(pcm16.buffer);
+            // One encoded frame: binary over the socket, or base64 to /realtime/speak while it isn't open
+            const sendFrame = async (bytes, timestamp) => {
+                const seq = voiceSocket.nextSeq();
+                if (voiceSocket.send(bytes, seq, timestamp)) return;
                 
                 // Binary to Base64 String
+                const view = new Uint8Array(bytes.buffer, bytes.byteOffset, bytes.byteLength);
                 let binary = '';
-                const len = pcmBytes.byteLength;
-                for (let i = 0; i < len; i++) {
-                    binary += String.fromCharCode(pcmBytes[i]);
+                for (let i = 0; i < view.byteLength; i++) {
+                    binary += String.fromCharCode(view[i]);
                 }
                 const base64data = window.btoa(binary);
 
@@ -301,12 +313,30 @@ const RealTime = () => {
                 try {
                     await api.post('/realtime/speak', {
                         user: currentUser?.name || 'Admin',
-                        audio_data: base64data
+                        audio_data: base64data,
+                        seq,
+                        timestamp
                     });
                 } catch (err) {
                     console.error("Chunk send failed", err);
                 }
             };
+
+            // Opus: the encoder cuts 20 ms packets, each one is a frame
+            const opusEncoder = codec === 'opus' ? createOpusEncoder(sendFrame) : null;
+            opusEncoderRef.current = opusEncoder;
+
+            processor.onaudioprocess = (e) => {
+                const inputData = e.inputBuffer.getChannelData(0);
+                const timestamp = performance.now();
+                
+                if (opusEncoder) {
+                    opusEncoder.encode(inputData, timestamp);
+                    return;
+                }
+                // Convert to Int16 PCM
+                sendFrame(floatTo16BitPCM(inputData), timestamp);
+            };
             
             // Connect Graph: Source -> Processor -> Gain -> Destination (Muted)
             source.connect(processor);
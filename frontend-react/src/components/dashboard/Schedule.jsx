@@ -273,7 +273,8 @@ const Schedule = () => {
           voice: schedule.voice || 'female', 
           zones: zonesMap
       });
-      setAudioBlob(schedule.audio || null);
+      // Recorded audio stays on the Pi (blob store); editing keeps it by hash unless re-recorded
+      setAudioBlob(schedule.audio_hash ? { hash: schedule.audio_hash } : (schedule.audio || null));
       setShowModal(true);
   };
 
@@ -324,15 +325,20 @@ const Schedule = () => {
 
           try {
               let audioString = null;
-          if (audioBlob) {
+              let audioHash = null;
+          if (audioBlob?.hash) {
+              audioHash = audioBlob.hash; // Unchanged recording
+          } else if (typeof audioBlob === 'string') {
+              audioString = audioBlob; // Legacy inline recording (moved to the blob store on save)
+          } else if (audioBlob) {
               // Convert Blob to Base64
               const reader = new FileReader();
               const base64Promise = new Promise((resolve, reject) => {
                   reader.onloadend = () => {
                       const result = reader.result;
-                      // Check size (~800KB limit for Firestore safety)
-                      if (result.length > 800000) {
-                          reject(new Error("Audio recording is too long (Limit: ~60 seconds)."));
+                      // Check size (backend blob store accepts up to 20 MB)
+                      if (result.length > 27000000) {
+                          reject(new Error("Audio recording is too long."));
                       } else {
                           resolve(result);
                       }
@@ -359,7 +365,8 @@ const Schedule = () => {
               status: 'Pending',
               type: audioBlob ? 'voice' : 'text',
               voice: formData.voice, // Send voice preference
-              audio: audioString // Send Base64 string
+              audio: audioString, // New recording as Base64 (the backend stores it and keeps only the hash)
+              audio_hash: audioHash
           };
 
           if (editId) {
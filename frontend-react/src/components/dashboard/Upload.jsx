@@ -3,6 +3,7 @@ import { useApp } from '../../context/AppContext';
 import { useAuth } from '../../context/AuthContext';
 import Modal from '../common/Modal';
 import api from '../../api/axios';
+import { uploadResumable } from '../../api/uploads';
 
 const Upload = () => {
   const { files, addFile, deleteFile, logActivity, updateLog, emergencyActive, systemState, zones, setZones } = useApp();
@@ -395,17 +396,11 @@ const Upload = () => {
                continue;
           }
 
-          const formData = new FormData();
-          formData.append('file', file);
-          
           try {
-              const res = await api.post(`/files/upload?user=${encodeURIComponent(currentUser?.name || 'Admin')}`, formData, {
-                  headers: { 'Content-Type': 'multipart/form-data' }
-              });
+              // Chunked + resumable: survives Wi-Fi drops, and content the Pi already has isn't stored twice
+              const uploadedFile = await uploadResumable(file, currentUser?.name || 'Admin');
               
               // Backend returns the file object which matches our needed structure
-              // Check if backend returned an existing file (idempotent)
-              const uploadedFile = res.data;
               
               // Double check if it exists in state now (race condition?)
               addFile(uploadedFile);
@@ -268,11 +268,13 @@ export const AppProvider = ({ children }) => {
 
       try {
           
-          if (type === 'voice' && task.data.audio) {
-              // Play Base64 Audio
-              const audioSrc = task.data.audio.startsWith('data:') 
-                  ? task.data.audio 
-                  : `data:audio/webm;base64,${task.data.audio}`;
+          if (type === 'voice' && (task.data.audio_hash || task.data.audio)) {
+              // Play recorded audio (served by hash from the Pi's blob store; legacy tasks carry Base64)
+              const audioSrc = task.data.audio_hash
+                  ? `${api.defaults.baseURL}/scheduled/audio/${task.data.audio_hash}`
+                  : task.data.audio.startsWith('data:')
+                      ? task.data.audio
+                      : `data:audio/webm;base64,${task.data.audio}`;
               
               const audio = new Audio(audioSrc);
               audio.volume = 0; // MUTE LOCAL PLAYBACK (Backend handles audio on Pi)
@@ -579,7 +581,8 @@ export const AppProvider = ({ children }) => {
     return () => window.removeEventListener('beforeunload', handleUnload);
   }, [broadcastActive, currentUser]);   
 
-  const startBroadcast = async (user, zonesObj) => {
+  // Resolves to the codec negotiated with the Pi ('opus' / 'pcm16'), or false if the broadcast didn't start
+  const startBroadcast = async (user, zonesObj, codecs = ['pcm16']) => {
       try {
           // 1. Show preparation state
           setBroadcastPreparing(true); 
@@ -590,7 +593,8 @@ export const AppProvider = ({ children }) => {
           const res = await api.post('/realtime/start', {
               user: user || 'Unknown',
               zones: zoneList,
-              type: 'voice'
+              type: 'voice',
+              codecs
           });
 
           // Store User for Cleanup
@@ -631,7 +635,7 @@ export const AppProvider = ({ children }) => {
           setBroadcastPreparing(false);
           setBroadcastActive(true); // UI shows "STOP BROADCAST" (Speak Now)
           
-          return true;
+          return res.data.codec || 'pcm16';
       } catch (err) {
           console.error("Broadcast Start Failed:", err);
           // If 409, it means system busy